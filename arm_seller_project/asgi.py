@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arm_seller_project.settings')
 
 application = get_asgi_application()
+
+# Прогреваем кэш штрихкодов кассы до первого скана
+from catalog import barcodes  # noqa: E402
+
+barcodes.warm()
@@ -99,6 +99,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Карточки товаров кэшируются целиком и сбрасываются сигналами. LocMem живёт внутри
+# процесса — при нескольких воркерах нужен общий бэкенд (Redis/Memcached), иначе
+# сброс в одном воркере не увидят другие.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'arm-seller',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
+# Нумерация чеков: «{префикс магазина}-{ГГММДД}-{счётчик}». Каждая касса/процесс
+# берёт у базы блок из RECEIPT_BLOCK_SIZE номеров и выдаёт их из памяти (sales.numbering).
+
+RECEIPT_PREFIX = 'A'
+RECEIPT_BLOCK_SIZE = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arm_seller_project.settings')
 
 application = get_wsgi_application()
+
+# Прогреваем кэш штрихкодов кассы до первого скана
+from catalog import barcodes  # noqa: E402
+
+barcodes.warm()
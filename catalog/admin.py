@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
-from .models import Product, ProductImage, Brand, Category
+from .models import Barcode, Product, ProductImage, ProductVariant, Brand, Category
 
 
 @admin.register(Brand)
@@ -29,18 +29,40 @@ class ProductImageInline(admin.TabularInline):  # можно StackedInline, ес
         if obj and obj.image:
             return format_html(
                 '<img src="{}" style="height:64px; border-radius:6px; box-shadow:0 0 0 1px rgba(0,0,0,.06)" />',
-                obj.image.url
+                obj.thumb_small
             )
         return '—'
     preview.short_description = 'Превью'
 
 
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 1
+    fields = ('sku', 'size', 'color', 'price')
+    show_change_link = True  # штрихкоды — на странице варианта
+
+
+class BarcodeInline(admin.TabularInline):
+    model = Barcode
+    extra = 1
+    fields = ('code',)
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'brand', 'category')
-    search_fields = ('name', 'brand__name', 'category__name')
+    list_display = ('id', 'name', 'sku', 'price', 'brand', 'category')
+    search_fields = ('name', 'sku', 'variants__sku', 'variants__barcodes__code', 'brand__name', 'category__name')
     list_filter = ('brand', 'category')
-    inlines = [ProductImageInline]
+    inlines = [ProductVariantInline, ProductImageInline]
+
+
+@admin.register(ProductVariant)
+class ProductVariantAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sku', 'product', 'size', 'color', 'price')
+    list_select_related = ('product',)
+    search_fields = ('sku', 'barcodes__code', 'product__name')
+    autocomplete_fields = ('product',)
+    inlines = [BarcodeInline]
 
 
 @admin.register(ProductImage)
@@ -51,6 +73,6 @@ class ProductImageAdmin(admin.ModelAdmin):
 
     def thumb(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="height:48px;border-radius:4px" />', obj.image.url)
+            return format_html('<img src="{}" style="height:48px;border-radius:4px" />', obj.thumb_small)
         return '—'
     thumb.short_description = 'Превью'
@@ -0,0 +1,208 @@
+# catalog/barcodes.py
+"""
+Кэш «штрихкод/SKU → вариант товара» для кассы.
+
+Словарь живёт в памяти процесса: прогревается при старте (wsgi/asgi)
+или при первом обращении, а дальше поддерживается сигналами
+(см. catalog/signals.py) — после коммита, чтобы откаченное сохранение
+не попало в словарь. Точное попадание не обращается к базе; промах
+проверяется одним запросом по индексу — код мог добавить другой процесс.
+
+Изменения из других процессов (цена, название, перенос кода) приходят
+через общий кэш: счётчик версий и по ключу на версию со списком
+изменённых вариантов. Каждое обращение сверяет свою версию со счётчиком
+и перечитывает только изменённые варианты. Между процессами это
+работает с общим бэкендом кэша (Redis, Memcached), не с LocMemCache.
+"""
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+# код -> данные варианта (только для чтения!)
+_index: dict = {}
+# id варианта -> его коды; нужно, чтобы снять старые записи при изменениях
+_codes_by_variant: dict = {}
+_warm = False
+_lock = threading.Lock()
+# Версия общего счётчика, до которой словарь этого процесса актуален
+_version = None
+
+VERSION_KEY = 'catalog:barcodes:version'
+CHANGE_KEY = 'catalog:barcodes:change:{}'
+CHANGE_TTL = 24 * 3600
+# Изменение «перечитать всё» (импорт каталога)
+ALL = 'all'
+# Отстали больше, чем на столько версий, — дешевле перечитать словарь целиком
+CATCH_UP_MAX = 100
+
+_FIELDS = ('pk', 'product_id', 'product__name', 'sku', 'size', 'color', 'price', 'product__price', 'product__brand__name')
+
+
+def _payload(pk, product_id, name, sku, size, color, price, product_price, brand) -> dict:
+    return {
+        'id': pk,
+        'product_id': product_id,
+        'name': name,
+        'sku': sku,
+        'size': size,
+        'color': color,
+        'price': str(price if price is not None else product_price),
+        'brand': brand or '',
+    }
+
+
+def _load(variant_ids=None) -> dict:
+    """Читает коды из базы: {variant_id: (payload, [codes])}."""
+    from .models import Barcode, ProductVariant
+
+    variants = ProductVariant.objects.all()
+    barcodes = Barcode.objects.all()
+    if variant_ids is not None:
+        variants = variants.filter(pk__in=variant_ids)
+        barcodes = barcodes.filter(variant_id__in=variant_ids)
+
+    loaded = {}
+    for row in variants.values_list(*_FIELDS):
+        loaded[row[0]] = (_payload(*row), [row[3]])
+    for variant_id, code in barcodes.values_list('variant_id', 'code'):
+        if variant_id in loaded:
+            loaded[variant_id][1].append(code)
+    return loaded
+
+
+def warm() -> bool:
+    """Полная загрузка словаря. Ошибку БД (не применены миграции и т.п.) только логируем."""
+    global _index, _codes_by_variant, _warm, _version
+    # Версию читаем до загрузки: изменения во время загрузки потом догоним
+    version = _current_version()
+    try:
+        loaded = _load()
+    except DatabaseError:
+        logger.warning('Не удалось прогреть кэш штрихкодов', exc_info=True)
+        return False
+
+    index, codes_by_variant = {}, {}
+    for pk, (payload, codes) in loaded.items():
+        codes_by_variant[pk] = codes
+        for code in codes:
+            index[code] = payload
+    with _lock:
+        _index, _codes_by_variant, _warm, _version = index, codes_by_variant, True, version
+    return True
+
+
+def _current_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def publish(variant_ids=None) -> None:
+    """Сообщить остальным процессам об изменённых вариантах (None — перечитать всё). Звать после коммита."""
+    cache.add(VERSION_KEY, 0)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:  # счётчик вытеснен между add и incr
+        cache.add(VERSION_KEY, 1)
+        version = cache.get(VERSION_KEY, 1)
+    cache.set(CHANGE_KEY.format(version), ALL if variant_ids is None else list(variant_ids), CHANGE_TTL)
+
+
+def _catch_up() -> None:
+    """Догнать изменения других процессов по общему счётчику версий."""
+    global _version
+    current = _current_version()
+    seen = _version
+    if current == seen:
+        return
+    if seen is None or current < seen or current - seen > CATCH_UP_MAX:
+        warm()  # счётчик сброшен (перезапуск кэша) или отстали слишком сильно
+        return
+    keys = [CHANGE_KEY.format(v) for v in range(seen + 1, current + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys) or ALL in changes.values():
+        warm()
+        return
+    refresh_variants({pk for ids in changes.values() for pk in ids})
+    with _lock:
+        if _version == seen:
+            _version = current
+
+
+def lookup(code: str):
+    """Данные варианта по штрихкоду или SKU; None, если такого кода нет."""
+    if not _warm:
+        warm()
+    else:
+        _catch_up()
+    code = code.strip()
+    hit = _index.get(code)
+    if hit is None and code and _warm:
+        # Код мог появиться в другом процессе (импорт, админка) — поиск по индексу
+        from .models import ProductVariant
+
+        variant = ProductVariant.objects.by_code(code)
+        if variant:
+            refresh_variants([variant.pk])
+            hit = _index.get(code)
+    return hit
+
+
+def _drop(variant_id) -> None:
+    for code in _codes_by_variant.pop(variant_id, ()):
+        # Код мог уже перейти к другому варианту — его запись не трогаем
+        if _index.get(code, {}).get('id') == variant_id:
+            del _index[code]
+
+
+def refresh_variants(variant_ids) -> None:
+    """Перечитывает записи указанных вариантов (после сохранения варианта или штрихкода)."""
+    if not _warm:
+        return  # при первом обращении всё равно загрузим целиком
+    variant_ids = list(variant_ids)
+    loaded = _load(variant_ids)
+    with _lock:
+        for pk in variant_ids:
+            _drop(pk)
+            if pk in loaded:
+                payload, codes = loaded[pk]
+                _codes_by_variant[pk] = codes
+                for code in codes:
+                    _index[code] = payload
+
+
+def variants_changed(variant_ids) -> None:
+    """Для сигналов: после коммита перечитать варианты здесь и известить остальные процессы."""
+    variant_ids = list(variant_ids)
+
+    def apply():
+        refresh_variants(variant_ids)  # удалённые варианты refresh_variants просто снимет
+        publish(variant_ids)
+    transaction.on_commit(apply)
+
+
+def products_changed(product_ids) -> None:
+    """Название, цена или бренд товара попадают в данные всех его вариантов."""
+    product_ids = list(product_ids)
+
+    def apply():
+        from .models import ProductVariant
+
+        variant_ids = list(ProductVariant.objects.filter(product_id__in=product_ids).values_list('pk', flat=True))
+        refresh_variants(variant_ids)
+        publish(variant_ids)
+    transaction.on_commit(apply)
+
+
+def clear() -> None:
+    """Сбросить кэш целиком — он перечитается при следующем обращении (во всех процессах)."""
+    global _index, _codes_by_variant, _warm
+    with _lock:
+        _index, _codes_by_variant, _warm = {}, {}, False
+    publish()
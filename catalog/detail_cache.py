@@ -0,0 +1,35 @@
+# catalog/detail_cache.py
+"""
+Кэш страницы товара.
+
+Ключ страницы — id товара + «версия» товара. Версия лежит в том же кэше;
+инвалидация просто удаляет её, и следующий запрос получает новую версию,
+а старые страницы становятся недостижимыми и истекают сами.
+Сбрасывается сигналами: товар, бренд/категория, фото, штрихкоды, остатки.
+"""
+import time
+
+from django.core.cache import cache
+
+DETAIL_TIMEOUT = 60 * 60
+
+
+def _version_key(product_id) -> str:
+    return f'catalog:product:{product_id}:ver'
+
+
+def page_key(product_id) -> str:
+    version_key = _version_key(product_id)
+    version = cache.get(version_key)
+    if version is None:
+        # Не счётчик с единицы: после вытеснения ключа версия не должна совпасть со старой
+        version = time.time_ns()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return f'catalog:product:{product_id}:v{version}:detail'
+
+
+def invalidate(product_ids) -> None:
+    product_ids = list(product_ids)
+    if product_ids:
+        cache.delete_many([_version_key(pk) for pk in product_ids])
@@ -0,0 +1,168 @@
+# catalog/imagestore.py
+"""
+Контентно-адресуемое хранение фото товаров.
+
+Файл кладётся по SHA-256 содержимого: products/sha256/ab/abcdef….jpg.
+Расширение берётся из формата картинки (Pillow), а не из имени загрузки:
+x.jpg и x.jpeg с одними байтами — один файл. Его делят все ProductImage
+с тем же именем; файл (и его превью) удаляется, когда ссылок не остаётся.
+
+Запись, удаление и генерация превью одного файла идут под его блокировкой
+(cache.add, как у корзины кассы): release() не удалит файл, который
+параллельная загрузка уже взяла, а превью не переживут удалённый оригинал.
+Между процессами блокировка работает при общем кэше (Redis/Memcached).
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from . import detail_cache, thumbnails
+
+logger = logging.getLogger(__name__)
+
+CAS_ROOT = 'products/sha256'
+_CHUNK = 1024 * 1024
+
+# Формат Pillow -> расширение файла в хранилище
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'MPO': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+    'BMP': '.bmp',
+    'TIFF': '.tif',
+}
+
+LOCK_PREFIX = 'imagestore:lock:'
+# Блокировка переживает упавший процесс не дольше LOCK_TTL (генерация превью идёт под ней);
+# ждём её не дольше LOCK_WAIT
+LOCK_TTL = 60
+LOCK_WAIT = 30
+
+
+def content_hash(fh) -> str:
+    """SHA-256 файла/потока по кускам; позиция возвращается в начало."""
+    digest = hashlib.sha256()
+    if hasattr(fh, 'seek'):
+        fh.seek(0)
+    if hasattr(fh, 'chunks'):
+        for chunk in fh.chunks(_CHUNK):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: fh.read(_CHUNK), b''):
+            digest.update(chunk)
+    if hasattr(fh, 'seek'):
+        fh.seek(0)
+    return digest.hexdigest()
+
+
+def image_extension(fh, filename: str = '') -> str:
+    """Расширение по формату содержимого; если Pillow файл не узнал — по имени загрузки."""
+    fmt = None
+    try:
+        fh.seek(0)
+        fmt = Image.open(fh).format
+    except (OSError, ValueError):
+        pass
+    finally:
+        fh.seek(0)
+    if fmt:
+        return FORMAT_EXTENSIONS.get(fmt, '.' + fmt.lower())
+    return os.path.splitext(filename)[1].lower()
+
+
+def cas_name(digest: str, ext: str) -> str:
+    return posixpath.join(CAS_ROOT, digest[:2], f'{digest}{ext}')
+
+
+@contextmanager
+def locked(name: str):
+    """Блокировка файла хранилища. Не дождались — TimeoutError."""
+    lock_key, token = LOCK_PREFIX + name, uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, token, LOCK_TTL):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Файл {name} занят')
+        time.sleep(0.02)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def write_missing(name: str, fh) -> None:
+    """Записать байты под name, если там пусто. Блокировку файла держит вызывающий."""
+    if default_storage.exists(name):
+        return
+    fh.seek(0)
+    saved = default_storage.save(name, fh)
+    if saved != name:
+        # Файл появился в обход блокировки — те же байты уже лежат под name, копия не нужна
+        default_storage.delete(saved)
+
+
+def store(name: str, fh) -> None:
+    """Положить байты под именем name, если их там ещё нет."""
+    with locked(name):
+        write_missing(name, fh)
+
+
+def confirm(name: str, fh) -> None:
+    """
+    Вызывать после коммита новой строки. release() мог удалить файл между
+    store() и коммитом (строки ещё не было видно) — тогда возвращаем байты.
+    Отметки превью сверяем с файлами; недостающие ставим в очередь.
+    """
+    from .models import ProductImage
+
+    try:
+        with locked(name):
+            write_missing(name, fh)
+            ready = thumbnails.derivatives_exist(name)
+            stale = ProductImage.objects.filter(image=name).exclude(thumbs_ready=ready)
+            product_ids = list(stale.values_list('product_id', flat=True))
+            if product_ids:
+                stale.update(thumbs_ready=ready)
+                detail_cache.invalidate(product_ids)
+    except TimeoutError:
+        logger.warning('Не дождались блокировки файла %s, превью — через regenerate_thumbnails', name)
+        return
+    if not ready:
+        thumbnails.schedule(name)
+
+
+def delete_file(name: str) -> None:
+    thumbnails.delete_for_name(name)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+
+
+def release(name: str) -> bool:
+    """
+    Снять ссылку: если строк с этим файлом больше нет — удалить его.
+    Вызывать после удаления/замены строки (после коммита). Файлы вне
+    CAS_ROOT (загруженные до dedupe_media) не трогаем.
+    """
+    from .models import ProductImage
+
+    if not name or not name.startswith(CAS_ROOT + '/'):
+        return False
+    try:
+        with locked(name):
+            if ProductImage.objects.filter(image=name).exists():
+                return False
+            delete_file(name)
+    except TimeoutError:
+        logger.warning('Не дождались блокировки файла %s, файл оставлен', name)
+        return False
+    return True
@@ -0,0 +1,258 @@
+# catalog/importer.py
+"""
+Потоковый импорт каталога (прайс поставщика) из CSV/JSONL.
+
+Файл читается построчно и обрабатывается пачками: на пачку — одна транзакция,
+bulk_create/bulk_update вместо поштучных save(). Бренды и категории
+резолвятся через словари в памяти.
+
+Строка — вариант товара: sku (SKU варианта), article (артикул товара;
+по умолчанию равен sku — товар с одним вариантом), size, color, barcodes
+(штрихкоды варианта через «|» или «,»). Поля товара: name, brand, category,
+description, price. Товары сопоставляются по артикулу, варианты — по SKU
+(upsert). Обязательны sku и name; отсутствующие в строке поля у
+существующих записей не меняются.
+"""
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from . import barcodes as barcode_cache
+from . import detail_cache, search, sync, tree
+from .models import Barcode, Brand, Category, Product, ProductVariant
+
+UPDATE_FIELDS = ('name', 'brand_id', 'category_id', 'description', 'price')
+VARIANT_FIELDS = ('product_id', 'size', 'color')
+# Предел DecimalField цены: больше база не сохранит
+_price_field = Product._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places)
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = self.created = self.updated = self.unchanged = self.skipped = 0
+        self.variants = self.barcodes = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class BadRow:
+    """Строка файла, которую не удалось прочитать; импорт считает её пропущенной."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def read_rows(fh, fmt: str, delimiter: str = ','):
+    """Генератор словарей из открытого файла — ничего не держит в памяти."""
+    if fmt == 'jsonl':
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield BadRow(f'некорректный JSON: {exc}')
+                continue
+            yield row if isinstance(row, dict) else BadRow('ожидается JSON-объект')
+    else:
+        yield from csv.DictReader(fh, delimiter=delimiter)
+
+
+def _clean(value) -> str:
+    return str(value).strip() if value is not None else ''
+
+
+def _price(value):
+    value = _clean(value).replace(' ', '').replace(',', '.')
+    if not value:
+        return Decimal('0')
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        price = None
+    if price is None or not price.is_finite() or abs(price) >= MAX_PRICE:
+        raise ValueError(f'некорректная цена: {value!r}')
+    return price.quantize(Decimal('0.01'))
+
+
+def _split_barcodes(value) -> list:
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value if _clean(v)]
+    return [c.strip() for c in _clean(value).replace(',', '|').split('|') if c.strip()]
+
+
+class CatalogImporter:
+    def __init__(self, batch_size: int = 2000, dry_run: bool = False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stats = ImportStats()
+        # Справочники целиком в памяти: их мало, а обращений — по разу на строку
+        self.brand_ids = dict(Brand.objects.values_list('name', 'pk'))
+        self.category_ids = dict(Category.objects.values_list('name', 'pk'))
+
+    # ---- справочники ----
+
+    def _resolve(self, names, cache, model):
+        missing = {n for n in names if n and n not in cache}
+        if missing:
+            model.objects.bulk_create([model(name=n) for n in missing], ignore_conflicts=True)
+            cache.update(model.objects.filter(name__in=missing).values_list('name', 'pk'))
+            if model is Category:
+                # bulk_create минует save() — новым (корневым) категориям путь ставим сами
+                fresh = Category.objects.filter(name__in=missing, path='').values_list('pk', flat=True)
+                Category.objects.bulk_update(
+                    [Category(pk=pk, path=f'/{pk}/', depth=0) for pk in fresh], ['path', 'depth']
+                )
+        return cache
+
+    # ---- основной цикл ----
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.batch_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        if not self.dry_run:
+            barcode_cache.clear()
+            tree.invalidate()
+        return self.stats
+
+    def _parse(self, chunk):
+        parsed = {}
+        for raw in chunk:
+            self.stats.rows += 1
+            try:
+                if isinstance(raw, BadRow):
+                    raise ValueError(raw.error)
+                sku, name = _clean(raw.get('sku')), _clean(raw.get('name'))
+                if not sku or not name:
+                    raise ValueError('нет sku или name')
+                row = {'name': name[:255], 'article': _clean(raw.get('article'))[:64] or sku}
+                # Отсутствующие в строке поля при обновлении не трогаем
+                if 'brand' in raw:
+                    row['brand'] = _clean(raw['brand'])[:120]
+                if 'category' in raw:
+                    row['category'] = _clean(raw['category'])[:120]
+                if 'description' in raw:
+                    row['description'] = _clean(raw['description'])
+                if 'price' in raw:
+                    row['price'] = _price(raw['price'])
+                if 'size' in raw:
+                    row['size'] = _clean(raw['size'])[:16]
+                if 'color' in raw:
+                    row['color'] = _clean(raw['color'])[:32]
+                row['barcodes'] = _split_barcodes(raw.get('barcodes') or raw.get('barcode'))
+                parsed[sku[:64]] = row  # повтор SKU в файле — побеждает последняя строка
+            except (ValueError, InvalidOperation, AttributeError) as exc:
+                self.stats.skipped += 1
+                if len(self.stats.errors) < 100:
+                    self.stats.errors.append(f'строка {self.stats.rows}: {exc}')
+        return parsed
+
+    def _import_chunk(self, chunk):
+        parsed = self._parse(chunk)
+        if not parsed:
+            return
+        if self.dry_run:
+            # Созданные в пачке бренды/категории откатятся — не запоминаем их id
+            brand_ids, category_ids = dict(self.brand_ids), dict(self.category_ids)
+        with transaction.atomic():
+            self._resolve({r.get('brand') for r in parsed.values()}, self.brand_ids, Brand)
+            self._resolve({r.get('category') for r in parsed.values()}, self.category_ids, Category)
+
+            # Товар по артикулу; у нескольких строк одного артикула побеждает последняя
+            articles = {row['article']: row for row in parsed.values()}
+            existing = Product.objects.filter(sku__in=articles.keys()).only('pk', 'sku', *UPDATE_FIELDS).in_bulk(
+                field_name='sku'
+            )
+            to_create, to_update = [], []
+            for article, row in articles.items():
+                values = {'name': row['name']}
+                if 'brand' in row:
+                    values['brand_id'] = self.brand_ids.get(row['brand'])
+                if 'category' in row:
+                    values['category_id'] = self.category_ids.get(row['category'])
+                for field in ('description', 'price'):
+                    if field in row:
+                        values[field] = row[field]
+                product = existing.get(article)
+                if product is None:
+                    to_create.append(Product(sku=article, **values))
+                elif any(getattr(product, f) != v for f, v in values.items()):
+                    for f, v in values.items():
+                        setattr(product, f, v)
+                    to_update.append(product)
+                else:
+                    self.stats.unchanged += 1
+
+            Product.objects.bulk_create(to_create, batch_size=500)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+            self.stats.created += len(to_create)
+            self.stats.updated += len(to_update)
+
+            product_ids = {p.sku: p.pk for p in to_create}
+            product_ids.update({article: p.pk for article, p in existing.items()})
+
+            # Варианты по SKU
+            variants = ProductVariant.objects.filter(sku__in=parsed.keys()).only('pk', 'sku', *VARIANT_FIELDS).in_bulk(
+                field_name='sku'
+            )
+            new_variants, changed_variants = [], []
+            for sku, row in parsed.items():
+                values = {'product_id': product_ids[row['article']]}
+                for field in ('size', 'color'):
+                    if field in row:
+                        values[field] = row[field]
+                variant = variants.get(sku)
+                if variant is None:
+                    new_variants.append(ProductVariant(sku=sku, **values))
+                elif any(getattr(variant, f) != v for f, v in values.items()):
+                    for f, v in values.items():
+                        setattr(variant, f, v)
+                    changed_variants.append(variant)
+            ProductVariant.objects.bulk_create(new_variants, batch_size=500)
+            ProductVariant.objects.bulk_update(changed_variants, VARIANT_FIELDS, batch_size=500)
+            self.stats.variants += len(new_variants)
+            variants.update({v.sku: v for v in new_variants})
+
+            codes = {
+                code[:64]: variants[sku]
+                for sku, row in parsed.items() for code in row['barcodes']
+            }
+            # Уже занятые коды (в т.ч. за другим вариантом) не перехватываем
+            for taken in Barcode.objects.filter(code__in=codes.keys()).values_list('code', flat=True):
+                del codes[taken]
+            Barcode.objects.bulk_create(
+                [Barcode(variant_id=v.pk, code=code) for code, v in codes.items()],
+                batch_size=500, ignore_conflicts=True,
+            )
+            self.stats.barcodes += len(codes)
+
+            # bulk-операции не шлют сигналов — индекс и журнал синхронизации ведём сами
+            changed_ids = [p.pk for p in to_create] + [p.pk for p in to_update]
+            search.reindex_products(changed_ids)
+            touched = set(changed_ids) | {v.product_id for v in new_variants + changed_variants}
+            touched |= {v.product_id for v in codes.values()}
+            sync.record(touched)
+            detail_cache.invalidate(touched)
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+        if self.dry_run:
+            self.brand_ids, self.category_ids = brand_ids, category_ids
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Заполняет Product.main_image (обложку) для всех товаров одним UPDATE'
+
+    def handle(self, *args, **options):
+        updated = Product.refresh_main_images()
+        self.stdout.write(self.style.SUCCESS(f'Обложки пересчитаны: {updated} товаров.'))
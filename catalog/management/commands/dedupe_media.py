@@ -0,0 +1,84 @@
+import os
+import posixpath
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import imagestore, thumbnails
+from catalog.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Сканирует MEDIA_ROOT/products, переносит фото товаров в контентно-адресуемое '
+        'хранилище и схлопывает одинаковые файлы в один'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет сделано')
+
+    def _scan(self):
+        """Все исходники фото (без превью и уже перенесённых): имя в хранилище -> размер."""
+        root = default_storage.path('products')
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = posixpath.join('products', os.path.relpath(dirpath, root).replace(os.sep, '/'))
+            rel_dir = posixpath.normpath(rel_dir)
+            if rel_dir == imagestore.CAS_ROOT:
+                dirnames[:] = []
+                continue
+            dirnames[:] = [d for d in dirnames if d != 'thumbs']
+            for filename in filenames:
+                found[posixpath.join(rel_dir, filename)] = os.path.getsize(os.path.join(dirpath, filename))
+        return found
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        files = self._scan()
+
+        # Кто на что ссылается (только строки, ещё не переведённые на хэши)
+        refs = defaultdict(list)
+        for pk, name in ProductImage.objects.filter(content_hash='').values_list('pk', 'image'):
+            refs[name].append(pk)
+
+        groups = defaultdict(list)
+        for name in files:
+            with default_storage.open(name, 'rb') as fh:
+                groups[imagestore.content_hash(fh)].append(name)
+
+        moved_rows = removed = freed = 0
+        for digest, names in groups.items():
+            referenced = [n for n in names if n in refs]
+            if not referenced:
+                continue  # сирот не трогаем — это не дубликаты, а мусор для отдельной чистки
+            with default_storage.open(referenced[0], 'rb') as fh:
+                target = imagestore.cas_name(digest, imagestore.image_extension(fh, referenced[0]))
+            pks = [pk for n in referenced for pk in refs[n]]
+            self.stdout.write(f'{digest[:12]}: {len(names)} файл(ов), {len(pks)} фото -> {target}')
+            if dry_run:
+                moved_rows += len(pks)
+                removed += len(referenced)
+                freed += sum(files[n] for n in referenced) - files[referenced[0]]
+                continue
+
+            # Под блокировкой файла: release() параллельного удаления не снесёт его до переноса строк
+            with imagestore.locked(target), transaction.atomic():
+                with default_storage.open(referenced[0], 'rb') as fh:
+                    imagestore.write_missing(target, fh)
+                moved_rows += ProductImage.objects.filter(pk__in=pks).update(
+                    image=target, content_hash=digest, thumbs_ready=thumbnails.derivatives_exist(target),
+                )
+            for name in referenced:
+                freed += files[name]
+                imagestore.delete_file(name)
+                removed += 1
+            freed -= files[referenced[0]]
+
+        verb = 'Будет перенесено' if dry_run else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {moved_rows} фото; файлов убрано: {removed}; освобождено ~{freed / 1024 / 1024:.1f} МБ.'
+        ))
+        if not dry_run and moved_rows:
+            self.stdout.write('Для фото без превью запустите: manage.py regenerate_thumbnails --missing')
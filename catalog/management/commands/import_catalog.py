@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importer import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт каталога из CSV/JSONL (upsert товаров по артикулу, вариантов по SKU). '
+        'Поля: sku, article, size, color, name, brand, category, description, price, barcodes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или «-» для stdin')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='По умолчанию — по расширению файла')
+        parser.add_argument('--delimiter', default=',', help='Разделитель CSV (по умолчанию «,»)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Строк в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='Всё проверить и откатить')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        importer = CatalogImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        try:
+            fh = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть {path}: {exc}')
+        with fh:
+            stats = importer.run(read_rows(fh, fmt, options['delimiter']))
+
+        for error in stats.errors:
+            self.stderr.write(error)
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Строк: {stats.rows}, создано: {stats.created}, обновлено: {stats.updated}, '
+            f'без изменений: {stats.unchanged}, пропущено: {stats.skipped}, новых вариантов: {stats.variants}, '
+            f'штрихкодов: {stats.barcodes}. '
+            f'{stats.elapsed:.1f} с, {stats.rows_per_sec:.0f} строк/с.'
+        ))
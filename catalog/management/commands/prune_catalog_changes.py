@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog import sync
+from catalog.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Чистит журнал синхронизации касс. Кассы с токеном старше оставшегося '
+        'журнала получат полную выгрузку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(days=options['keep_days'])
+        # Последняя запись остаётся всегда: по ней видно, докуда журнал чистили,
+        # и старый токен кассы не примут за свежий
+        deleted, _ = (
+            CatalogChange.objects
+            .filter(created_at__lt=border)
+            .exclude(id=sync.current_token())
+            .delete()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает полнотекстовый индекс каталога'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write('FTS5 доступен только на SQLite — перестраивать нечего.')
+            return
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,55 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+
+from catalog import thumbnails
+from catalog.models import ProductImage
+
+
+def _init_worker():
+    # При spawn (Windows/macOS) дочерний процесс стартует «с нуля»
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arm_seller_project.settings')
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Массово (пере)создаёт превью WebP/JPEG для фото товаров в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Число процессов (по умолчанию — по числу ядер)')
+        parser.add_argument('--missing', action='store_true',
+                            help='Только фото, у которых превью ещё не готовы (готовые файлы не пересоздаются)')
+
+    def handle(self, *args, **options):
+        qs = ProductImage.objects.exclude(image='')
+        if options['missing']:
+            qs = qs.filter(thumbs_ready=False)
+        # Один файл может принадлежать нескольким фото — генерируем его один раз
+        names = sorted(set(qs.values_list('image', flat=True)))
+        if not names:
+            self.stdout.write('Нечего генерировать.')
+            return
+
+        started = time.monotonic()
+        done, failed = [], 0
+        generate = partial(thumbnails.generate_for_name, force=not options['missing'])
+        # Воркеры только пишут файлы; отметки в БД ставит родитель
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            for name, ok in zip(names, pool.map(generate, names, chunksize=8)):
+                if ok:
+                    done.append(name)
+                else:
+                    failed += 1
+
+        for i in range(0, len(done), 500):
+            ProductImage.objects.filter(image__in=done[i:i + 500]).update(thumbs_ready=True)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(done)} файлов, ошибок: {failed}, {elapsed:.1f} с.'
+        ))
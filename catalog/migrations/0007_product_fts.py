@@ -0,0 +1,39 @@
+# Полнотекстовый индекс каталога (SQLite FTS5)
+
+from django.db import migrations
+
+FTS_TABLE = 'catalog_product_fts'
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, description, brand, category, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, description, brand, category) "
+        "SELECT p.id, p.name, p.description, COALESCE(b.name, ''), COALESCE(c.name, '') "
+        "FROM catalog_product p "
+        "LEFT JOIN catalog_brand b ON b.id = p.brand_id "
+        "LEFT JOIN catalog_category c ON c.id = p.category_id"
+    )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_delete_productvariant'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_main_image(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    cover = (
+        ProductImage.objects
+        .filter(product=models.OuterRef('pk'))
+        .order_by('-is_main', 'id')
+        .values('pk')[:1]
+    )
+    Product.objects.update(main_image=models.Subquery(cover))
+
+
+def dedupe_main_images(apps, schema_editor):
+    """Одно главное фото на товар (первое по id) — иначе не создать уникальное ограничение."""
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    earlier = ProductImage.objects.filter(
+        product=models.OuterRef('product'), is_main=True, id__lt=models.OuterRef('id'),
+    )
+    ProductImage.objects.filter(is_main=True).filter(models.Exists(earlier)).update(is_main=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_product_name_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='main_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.productimage', verbose_name='Главное фото'),
+        ),
+        migrations.RunPython(dedupe_main_images, migrations.RunPython.noop),
+        migrations.RunPython(backfill_main_image, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_main', True)), fields=('product',), name='catalog_productimage_one_main'),
+        ),
+    ]
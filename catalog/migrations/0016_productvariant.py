@@ -0,0 +1,79 @@
+# Возвращаем ProductVariant. Каждому товару создаётся вариант «по умолчанию»
+# с тем же id, что у товара: ссылки остатков, движений и позиций чеков
+# (сейчас это id товаров) остаются валидными без перепривязки.
+
+from django.core.management.color import no_style
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_variants(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductVariant = apps.get_model('catalog', 'ProductVariant')
+
+    # Запасной SKU товара без артикула не должен совпасть ни с чьим артикулом
+    taken = set(Product.objects.exclude(sku=None).exclude(sku='').values_list('sku', flat=True))
+    used = set()
+    batch = []
+    for pk, sku in Product.objects.order_by('pk').values_list('pk', 'sku').iterator():
+        if sku and sku not in used:
+            variant_sku = sku
+        else:
+            variant_sku, n = f'P{pk}', 0
+            while variant_sku in taken or variant_sku in used:
+                n += 1
+                variant_sku = f'P{pk}-{n}'
+        used.add(variant_sku)
+        batch.append(ProductVariant(pk=pk, product_id=pk, sku=variant_sku))
+        if len(batch) >= 1000:
+            ProductVariant.objects.bulk_create(batch)
+            batch = []
+    ProductVariant.objects.bulk_create(batch)
+
+    # id заданы явно — на PostgreSQL и т.п. сдвигаем последовательность
+    connection = schema_editor.connection
+    for sql in connection.ops.sequence_reset_sql(no_style(), [ProductVariant]):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_catalogchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=64, unique=True, verbose_name='SKU')),
+                ('size', models.CharField(blank=True, max_length=16, verbose_name='Размер')),
+                ('color', models.CharField(blank=True, max_length=32, verbose_name='Цвет')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Вариант',
+                'verbose_name_plural': 'Варианты',
+                'ordering': ['product_id', 'id'],
+            },
+        ),
+        migrations.RunPython(create_default_variants, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Артикул'),
+        ),
+        # Штрихкоды переезжают на варианты: id вариантов по умолчанию = id товаров
+        migrations.RenameField(
+            model_name='barcode',
+            old_name='product',
+            new_name='variant',
+        ),
+        migrations.AlterField(
+            model_name='barcode',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='catalog.productvariant', verbose_name='Вариант'),
+        ),
+    ]
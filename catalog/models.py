@@ -1,5 +1,12 @@
-from django.db import models
+import os
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat, Substr
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from . import imagestore, thumbnails
 
 
 class Brand(models.Model):
@@ -14,11 +21,28 @@ class Brand(models.Model):
         return self.name
 
 
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, category, include_self=True):
+        """
+        Категория и все её потомки одним диапазонным запросом по индексу path:
+        '/1/5/' <= path < '/1/50' ('0' — следующий символ после '/').
+        """
+        qs = self.filter(path__gte=category.path, path__lt=category.path[:-1] + '0')
+        if not include_self:
+            qs = qs.exclude(pk=category.pk)
+        return qs
+
+
 class Category(models.Model):
     name = models.CharField('Категория', max_length=120, unique=True)
     parent = models.ForeignKey(
         'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='children'
     )
+    # Материализованный путь из id предков: '/1/5/12/'. Поддерживается в save()
+    path = models.CharField('Путь', max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField('Уровень', default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Категория'
@@ -28,38 +52,208 @@ class Category(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if f'/{self.pk}/' in parent_path:
+                raise ValidationError('Нельзя вложить категорию в её же подкатегорию.')
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_path = self.path
+            super().save(*args, **kwargs)
+            parent_path = '/'
+            if self.parent_id:
+                parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or '/'
+            new_path = f'{parent_path}{self.pk}/'
+            if new_path == old_path:
+                return
+            depth = new_path.count('/') - 2
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+            if old_path:
+                # Переносим всё поддерево одним UPDATE: меняем префикс пути и уровень
+                (Category.objects
+                 .filter(path__gte=old_path, path__lt=old_path[:-1] + '0')
+                 .exclude(pk=self.pk)
+                 .update(path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                         depth=F('depth') + (depth - self.depth)))
+            self.path, self.depth = new_path, depth
+
+    @classmethod
+    def rebuild_paths(cls) -> int:
+        """Пересчитать пути всего дерева (после удаления узла, для ремонта)."""
+        rows = {pk: (parent_id, path) for pk, parent_id, path in cls.objects.values_list('pk', 'parent_id', 'path')}
+        computed = {}
+
+        def path_of(pk, seen=()):
+            if pk not in computed:
+                parent_id = rows[pk][0]
+                if parent_id is None or parent_id not in rows or parent_id in seen:
+                    computed[pk] = f'/{pk}/'
+                else:
+                    computed[pk] = f'{path_of(parent_id, seen + (pk,))}{pk}/'
+            return computed[pk]
+
+        changed = []
+        for pk, (_, path) in rows.items():
+            new_path = path_of(pk)
+            if new_path != path:
+                changed.append(cls(pk=pk, path=new_path, depth=new_path.count('/') - 2))
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        return len(changed)
+
 
 class Product(models.Model):
     name = models.CharField('Название', max_length=255)
+    # Артикул модели; SKU конкретного размера/цвета — у ProductVariant
+    sku = models.CharField('Артикул', max_length=64, unique=True, null=True, blank=True)
     brand = models.ForeignKey(Brand, null=True, blank=True, on_delete=models.SET_NULL, verbose_name='Бренд')
     category = models.ForeignKey(
         Category, null=True, blank=True, on_delete=models.SET_NULL, verbose_name='Категория'
     )
     description = models.TextField('Описание', blank=True)
+    price = models.DecimalField('Цена', max_digits=10, decimal_places=2, default=0)
+    # Денормализованная ссылка на обложку: поддерживается ProductImage.save()/сигналами,
+    # чтобы списки получали фото через select_related без лишних запросов
+    main_image = models.ForeignKey(
+        'ProductImage', null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='+', editable=False, verbose_name='Главное фото',
+    )
 
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['name']
+        indexes = [
+            # keyset-пагинация списка товаров
+            models.Index(fields=['name', 'id'], name='catalog_product_name_id'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
-    @property
-    def main_image(self):
+    def save(self, *args, **kwargs):
+        # Пустой артикул храним как NULL, иначе упрёмся в unique
+        self.sku = (self.sku or '').strip() or None
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Обложку ведёт refresh_main_images(): значение в памяти могло устареть
+            # (фото добавили/удалили после загрузки товара) — обычное сохранение его не пишет
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'main_image' and f.attname not in deferred
+            ]
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def refresh_main_images(cls, product_ids=None) -> int:
+        """
+        Пересчитывает обложку одним UPDATE: фото с is_main, иначе первое по id.
+        product_ids=None — для всех товаров.
         """
-        Удобный доступ к главной картинке: вернёт изображение, помеченное как is_main,
-        иначе — первое по порядку; иначе — None.
+        cover = (
+            ProductImage.objects
+            .filter(product=OuterRef('pk'))
+            .order_by('-is_main', 'id')
+            .values('pk')[:1]
+        )
+        qs = cls.objects.all()
+        if product_ids is not None:
+            qs = qs.filter(pk__in=product_ids)
+        return qs.update(main_image=Subquery(cover))
+
+
+class ProductVariantQuerySet(models.QuerySet):
+    def by_code(self, code: str):
         """
-        img = self.images.filter(is_main=True).first()
-        if img:
-            return img
-        return self.images.first()
+        Вариант по штрихкоду или SKU — индексированным поиском (unique-индексы
+        Barcode.code и ProductVariant.sku), с товаром за один запрос.
+        """
+        code = code.strip()
+        qs = self.select_related('product')
+        return qs.filter(barcodes__code=code).first() or qs.filter(sku=code).first()
+
+
+class ProductVariant(models.Model):
+    """Продаваемая единица: конкретный размер/цвет товара со своим SKU."""
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='variants', verbose_name='Товар'
+    )
+    sku = models.CharField('SKU', max_length=64, unique=True)
+    size = models.CharField('Размер', max_length=16, blank=True)
+    color = models.CharField('Цвет', max_length=32, blank=True)
+    # Пусто — действует цена товара
+    price = models.DecimalField('Цена', max_digits=10, decimal_places=2, null=True, blank=True)
+
+    objects = ProductVariantQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Вариант'
+        verbose_name_plural = 'Варианты'
+        ordering = ['product_id', 'id']
+
+    def __str__(self) -> str:
+        return f'{self.product} {self.name}'.strip() if self.name else f'{self.product} ({self.sku})'
+
+    @property
+    def name(self) -> str:
+        """Размер и цвет одной строкой (пусто для варианта «по умолчанию»)."""
+        return ' / '.join(v for v in (self.size, self.color) if v)
+
+    @property
+    def effective_price(self):
+        return self.price if self.price is not None else self.product.price
+
+    def save(self, *args, **kwargs):
+        self.sku = self.sku.strip()
+        return super().save(*args, **kwargs)
+
+
+class Barcode(models.Model):
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.CASCADE, related_name='barcodes', verbose_name='Вариант'
+    )
+    code = models.CharField('Штрихкод', max_length=64, unique=True)
+
+    class Meta:
+        verbose_name = 'Штрихкод'
+        verbose_name_plural = 'Штрихкоды'
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        return self.code
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip()
+        return super().save(*args, **kwargs)
+
+
+class CatalogChange(models.Model):
+    """
+    Журнал изменений каталога для дельта-синхронизации касс.
+    id (AUTOINCREMENT) — монотонный счётчик и токен синхронизации.
+    """
+    product_id = models.BigIntegerField('Товар', db_index=True)
+    deleted = models.BooleanField('Удалён', default=False)
+    created_at = models.DateTimeField('Когда', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение каталога'
+        verbose_name_plural = 'Изменения каталога'
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        return f'#{self.pk} товар {self.product_id}{" (удалён)" if self.deleted else ""}'
 
 
 def product_image_upload_to(instance: 'ProductImage', filename: str) -> str:
+    # Новые загрузки хэшируются и пишутся в save(): media/products/sha256/<ab>/<хэш>.<ext>
+    if instance.content_hash:
+        return imagestore.cas_name(instance.content_hash, os.path.splitext(filename)[1].lower())
     # Путь хранения: media/products/<год>/<месяц>/<имя файла>
-    return f'products/{instance.created_at:%Y}/{instance.created_at:%m}/{filename}'
+    # (created_at ещё пуст при первом сохранении — auto_now_add срабатывает позже)
+    created = instance.created_at or timezone.now()
+    return f'products/{created:%Y}/{created:%m}/{filename}'
 
 
 class ProductImage(models.Model):
@@ -68,12 +262,19 @@ class ProductImage(models.Model):
     )
     image = models.ImageField('Фото', upload_to=product_image_upload_to)
     is_main = models.BooleanField('Основное', default=False)
+    thumbs_ready = models.BooleanField('Превью готовы', default=False, editable=False)
+    content_hash = models.CharField('SHA-256', max_length=64, blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = 'Фото товара'
         verbose_name_plural = 'Фото товара'
         ordering = ['-is_main', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'], condition=Q(is_main=True), name='catalog_productimage_one_main',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.product} — {self.image.name if self.image else "без файла"}'
@@ -87,7 +288,64 @@ class ProductImage(models.Model):
             if qs.exists():
                 raise ValidationError('У этого товара уже есть основная фотография.')
 
+    # ---- превью (см. catalog/thumbnails.py) ----
+
+    def thumb_url(self, size: int, fmt: str = 'webp') -> str:
+        """URL превью; пока превью не готовы — URL оригинала."""
+        if not self.image:
+            return ''
+        if not self.thumbs_ready:
+            return self.image.url
+        return self.image.storage.url(thumbnails.derivative_name(self.image.name, size, fmt))
+
+    def srcset(self, fmt: str = 'webp') -> str:
+        if not self.thumbs_ready:
+            return ''
+        return ', '.join(f'{self.thumb_url(size, fmt)} {size}w' for size in thumbnails.THUMB_SIZES)
+
+    @property
+    def srcset_webp(self) -> str:
+        return self.srcset('webp')
+
+    @property
+    def srcset_jpeg(self) -> str:
+        return self.srcset('jpeg')
+
+    @property
+    def thumb_small(self) -> str:
+        return self.thumb_url(thumbnails.THUMB_SIZES[0])
+
+    @property
+    def thumb_url_card(self) -> str:
+        return self.thumb_url(thumbnails.THUMB_SIZES[1], 'jpeg')
+
     def save(self, *args, **kwargs):
-        # Валидация при сохранении через админку/ORM
-        self.full_clean()
-        return super().save(*args, **kwargs)
+        new_file = bool(self.image) and not self.image._committed
+        replaced = None
+        if new_file:
+            if self.pk:
+                # Файл заменили — старый отпустим после коммита
+                replaced = ProductImage.objects.filter(pk=self.pk).values_list('image', flat=True).first()
+            upload = self.image.file
+            self.content_hash = imagestore.content_hash(upload)
+            stored = imagestore.cas_name(self.content_hash, imagestore.image_extension(upload, self.image.name))
+            # Такие байты уже могут быть в хранилище — тогда ссылаемся на них, не записывая копию
+            imagestore.store(stored, upload)
+            self.image.name = stored
+            self.image._committed = True
+            self.thumbs_ready = thumbnails.derivatives_exist(stored)
+        # Проверку «одно главное фото» для форм делает clean(); здесь же просто
+        # снимаем флаг с остальных фото и пересчитываем обложку — в одной транзакции
+        with transaction.atomic():
+            if self.is_main:
+                (ProductImage.objects
+                 .filter(product_id=self.product_id, is_main=True)
+                 .exclude(pk=self.pk)
+                 .update(is_main=False))
+            super().save(*args, **kwargs)
+            Product.refresh_main_images([self.product_id])
+            if new_file:
+                # Файл мог уйти в release() до нашего коммита — сверяемся уже под блокировкой
+                transaction.on_commit(lambda: imagestore.confirm(stored, upload))
+            if replaced and replaced != self.image.name:
+                transaction.on_commit(lambda: imagestore.release(replaced))
@@ -0,0 +1,88 @@
+# catalog/pagination.py
+"""
+Keyset-пагинация: следующая страница выбирается условием «после последней
+строки» по индексируемым полям сортировки, а не OFFSET. Стоимость страницы
+не зависит от её номера, в памяти — не больше per_page + 1 объектов.
+
+Курсор — непрозрачная base64-строка со значениями полей последней строки.
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _split(ordering):
+    return [(f[1:], True) if f.startswith('-') else (f, False) for f in ordering]
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, token):
+    """Значения полей из курсора или None, если курсор пустой/битый."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    fields = _split(ordering)
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        return [model._meta.get_field(name).to_python(v) for (name, _), v in zip(fields, values)]
+    except ValidationError:
+        return None
+
+
+def _after(ordering, values) -> Q:
+    """(a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), с учётом направления каждого поля."""
+    fields = _split(ordering)
+    parts = []
+    for i, (name, desc) in enumerate(fields):
+        cond = {n: v for (n, _), v in zip(fields[:i], values[:i])}
+        cond[f'{name}__{"lt" if desc else "gt"}'] = values[i]
+        parts.append(Q(**cond))
+    return reduce(or_, parts)
+
+
+def keyset_paginate(qs, ordering, cursor=None, per_page=50) -> KeysetPage:
+    """
+    ordering должен однозначно упорядочивать строки (последним полем — id).
+    """
+    qs = qs.order_by(*ordering)
+    values = decode_cursor(qs.model, ordering, cursor)
+    if values is not None:
+        qs = qs.filter(_after(ordering, values))
+
+    rows = list(qs[:per_page + 1])
+    if len(rows) <= per_page:
+        return KeysetPage(rows)
+    rows = rows[:per_page]
+    last = rows[-1]
+    next_cursor = encode_cursor([getattr(last, name) for name, _ in _split(ordering)])
+    return KeysetPage(rows, next_cursor)
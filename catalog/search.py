@@ -0,0 +1,174 @@
+# catalog/search.py
+"""
+Полнотекстовый поиск по каталогу.
+
+На SQLite используется виртуальная таблица FTS5 ``catalog_product_fts``
+(rowid = id товара, колонки: название, описание, бренд, категория).
+Индекс создаётся миграцией и поддерживается сигналами (см. catalog/signals.py).
+На других СУБД — запасной вариант через icontains.
+
+Коды (артикул товара, SKU варианта, штрихкод) в индекс не входят: запрос,
+похожий на код, дополнительно ищется точным совпадением по unique-индексам.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'catalog_product_fts'
+
+# Сколько результатов отдаём в «живом» поиске кассы
+SEARCH_LIMIT = 20
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Один и тот же SELECT используется и для полной перестройки, и для точечной
+_SOURCE_SQL = (
+    'SELECT p.id, p.name, p.description, COALESCE(b.name, \'\'), COALESCE(c.name, \'\') '
+    'FROM catalog_product p '
+    'LEFT JOIN catalog_brand b ON b.id = p.brand_id '
+    'LEFT JOIN catalog_category c ON c.id = p.category_id'
+)
+
+
+def is_available() -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def build_match(q: str) -> str:
+    """
+    Превращает пользовательский ввод в FTS5-запрос: каждое слово —
+    префиксный терм в кавычках (без операторов FTS), все термы через AND.
+    """
+    tokens = _TOKEN_RE.findall(q.lower())
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+# ---- поддержка индекса ----
+
+def _reindex(where: str, params) -> None:
+    if not is_available():
+        return
+    with connection.cursor() as cur:
+        cur.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT p.id FROM catalog_product p WHERE {where})',
+            params,
+        )
+        cur.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, brand, category) {_SOURCE_SQL} WHERE {where}',
+            params,
+        )
+
+
+def reindex_products(ids, batch_size: int = 500) -> None:
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        placeholders = ', '.join(['%s'] * len(batch))
+        _reindex(f'p.id IN ({placeholders})', batch)
+
+
+def reindex_brand(brand_id: int) -> None:
+    _reindex('p.brand_id = %s', [brand_id])
+
+
+def reindex_category(category_id: int) -> None:
+    _reindex('p.category_id = %s', [category_id])
+
+
+def remove_products(ids) -> None:
+    ids = list(ids)
+    if not ids or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cur:
+        cur.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', ids)
+
+
+def rebuild() -> None:
+    """Полная перестройка индекса (миграция, ручной ремонт)."""
+    if not is_available():
+        return
+    with connection.cursor() as cur:
+        cur.execute(f'DELETE FROM {FTS_TABLE}')
+        cur.execute(f'INSERT INTO {FTS_TABLE} (rowid, name, description, brand, category) {_SOURCE_SQL}')
+
+
+# ---- запросы ----
+
+def _code_q(q: str):
+    """Точное совпадение с артикулом, SKU варианта или штрихкодом; None — запрос не похож на код."""
+    from catalog.models import Barcode, ProductVariant
+
+    code = q.strip()
+    if not code or len(code) > 64 or any(ch.isspace() for ch in code):
+        return None
+    return (
+        Q(sku=code)
+        | Q(id__in=ProductVariant.objects.filter(sku=code).values('product_id'))
+        | Q(id__in=Barcode.objects.filter(code=code).values('variant__product_id'))
+    )
+
+
+def _fallback_q(q: str) -> Q:
+    cond = Q()
+    for token in _TOKEN_RE.findall(q):
+        cond &= (
+            Q(name__icontains=token)
+            | Q(description__icontains=token)
+            | Q(brand__name__icontains=token)
+            | Q(category__name__icontains=token)
+        )
+    return cond
+
+
+def filter_products(qs, q: str):
+    """
+    Ограничивает queryset товаров совпадениями по запросу.
+    Сортировку не трогает — её задаёт вызывающий код.
+    """
+    match = build_match(q)
+    if not match:
+        return qs
+    if not is_available():
+        cond = _fallback_q(q)
+    else:
+        cond = Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    code = _code_q(q)
+    return qs.filter(cond | code if code else cond)
+
+
+def search_ids(q: str, limit: int = SEARCH_LIMIT) -> list:
+    """
+    Id товаров, отсортированные по релевантности (bm25; название весит больше).
+    Точное совпадение по коду — впереди всех.
+    """
+    from catalog.models import Product
+
+    match = build_match(q)
+    if not match:
+        return []
+    code = _code_q(q)
+    ids = list(Product.objects.filter(code).values_list('id', flat=True)[:limit]) if code else []
+    if not is_available():
+        found = Product.objects.filter(_fallback_q(q)).exclude(id__in=ids).values_list('id', flat=True)
+        return ids + list(found[:limit - len(ids)])
+    with connection.cursor() as cur:
+        cur.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 3.0, 3.0) LIMIT %s',
+            [match, limit],
+        )
+        seen = set(ids)
+        ids += [row[0] for row in cur.fetchall() if row[0] not in seen]
+    return ids[:limit]
+
+
+def search_products(qs, q: str, limit: int = SEARCH_LIMIT) -> list:
+    """Товары из queryset в порядке релевантности."""
+    ids = search_ids(q, limit)
+    if not ids:
+        return []
+    rank = Case(*[When(id=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return list(qs.filter(id__in=ids).order_by(rank))
@@ -0,0 +1,127 @@
+# catalog/signals.py
+"""
+Поддержка производных данных каталога в актуальном состоянии:
+поисковый индекс, кэш штрихкодов, дерево категорий, журнал синхронизации касс,
+кэш карточек товаров.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import barcodes, detail_cache, imagestore, search, sync, tree
+from .models import Barcode, Brand, Category, Product, ProductImage, ProductVariant
+
+
+def _touch(product_ids, deleted=False):
+    """Карточки товаров изменились: в журнал синхронизации и из кэша страниц."""
+    product_ids = list(product_ids)
+    sync.record(product_ids, deleted=deleted)
+    detail_cache.invalidate(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.reindex_products([instance.pk])
+    barcodes.products_changed([instance.pk])
+    _touch([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Варианты (и их коды) снимаются из кэша своими сигналами при каскадном удалении
+    search.remove_products([instance.pk])
+    _touch([instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=Brand)
+def brand_saved(sender, instance, created=False, raw=False, **kwargs):
+    # У нового бренда ещё нет товаров
+    if raw or created:
+        return
+    product_ids = list(instance.product_set.values_list('pk', flat=True))
+    search.reindex_brand(instance.pk)
+    barcodes.products_changed(product_ids)
+    _touch(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    # Путь потомков Category.save() обновляет уже после сигнала — сбрасываем дерево по коммиту
+    transaction.on_commit(tree.invalidate)
+    if not created:
+        search.reindex_category(instance.pk)
+        _touch(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Brand)
+@receiver(pre_delete, sender=Category)
+def brand_or_category_deleting(sender, instance, **kwargs):
+    # После удаления у товаров будет brand/category = NULL (обычным UPDATE, без сигналов) —
+    # запоминаем, кого это коснётся
+    instance._affected_product_ids = list(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Brand)
+def brand_deleted(sender, instance, **kwargs):
+    product_ids = getattr(instance, '_affected_product_ids', [])
+    search.reindex_products(product_ids)
+    barcodes.products_changed(product_ids)
+    _touch(product_ids)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Дочерние категории осиротели (parent -> NULL) — их пути надо пересчитать
+    Category.rebuild_paths()
+    transaction.on_commit(tree.invalidate)
+    product_ids = getattr(instance, '_affected_product_ids', [])
+    search.reindex_products(product_ids)
+    _touch(product_ids)
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    barcodes.variants_changed([instance.pk])
+    _touch([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductVariant)
+def variant_deleted(sender, instance, **kwargs):
+    barcodes.variants_changed([instance.pk])
+    _touch([instance.product_id])
+
+
+@receiver(post_save, sender=Barcode)
+@receiver(post_delete, sender=Barcode)
+def barcode_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Код мог смениться — перечитываем вариант целиком, старый код уйдёт вместе с ним
+    barcodes.variants_changed([instance.variant_id])
+    product_id = ProductVariant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True).first()
+    if product_id is not None:
+        _touch([product_id])
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Обложка товара могла смениться
+    _touch([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductImage)
+def product_image_deleted(sender, instance, **kwargs):
+    # Удалили обложку (или любое фото) — выбираем новую
+    Product.refresh_main_images([instance.product_id])
+    _touch([instance.product_id])
+    # Файл общий для всех фото с тем же именем — удаляем, только если ссылок не осталось
+    name = instance.image.name
+    transaction.on_commit(lambda: imagestore.release(name))
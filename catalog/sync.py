@@ -0,0 +1,110 @@
+# catalog/sync.py
+"""
+Дельта-синхронизация каталога для касс.
+
+Каждое изменение товара (или того, что попадает в его карточку: бренд,
+категория, варианты и их штрихкоды, обложка) пишется строкой в CatalogChange. Её id —
+монотонный токен: касса присылает последний полученный токен и получает
+только товары, изменённые после него.
+"""
+from collections import defaultdict
+
+from django.db.models import Max, Min
+
+from .models import Barcode, CatalogChange, Product, ProductVariant
+
+# 2 — товары отдаются с вложенными вариантами (SKU, размер, цвет, цена, штрихкоды)
+API_VERSION = 2
+PAGE_SIZE = 1000
+
+
+def record(product_ids, deleted: bool = False) -> None:
+    CatalogChange.objects.bulk_create(
+        [CatalogChange(product_id=pk, deleted=deleted) for pk in product_ids], batch_size=1000
+    )
+
+
+def current_token() -> int:
+    return CatalogChange.objects.aggregate(m=Max('id'))['m'] or 0
+
+
+def oldest_token() -> int:
+    """
+    Токены младше этого уже вычищены из журнала — нужна полная синхронизация.
+    Последнюю запись prune_catalog_changes не трогает, поэтому пустой журнал
+    бывает только у базы без единого изменения.
+    """
+    first = CatalogChange.objects.aggregate(m=Min('id'))['m']
+    return first - 1 if first else current_token()
+
+
+def payloads(products) -> list:
+    products = list(products)
+    codes = defaultdict(list)
+    for variant_id, code in (
+        Barcode.objects.filter(variant__product__in=products).values_list('variant_id', 'code')
+    ):
+        codes[variant_id].append(code)
+    variants = defaultdict(list)
+    for v in ProductVariant.objects.filter(product__in=products).values(
+        'pk', 'product_id', 'sku', 'size', 'color', 'price'
+    ):
+        variants[v['product_id']].append(v)
+    return [
+        {
+            'id': p.pk,
+            'sku': p.sku or '',
+            'name': p.name,
+            'brand': p.brand.name if p.brand else '',
+            'category_id': p.category_id,
+            'category': p.category.name if p.category else '',
+            'price': str(p.price),
+            'variants': [
+                {
+                    'id': v['pk'],
+                    'sku': v['sku'],
+                    'size': v['size'],
+                    'color': v['color'],
+                    'price': str(v['price'] if v['price'] is not None else p.price),
+                    'barcodes': codes.get(v['pk'], []),
+                }
+                for v in variants.get(p.pk, ())
+            ],
+            'image': p.main_image.thumb_url_card if p.main_image else '',
+        }
+        for p in products
+    ]
+
+
+def _products():
+    return Product.objects.select_related('brand', 'category', 'main_image').order_by('pk')
+
+
+def full_page(after: int = 0, limit: int = PAGE_SIZE):
+    """Страница полной выгрузки по id товара: (товары, курсор следующей страницы | None)."""
+    products = list(_products().filter(pk__gt=after)[:limit + 1])
+    more = len(products) > limit
+    products = products[:limit]
+    return payloads(products), (products[-1].pk if more else None)
+
+
+def delta(since: int, limit: int = PAGE_SIZE):
+    """
+    Изменения после токена since: (товары, удалённые id, новый токен, есть ли ещё).
+    За одну страницу обрабатывается не больше limit записей журнала.
+    """
+    rows = list(
+        CatalogChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'product_id', 'deleted')[:limit]
+    )
+    if not rows:
+        return [], [], since, False
+    # Для каждого товара важно только последнее состояние
+    last = {}
+    for _, product_id, deleted in rows:
+        last[product_id] = deleted
+    changed = [pk for pk, deleted in last.items() if not deleted]
+    products = payloads(_products().filter(pk__in=changed))
+    found = {p['id'] for p in products}
+    # Товар мог быть удалён позже, чем захватила эта страница журнала
+    deleted = sorted(pk for pk, was_deleted in last.items() if was_deleted or pk not in found)
+    return products, deleted, rows[-1][0], len(rows) == limit
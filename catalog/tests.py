@@ -1,3 +1,292 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from catalog import barcodes, imagestore, search, thumbnails, tree
+from catalog.importer import CatalogImporter, read_rows
+from catalog.models import Barcode, Category, Product, ProductImage, ProductVariant
+from inventory.models import InventoryItem
+
+
+class ImporterTests(TestCase):
+    def test_bad_jsonl_lines_are_skipped(self):
+        fh = io.StringIO(
+            '{"sku": "A1", "name": "Футболка", "price": "10"}\n'
+            '{битая строка\n'
+            '[1, 2]\n'
+            '{"sku": "A2", "name": "Шорты", "price": "abc"}\n'
+            '{"sku": "A3", "name": "Кепка", "price": "5,50"}\n'
+        )
+        stats = CatalogImporter(batch_size=2).run(read_rows(fh, 'jsonl'))
+        self.assertEqual(stats.skipped, 3)
+        self.assertIn("некорректная цена: 'abc'", stats.errors[-1])
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'price')),
+            {'A1': 10, 'A3': 5.5},
+        )
+
+
+class MainImageTests(TestCase):
+    def test_save_keeps_cover_set_after_load(self):
+        product = Product.objects.create(name='Футболка')
+        ProductImage.objects.bulk_create([ProductImage(product=product, image='products/a.jpg')])
+        Product.refresh_main_images([product.pk])
+        # В памяти обложки ещё нет — сохранение не должно её затереть
+        product.name = 'Футболка белая'
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.name, 'Футболка белая')
+        self.assertIsNotNone(product.main_image_id)
+
+
+def jpeg_bytes(color='red'):
+    buf = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+@mock.patch('catalog.thumbnails.schedule')
+class ImageStoreTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.product = Product.objects.create(name='Футболка')
+
+    def upload(self, filename, data):
+        image = ProductImage(product=self.product, image=SimpleUploadedFile(filename, data))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        return image
+
+    def stored_files(self):
+        root = os.path.join(self.media, imagestore.CAS_ROOT)
+        return sorted(
+            os.path.relpath(os.path.join(dirpath, f), root)
+            for dirpath, _, files in os.walk(root) for f in files
+        )
+
+    def test_same_bytes_under_other_extension_share_one_file(self, schedule):
+        data = jpeg_bytes()
+        first = self.upload('x.jpg', data)
+        second = self.upload('x.jpeg', data)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        self.assertEqual(len(self.stored_files()), 1)
+        # Вторая загрузка, пока превью не готовы, — задача по тому же файлу, а не по строке
+        self.assertEqual({c.args for c in schedule.call_args_list}, {(first.image.name,)})
+
+        # Одно фото из двух удалили — файл ещё нужен второму
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_thumbnails_are_written_once_per_file(self, schedule):
+        data = jpeg_bytes()
+        first = self.upload('a.jpg', data)
+        second = self.upload('b.jpg', data)
+        thumbnails._generate(first.image.name)
+        thumbnails._generate(first.image.name)
+        thumbnails.generate_for_name(first.image.name, force=True)
+        self.assertEqual(len(self.stored_files()), 1 + len(thumbnails.derivative_names(first.image.name)))
+        self.assertEqual(ProductImage.objects.filter(thumbs_ready=True).count(), 2)
+        # Превью готовы — новая копия тех же байтов сразу с ними, без задачи
+        schedule.reset_mock()
+        third = self.upload('c.png', data)
+        self.assertTrue(ProductImage.objects.get(pk=third.pk).thumbs_ready)
+        schedule.assert_not_called()
+        self.assertEqual(second.image.name, third.image.name)
+
+    def test_file_released_before_commit_is_restored(self, schedule):
+        data = jpeg_bytes()
+        first = self.upload('a.jpg', data)
+        second = ProductImage(product=self.product, image=SimpleUploadedFile('b.jpg', data))
+        with self.captureOnCommitCallbacks() as callbacks:
+            second.save()
+        # Параллельный release() удалил файл, пока строка second ещё не была видна
+        imagestore.delete_file(first.image.name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_thumbnails_are_not_written_for_deleted_image(self, schedule):
+        image = self.upload('a.jpg', jpeg_bytes())
+        name = image.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        # Задача из очереди дошла до файла уже после удаления фото
+        thumbnails._generate(name)
+        self.assertEqual(self.stored_files(), [])
+
+
+class CategoryTreeTests(TestCase):
+    def test_move_subtree(self):
+        clothes = Category.objects.create(name='Одежда')
+        shoes = Category.objects.create(name='Обувь')
+        tops = Category.objects.create(name='Верх', parent=clothes)
+        shirts = Category.objects.create(name='Футболки', parent=tops)
+        tree.get_tree()
+
+        tops.parent = shoes
+        with self.captureOnCommitCallbacks(execute=True):
+            tops.save()
+        self.assertEqual(
+            dict(Category.objects.values_list('pk', 'path')),
+            {
+                clothes.pk: f'/{clothes.pk}/',
+                shoes.pk: f'/{shoes.pk}/',
+                tops.pk: f'/{shoes.pk}/{tops.pk}/',
+                shirts.pk: f'/{shoes.pk}/{tops.pk}/{shirts.pk}/',
+            },
+        )
+        self.assertEqual(Category.objects.get(pk=shirts.pk).depth, 2)
+        # Закэшированное дерево сброшено по коммиту
+        self.assertEqual(sorted(tree.get_tree().subtree_ids(shoes.pk)), sorted([shoes.pk, tops.pk, shirts.pk]))
+        self.assertEqual(tree.get_tree().subtree_ids(clothes.pk), [clothes.pk])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = Product.objects.create(name='Футболка хлопковая', sku='ART-1')
+        variant = ProductVariant.objects.create(product=cls.shirt, sku='ART-1-M', size='M')
+        Barcode.objects.create(variant=variant, code='4600000000017')
+        cls.cap = Product.objects.create(name='Кепка', description='летняя, хлопок')
+
+    def found(self, q):
+        return set(search.filter_products(Product.objects.all(), q).values_list('pk', flat=True))
+
+    def test_text(self):
+        self.assertEqual(self.found('футболк'), {self.shirt.pk})
+        self.assertEqual(search.search_ids('футбол')[0], self.shirt.pk)
+
+    def test_codes(self):
+        for code in ('ART-1', 'ART-1-M', '4600000000017'):
+            with self.subTest(code=code):
+                self.assertEqual(self.found(code), {self.shirt.pk})
+                self.assertEqual(search.search_ids(code), [self.shirt.pk])
+
+
+class BarcodeCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name='Футболка', price=100)
+        cls.variant = ProductVariant.objects.create(product=product, sku='T-M')
+        Barcode.objects.create(variant=cls.variant, code='4600000000017')
+
+    def setUp(self):
+        barcodes.warm()
+
+    def test_change_in_other_process_reaches_hit(self):
+        self.assertEqual(barcodes.lookup('4600000000017')['price'], '100.00')
+        # Другой процесс поменял цену (сигналы сработали там) и известил остальных
+        ProductVariant.objects.filter(pk=self.variant.pk).update(price=150)
+        barcodes.publish([self.variant.pk])
+        self.assertEqual(barcodes.lookup('4600000000017')['price'], '150.00')
+
+    def test_refresh_after_commit_only(self):
+        try:
+            with transaction.atomic():
+                self.variant.sku = 'T-L'
+                self.variant.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIsNone(barcodes.lookup('T-L'))
+        self.assertEqual(barcodes.lookup('T-M')['id'], self.variant.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.sku = 'T-XL'
+            self.variant.save()
+        self.assertEqual(barcodes.lookup('T-XL')['id'], self.variant.pk)
+        self.assertNotIn('T-M', barcodes._index)
+
+    def test_moved_code_keeps_new_owner(self):
+        other = ProductVariant.objects.create(product=self.variant.product, sku='T-S')
+        with self.captureOnCommitCallbacks(execute=True):
+            Barcode.objects.filter(code='4600000000017').update(variant=other)
+            barcodes.variants_changed([other.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            barcodes.variants_changed([self.variant.pk])
+        self.assertEqual(barcodes.lookup('4600000000017')['id'], other.pk)
+
+
+class SyncTests(TestCase):
+    def test_delta_after_full_sync(self):
+        shirt = Product.objects.create(name='Футболка', price=100)
+        cap = Product.objects.create(name='Кепка', price=50)
+        Product.objects.create(name='Шорты', price=80)
+        full = self.client.get('/api/v1/sync/').json()
+        self.assertEqual(full['mode'], 'full')
+        self.assertEqual(len(full['products']), 3)
+
+        shirt.name = 'Футболка белая'
+        shirt.save()
+        cap_pk = cap.pk
+        cap.delete()
+        hat = Product.objects.create(name='Панама', price=70)
+        delta = self.client.get('/api/v1/sync/', {'since': full['token']}).json()
+        self.assertEqual(delta['mode'], 'delta')
+        self.assertEqual(
+            {p['id']: p['name'] for p in delta['products']},
+            {shirt.pk: 'Футболка белая', hat.pk: 'Панама'},
+        )
+        self.assertEqual(delta['deleted'], [cap_pk])
+
+        # Созданный и тут же удалённый товар приходит только в deleted
+        gone = Product.objects.create(name='Носки')
+        gone_pk = gone.pk
+        gone.delete()
+        again = self.client.get('/api/v1/sync/', {'since': delta['token']}).json()
+        self.assertEqual((again['products'], again['deleted']), ([], [gone_pk]))
+        latest = self.client.get('/api/v1/sync/', {'since': again['token']}).json()
+        self.assertEqual((latest['mode'], latest['products'], latest['deleted']), ('delta', [], []))
+
+
+class VariantMigrationTests(TransactionTestCase):
+    before = [
+        ('catalog', '0015_catalogchange'),
+        ('inventory', '0002_alter_inventoryitem_options_and_more'),
+        ('sales', '0003_alter_sale_options_alter_saleitem_options_and_more'),
+    ]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_default_variants_keep_product_ids(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        self.addCleanup(self.migrate, latest)
+        apps = self.migrate(self.before)
+        OldProduct = apps.get_model('catalog', 'Product')
+        shirt = OldProduct.objects.create(name='Футболка', sku='ART-1', price=100)
+        cap = OldProduct.objects.create(name='Кепка', price=50)
+        apps.get_model('catalog', 'Barcode').objects.create(product=shirt, code='4600000000017')
+        warehouse = apps.get_model('inventory', 'Warehouse').objects.create(name='Основной', slug='main')
+        apps.get_model('inventory', 'InventoryItem').objects.create(warehouse=warehouse, variant=cap, qty=3)
+
+        self.migrate(latest)
+        self.assertEqual(
+            list(ProductVariant.objects.values_list('pk', 'product_id', 'sku')),
+            [(shirt.pk, shirt.pk, 'ART-1'), (cap.pk, cap.pk, f'P{cap.pk}')],
+        )
+        self.assertEqual(Barcode.objects.get(code='4600000000017').variant_id, shirt.pk)
+        self.assertEqual(InventoryItem.objects.get().variant.product_id, cap.pk)
+        # Последовательность id сдвинута: новый вариант не наступает на старые
+        self.assertGreater(ProductVariant.objects.create(product_id=cap.pk, sku='NEW').pk, cap.pk)
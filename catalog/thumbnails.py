@@ -0,0 +1,166 @@
+# catalog/thumbnails.py
+"""
+Производные изображения товаров: превью фиксированной ширины в WebP и JPEG.
+
+Лежат рядом с оригиналом, путь предсказуем по имени файла:
+    products/2025/11/photo.jpg  ->  products/2025/11/thumbs/photo_320.webp
+
+Генерация идёт вне запроса: после коммита ProductImage.save() ставит задачу
+в пул потоков — одну на файл, пока она не выполнена; готовые превью не
+пересоздаются. Каждое превью пишется атомарно (временный файл + os.replace).
+Массовая перегенерация — manage.py regenerate_thumbnails.
+"""
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+from . import detail_cache
+
+logger = logging.getLogger(__name__)
+
+# Ширины превью (px): админка, карточка в сетке, крупная карточка / retina
+THUMB_SIZES = (64, 320, 640)
+# формат -> (расширение, параметры Pillow)
+THUMB_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+# Файлы, для которых задача уже в пуле
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def derivative_name(name: str, size: int, fmt: str) -> str:
+    folder, filename = posixpath.split(name)
+    stem = os.path.splitext(filename)[0]
+    return posixpath.join(folder, 'thumbs', f'{stem}_{size}.{THUMB_FORMATS[fmt][0]}')
+
+
+def derivative_names(name: str) -> list:
+    return [derivative_name(name, size, fmt) for size in THUMB_SIZES for fmt in THUMB_FORMATS]
+
+
+def derivatives_exist(name: str) -> bool:
+    return all(default_storage.exists(target) for target in derivative_names(name))
+
+
+def _render(img, size: int, fmt: str) -> bytes:
+    thumb = img.copy()
+    thumb.thumbnail((size, size * 4), Image.LANCZOS)  # ограничиваем по ширине
+    if fmt == 'jpeg' and thumb.mode != 'RGB':
+        # У JPEG нет прозрачности — кладём на белый фон
+        background = Image.new('RGB', thumb.size, (255, 255, 255))
+        rgba = thumb.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        thumb = background
+    buf = BytesIO()
+    thumb.save(buf, **THUMB_FORMATS[fmt][1])
+    return buf.getvalue()
+
+
+def _write(target: str, data: bytes) -> None:
+    """Записать превью поверх прежнего: читатель видит старый файл или новый, копий с суффиксом нет."""
+    try:
+        path = default_storage.path(target)
+    except NotImplementedError:
+        # Хранилище без локальных путей — удалить и записать заново
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(data))
+        return
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        mode = getattr(default_storage, 'file_permissions_mode', None)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def generate_for_name(name: str, force: bool = False) -> bool:
+    """
+    Создаёт все превью для файла в хранилище; уже готовые (все до одного)
+    не пересоздаёт без force. Не трогает БД — можно вызывать из пула
+    процессов. Возвращает False, если исходник не читается.
+    """
+    if not force and derivatives_exist(name):
+        return True
+    try:
+        with default_storage.open(name, 'rb') as fh:
+            img = Image.open(fh)
+            img = ImageOps.exif_transpose(img)
+            img.load()
+    except (OSError, ValueError):
+        logger.warning('Не удалось открыть изображение %s', name, exc_info=True)
+        return False
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+    for size in THUMB_SIZES:
+        for fmt in THUMB_FORMATS:
+            _write(derivative_name(name, size, fmt), _render(img, size, fmt))
+    return True
+
+
+def delete_for_name(name: str) -> None:
+    for target in derivative_names(name):
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def _generate(name: str) -> None:
+    """
+    Превью для файла и отметка всех его строк. Под блокировкой файла — той же,
+    что у imagestore.release(): если строк уже нет, файл удалён или вот-вот
+    будет, и превью не пишем.
+    """
+    from . import imagestore
+    from .models import ProductImage
+
+    with imagestore.locked(name):
+        rows = ProductImage.objects.filter(image=name)
+        product_ids = list(rows.values_list('product_id', flat=True))
+        if product_ids and generate_for_name(name):
+            rows.update(thumbs_ready=True)
+            detail_cache.invalidate(product_ids)
+
+
+def _run(name: str) -> None:
+    try:
+        _generate(name)
+    except Exception:
+        logger.exception('Ошибка генерации превью для %s', name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+        # Поток пула живёт долго — своё соединение с БД не держим
+        connection.close()
+
+
+def schedule(name: str) -> None:
+    """Поставить генерацию превью файла в фон (вызывать после коммита). Уже стоящую не дублирует."""
+    global _executor
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbs')
+    _executor.submit(_run, name)
@@ -0,0 +1,83 @@
+# catalog/tree.py
+"""
+Дерево категорий в памяти процесса.
+
+Строится одним запросом (сортировка по path даёт обход в глубину) и живёт,
+пока не изменится какая-нибудь категория — сигналы вызывают invalidate().
+Фильтр «категория и всё, что ниже» берёт id поддерева отсюда без запросов.
+"""
+import threading
+
+_tree = None
+_lock = threading.Lock()
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        # rows: (id, name, parent_id, path, depth), отсортированы по path
+        self.nodes = {}
+        self.children = {}
+        self.roots = []
+        for pk, name, parent_id, path, depth in rows:
+            self.nodes[pk] = {'id': pk, 'name': name, 'parent_id': parent_id, 'path': path, 'depth': depth}
+            self.children.setdefault(pk, [])
+            if parent_id in self.nodes:
+                self.children[parent_id].append(pk)
+            else:
+                self.roots.append(pk)
+        self._subtree = {}
+
+    def __contains__(self, pk):
+        return pk in self.nodes
+
+    def subtree_ids(self, pk) -> list:
+        """id категории и всех её потомков (пустой список, если категории нет)."""
+        if pk not in self.nodes:
+            return []
+        if pk not in self._subtree:
+            ids, stack = [], [pk]
+            while stack:
+                current = stack.pop()
+                ids.append(current)
+                stack.extend(self.children[current])
+            self._subtree[pk] = ids
+        return self._subtree[pk]
+
+    def ancestors(self, pk) -> list:
+        """Узлы от корня до категории включительно (для «хлебных крошек»)."""
+        node = self.nodes.get(pk)
+        if not node:
+            return []
+        return [self.nodes[int(i)] for i in node['path'].strip('/').split('/') if int(i) in self.nodes]
+
+    def options(self) -> list:
+        """(id, название с отступом) в порядке обхода — для <select>."""
+        result = []
+
+        def walk(ids):
+            for pk in sorted(ids, key=lambda i: self.nodes[i]['name']):
+                node = self.nodes[pk]
+                result.append((pk, '\u00a0\u00a0' * node['depth'] + node['name']))
+                walk(self.children[pk])
+
+        walk(self.roots)
+        return result
+
+
+def get_tree() -> CategoryTree:
+    global _tree
+    tree = _tree
+    if tree is None:
+        from .models import Category
+
+        rows = Category.objects.order_by('path').values_list('pk', 'name', 'parent_id', 'path', 'depth')
+        tree = CategoryTree(list(rows))
+        with _lock:
+            _tree = tree
+    return tree
+
+
+def invalidate() -> None:
+    global _tree
+    with _lock:
+        _tree = None
@@ -6,5 +6,7 @@ app_name = "catalog"
 
 urlpatterns = [
     path("", views.product_list, name="product_list"),
+    path("more/", views.product_list_more, name="product_list_more"),   # фрагмент для ленты
     path("<int:pk>/", views.product_detail, name="product_detail"),
+    path("api/v1/sync/", views.catalog_sync, name="catalog_sync"),        # синхронизация касс
 ]
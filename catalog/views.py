@@ -1,26 +1,120 @@
 # catalog/views.py
-from django.core.paginator import Paginator
 from django.db.models import Prefetch
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render
-from catalog.models import Product   # <-- добавьте этот импорт
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+from catalog.models import Product, ProductImage, ProductVariant   # <-- добавьте этот импорт
+from catalog import detail_cache, search, sync, tree
+from catalog.pagination import keyset_paginate
+from inventory.models import InventoryItem
 
-def product_list(request):
+# Карточек на страницу / на одну подгрузку бесконечной ленты
+PRODUCTS_PER_PAGE = 24
+PRODUCT_ORDERING = ('name', 'id')
+
+
+def _product_page(request):
+    q = request.GET.get('q', '').strip()
     products = (
         Product.objects
-        .select_related('brand', 'category')
-        .prefetch_related('images')
+        .select_related('brand', 'category', 'main_image')
     )
-    return render(request, 'catalog/product_list.html', {
+    if q:
+        products = search.filter_products(products, q)
+
+    # Категория «со всеми вложенными»: id поддерева берём из дерева в памяти
+    categories = tree.get_tree()
+    category_id = request.GET.get('category', '')
+    category_id = int(category_id) if category_id.isdigit() else None
+    if category_id in categories:
+        products = products.filter(category_id__in=categories.subtree_ids(category_id))
+    else:
+        category_id = None
+
+    page = keyset_paginate(products, PRODUCT_ORDERING, request.GET.get('cursor'), PRODUCTS_PER_PAGE)
+    filters = {k: v for k, v in (('q', q), ('category', category_id)) if v}
+    return {
+        'products': page,
+        'page': page,
+        'q': q,
+        'category_id': category_id,
+        'category_options': categories.options(),
+        'filter_query': urlencode(filters),
+    }
+
+
+def product_list(request):
+    ctx = _product_page(request)
+    ctx['page_name'] = 'products'
+    return render(request, 'catalog/product_list.html', ctx)
+
+
+def product_list_more(request):
+    """Следующая порция карточек (HTML-фрагмент) для бесконечной прокрутки."""
+    return render(request, 'catalog/_product_cards.html', _product_page(request))
+
+
+def _int_param(request, name, default=None):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else default
+
+
+def catalog_sync(request):
+    """
+    Синхронизация каталога кассы: /api/v1/sync/.
+
+    Без since — полная выгрузка страницами (?after=<id>&token=<токен первой страницы>);
+    с since=<токен> — только изменённые после него товары и id удалённых.
+    Ответ: token — что прислать в следующий раз, more — есть ли ещё страницы.
+    """
+    limit = max(1, min(_int_param(request, 'limit', sync.PAGE_SIZE), sync.PAGE_SIZE))
+    since = _int_param(request, 'since')
+
+    # Токен из вычищенной части журнала или «из будущего» (чужая база, опечатка) — полная выгрузка
+    if since is not None and sync.oldest_token() <= since <= sync.current_token():
+        products, deleted, token, more = sync.delta(since, limit)
+        return JsonResponse({
+            'version': sync.API_VERSION,
+            'mode': 'delta',
+            'token': token,
+            'more': more,
+            'products': products,
+            'deleted': deleted,
+        })
+
+    # Полная выгрузка. Токен фиксируем до первой страницы: всё, что изменится
+    # во время постраничной загрузки, касса потом получит дельтой
+    token = _int_param(request, 'token')
+    if token is None:
+        token = sync.current_token()
+    products, next_after = sync.full_page(_int_param(request, 'after', 0), limit)
+    return JsonResponse({
+        'version': sync.API_VERSION,
+        'mode': 'full',
+        'token': token,
+        'more': next_after is not None,
+        'after': next_after,
         'products': products,
-        'page_name': 'products',
+        'deleted': [],
     })
 
 
 def product_detail(request, pk: int):
-    product = get_object_or_404(
-        Product.objects.select_related("brand")
-        .prefetch_related(Prefetch("images", queryset=ProductImage.objects.order_by("-is_main", "id")),
-                          "variants"),
-        pk=pk,
-    )
-    return render(request, "catalog/product_detail.html", {"product": product})
+    """Карточка товара. Готовый HTML берётся из кэша, пока товар не изменился."""
+    key = detail_cache.page_key(pk)
+    html = cache.get(key)
+    if html is None:
+        product = get_object_or_404(
+            Product.objects.select_related("brand", "category")
+            .prefetch_related(Prefetch("images", queryset=ProductImage.objects.order_by("-is_main", "id")),
+                              Prefetch("variants", queryset=ProductVariant.objects.prefetch_related(
+                                  "barcodes",
+                                  Prefetch("stock", queryset=InventoryItem.objects.select_related("warehouse")),
+                              ))),
+            pk=pk,
+        )
+        html = render_to_string("catalog/product_detail.html", {"product": product}, request)
+        cache.set(key, html, detail_cache.DETAIL_TIMEOUT)
+    return HttpResponse(html)
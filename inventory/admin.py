@@ -1,123 +1,213 @@
 # inventory/admin.py
-from django.contrib import admin
-from .models import InventoryItem, StockMovement
-
-
-class SafeColumnsMixin:
-    """Набор безопасных геттеров для колонок в админке."""
-    def _get(self, obj, *names, default="-"):
-        for n in names:
-            if hasattr(obj, n):
-                try:
-                    val = getattr(obj, n)
-                    return val() if callable(val) else val
-                except Exception:
-                    pass
-        return default
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
+from . import services, stocktake, transfers
+from .models import (
+    InventoryItem, StockMovement, StockReservation, Stocktake, StocktakeLine, Transfer, TransferLine,
+)
 
 
 @admin.register(InventoryItem)
-class InventoryItemAdmin(SafeColumnsMixin, admin.ModelAdmin):
+class InventoryItemAdmin(admin.ModelAdmin):
     list_display = (
         "id",
-        "product_col",
-        "warehouse_col",
-        "qty_on_hand_col",
-        "qty_reserved_col",
-        "min_qty_col",
-        "available_col",
+        "variant",
+        "warehouse",
+        "qty",
+        "qty_reserved",
+        "min_qty",
+        "available",
     )
-    list_select_related = True
+    list_editable = ("min_qty",)
+    list_select_related = ("variant__product", "warehouse")
+    # Остаток меняется только движениями (inventory.services)
+    readonly_fields = ("qty",)
+    autocomplete_fields = ("variant",)
 
     list_filter = (
-        ("product__brand", admin.RelatedOnlyFieldListFilter),
-        ("product__category", admin.RelatedOnlyFieldListFilter),
+        ("variant__product__brand", admin.RelatedOnlyFieldListFilter),
+        ("variant__product__category", admin.RelatedOnlyFieldListFilter),
         ("warehouse", admin.RelatedOnlyFieldListFilter),
     )
 
     search_fields = (
-        "product__name",
-        "product__sku",
+        "variant__product__name",
+        "variant__sku",
+        "variant__barcodes__code",
         "warehouse__name",
     )
 
-    # ---- безопасные колонки ----
-    def product_col(self, obj):
-        # product/name — нагляднее в списке
-        p = self._get(obj, "product", default=None)
-        return getattr(p, "name", str(p)) if p else "-"
-    product_col.short_description = "Товар"
-
-    def warehouse_col(self, obj):
-        return self._get(obj, "warehouse", default="-")
-    warehouse_col.short_description = "Склад"
-
-    def qty_on_hand_col(self, obj):
-        # пробуем разные варианты названий в модели
-        return self._get(obj, "qty_on_hand", "on_hand", "stock", default=0)
-    qty_on_hand_col.short_description = "На складе"
-
-    def qty_reserved_col(self, obj):
-        return self._get(obj, "qty_reserved", "reserved", default=0)
-    qty_reserved_col.short_description = "Резерв"
+    @admin.display(description="Доступно")
+    def available(self, obj):
+        return obj.available
 
-    def min_qty_col(self, obj):
-        return self._get(obj, "min_qty", "min_stock", default=0)
-    min_qty_col.short_description = "Мин. остаток"
+    def get_readonly_fields(self, request, obj=None):
+        # Позицию склада не переносим: правится только порог
+        if obj is not None:
+            return ("warehouse", "variant", "qty")
+        return self.readonly_fields
 
-    def available_col(self, obj):
-        # иногда это поле/свойство называется по-разному
-        return self._get(obj, "available", "available_qty", default=0)
-    available_col.short_description = "Доступно"
+    def save_model(self, request, obj, form, change):
+        # Остаток и резерв двигают кассы через F(); полное save() записало бы
+        # прочитанные в начале запроса значения поверх их изменений
+        if change:
+            obj.save(update_fields=["min_qty"])
+        else:
+            super().save_model(request, obj, form, change)
 
 
 @admin.register(StockMovement)
-class StockMovementAdmin(SafeColumnsMixin, admin.ModelAdmin):
+class StockMovementAdmin(admin.ModelAdmin):
     list_display = (
         "id",
-        "product_col",
-        "warehouse_col",
-        "movement_type_col",   # виртуальная колонка
-        "qty_col",
-        "created_at_col",
+        "variant",
+        "warehouse",
+        "move_type",
+        "qty_delta",
+        "created_at",
     )
-    list_select_related = True
+    list_select_related = ("variant__product", "warehouse")
+    autocomplete_fields = ("variant",)
     date_hierarchy = "created_at"
 
-    # ВАЖНО: убрали проблемный 'movement_type' из фильтров
     list_filter = (
+        "move_type",
         ("warehouse", admin.RelatedOnlyFieldListFilter),
-        ("product__brand", admin.RelatedOnlyFieldListFilter),
-        ("product__category", admin.RelatedOnlyFieldListFilter),
+        ("variant__product__brand", admin.RelatedOnlyFieldListFilter),
+        ("variant__product__category", admin.RelatedOnlyFieldListFilter),
         "created_at",
     )
 
     search_fields = (
-        "product__name",
-        "product__sku",
+        "variant__product__name",
+        "variant__sku",
+        "variant__barcodes__code",
         "warehouse__name",
-        "comment",
+        "note",
     )
 
-    # ---- безопасные колонки ----
-    def product_col(self, obj):
-        return self._get(obj, "product", default="-")
-    product_col.short_description = "Товар"
-
-    def warehouse_col(self, obj):
-        return self._get(obj, "warehouse", default="-")
-    warehouse_col.short_description = "Склад"
-
-    def movement_type_col(self, obj):
-        # Если в модели есть поле type/kind/direction — покажем его
-        return self._get(obj, "movement_type", "type", "kind", "direction", default="-")
-    movement_type_col.short_description = "Тип"
-
-    def qty_col(self, obj):
-        return self._get(obj, "qty", "quantity", default=0)
-    qty_col.short_description = "Кол-во"
-
-    def created_at_col(self, obj):
-        return self._get(obj, "created_at", default="-")
-    created_at_col.short_description = "Создано"
-    created_at_col.admin_order_field = "created_at"
+    def get_readonly_fields(self, request, obj=None):
+        # Проведённое движение не правим — ошибку исправляет корректировка
+        if obj is not None:
+            return ("warehouse", "variant", "move_type", "qty_delta", "created_at")
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        # Новое движение — через сервис, чтобы сдвинулся и остаток
+        if obj.move_type == StockMovement.MoveType.IN:
+            obj.qty_delta = abs(obj.qty_delta)
+        elif obj.move_type == StockMovement.MoveType.OUT:
+            obj.qty_delta = -abs(obj.qty_delta)
+        services.post([obj], allow_negative=True)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("cart_key", "variant", "warehouse", "qty", "expires_at")
+    list_select_related = ("variant__product", "warehouse")
+    list_filter = (("warehouse", admin.RelatedOnlyFieldListFilter),)
+    search_fields = ("cart_key", "variant__sku")
+
+    # qty_reserved на остатках ведёт inventory.reservations — руками резервы не правим
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Stocktake)
+class StocktakeAdmin(admin.ModelAdmin):
+    list_display = ("id", "warehouse", "status", "full", "created_at", "closed_at", "discrepancies", "lines_link")
+    list_filter = ("status", ("warehouse", admin.RelatedOnlyFieldListFilter))
+    actions = ["close_stocktakes"]
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ("warehouse", "status", "full")
+        return ("status",)
+
+    # Строк могут быть десятки тысяч — не инлайном, а ссылкой на отфильтрованный список
+    @admin.display(description="Строки")
+    def lines_link(self, obj):
+        url = reverse("admin:inventory_stocktakeline_changelist") + f"?stocktake__id__exact={obj.pk}"
+        return format_html('<a href="{}">строки</a>', url)
+
+    @admin.action(description="Закрыть и провести расхождения")
+    def close_stocktakes(self, request, queryset):
+        for session in queryset.filter(status=Stocktake.Status.OPEN):
+            count = stocktake.close(session)
+            self.message_user(request, f"{session}: расхождений {count}")
+
+
+@admin.register(StocktakeLine)
+class StocktakeLineAdmin(admin.ModelAdmin):
+    list_display = ("stocktake", "variant", "counted", "expected", "diff")
+    list_select_related = ("stocktake__warehouse", "variant__product")
+    list_filter = ("stocktake",)
+    search_fields = ("variant__sku", "variant__product__name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TransferLineInline(admin.TabularInline):
+    model = TransferLine
+    autocomplete_fields = ("variant",)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("variant__product")
+
+    # Отгруженный документ не правим — движения уже проведены
+    def has_change_permission(self, request, obj=None):
+        return obj is None or obj.status == Transfer.Status.DRAFT
+
+    has_add_permission = has_delete_permission = has_change_permission
+
+
+@admin.register(Transfer)
+class TransferAdmin(admin.ModelAdmin):
+    list_display = ("id", "source", "target", "status", "created_at", "shipped_at", "received_at")
+    list_select_related = ("source", "target")
+    list_filter = ("status", ("source", admin.RelatedOnlyFieldListFilter), ("target", admin.RelatedOnlyFieldListFilter))
+    inlines = [TransferLineInline]
+    actions = ["ship", "receive", "post", "cancel"]
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None and obj.status != Transfer.Status.DRAFT:
+            return ("source", "target", "status")
+        return ("status",)
+
+    def _run(self, request, queryset, func, done):
+        for transfer in queryset:
+            try:
+                if func(transfer):
+                    self.message_user(request, f"{transfer}: {done}")
+            except services.InsufficientStock as exc:
+                self.message_user(request, f"{transfer}: {exc}", level=messages.ERROR)
+
+    @admin.action(description="Отгрузить (списать со склада-отправителя)")
+    def ship(self, request, queryset):
+        self._run(request, queryset, transfers.ship, "отгружено")
+
+    @admin.action(description="Принять (оприходовать на складе-получателе)")
+    def receive(self, request, queryset):
+        self._run(request, queryset, transfers.receive, "принято")
+
+    @admin.action(description="Отгрузить и принять сразу")
+    def post(self, request, queryset):
+        self._run(request, queryset, transfers.post, "проведено")
+
+    @admin.action(description="Отменить черновик")
+    def cancel(self, request, queryset):
+        self._run(request, queryset, transfers.cancel, "отменено")
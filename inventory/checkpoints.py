@@ -0,0 +1,148 @@
+# inventory/checkpoints.py
+"""
+Контрольные точки журнала остатков.
+
+Остаток на момент T = контрольная точка на конец последнего дня до T
++ сумма движений после неё. Так ответ на «сколько было на дату» и ремонт
+InventoryItem читают только хвост журнала, а не всю историю.
+Суммы считаются агрегатными запросами (GROUP BY variant) по диапазонам id,
+строки движений в Python не загружаются.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from catalog import detail_cache
+from catalog.models import ProductVariant
+from .models import InventoryItem, StockCheckpoint, StockMovement
+
+# Столько id журнала покрывает один агрегатный запрос
+CHUNK_SIZE = 200_000
+
+
+def day_end(day: date) -> datetime:
+    """Граница дня — начало следующих суток по местному времени."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def latest_day(warehouse_id, before: datetime = None):
+    """Последний день с контрольной точкой склада, закрытый до момента before."""
+    qs = StockCheckpoint.objects.filter(warehouse_id=warehouse_id)
+    if before is not None:
+        # Точка дня D учитывает движения до day_end(D) <= before
+        qs = qs.filter(day__lt=timezone.localdate(before))
+    return qs.aggregate(d=Max('day'))['d']
+
+
+def movement_sums(warehouse_id, start: datetime = None, end: datetime = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """{variant_id: сумма qty_delta} за [start, end) — по кускам id журнала."""
+    qs = StockMovement.objects.filter(warehouse_id=warehouse_id)
+    if start is not None:
+        qs = qs.filter(created_at__gte=start)
+    if end is not None:
+        qs = qs.filter(created_at__lt=end)
+    bounds = qs.aggregate(lo=Min('id'), hi=Max('id'))
+    sums = {}
+    if bounds['lo'] is None:
+        return sums
+    for lo in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+        rows = (
+            qs.filter(id__gte=lo, id__lt=lo + chunk_size)
+            .order_by()
+            .values('variant_id')
+            .annotate(s=Sum('qty_delta'))
+            .values_list('variant_id', 's')
+        )
+        for variant_id, delta in rows:
+            sums[variant_id] = sums.get(variant_id, 0) + delta
+    return sums
+
+
+def balances(warehouse_id, at: datetime = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Остатки склада {variant_id: qty} на момент at (по умолчанию — сейчас), без нулей."""
+    day = latest_day(warehouse_id, before=at)
+    qty = {}
+    start = None
+    if day is not None:
+        qty = dict(
+            StockCheckpoint.objects.filter(warehouse_id=warehouse_id, day=day).values_list('variant_id', 'qty')
+        )
+        start = day_end(day)
+    for variant_id, delta in movement_sums(warehouse_id, start, at, chunk_size).items():
+        qty[variant_id] = qty.get(variant_id, 0) + delta
+    return {variant_id: q for variant_id, q in qty.items() if q}
+
+
+def stock_at(warehouse_id, variant_id, at: datetime) -> int:
+    """Остаток одного варианта на момент at."""
+    day = latest_day(warehouse_id, before=at)
+    qs = StockMovement.objects.filter(warehouse_id=warehouse_id, variant_id=variant_id, created_at__lt=at)
+    base = 0
+    if day is not None:
+        base = (
+            StockCheckpoint.objects.filter(warehouse_id=warehouse_id, variant_id=variant_id, day=day)
+            .values_list('qty', flat=True).first()
+        ) or 0
+        qs = qs.filter(created_at__gte=day_end(day))
+    return base + (qs.aggregate(s=Sum('qty_delta'))['s'] or 0)
+
+
+def write_checkpoint(warehouse_id, day: date, chunk_size: int = CHUNK_SIZE) -> int:
+    """(Пере)записывает точку склада на конец дня day. Возвращает число строк."""
+    if day_end(day) > timezone.now():
+        raise ValueError(f'День {day} ещё не закончился')
+    with transaction.atomic():
+        # Старую точку этого дня убираем до расчёта, иначе balances() опёрся бы на неё саму
+        StockCheckpoint.objects.filter(warehouse_id=warehouse_id, day=day).delete()
+        qty = balances(warehouse_id, at=day_end(day), chunk_size=chunk_size)
+        StockCheckpoint.objects.bulk_create(
+            [StockCheckpoint(warehouse_id=warehouse_id, variant_id=v, day=day, qty=q) for v, q in qty.items()],
+            batch_size=1000,
+        )
+    return len(qty)
+
+
+def diff(warehouse_id, qty: dict) -> dict:
+    """Расхождения InventoryItem склада с остатками qty: {variant_id: (pk | None, было, стало)}."""
+    changes = {}
+    seen = set()
+    for pk, variant_id, current in (
+        InventoryItem.objects.filter(warehouse_id=warehouse_id).values_list('pk', 'variant_id', 'qty')
+    ):
+        seen.add(variant_id)
+        target = qty.get(variant_id, 0)
+        if current != target:
+            changes[variant_id] = (pk, current, target)
+    for variant_id, target in qty.items():
+        if variant_id not in seen:
+            changes[variant_id] = (None, 0, target)
+    return changes
+
+
+def apply_balances(warehouse_id, qty: dict) -> int:
+    """
+    Приводит InventoryItem склада к рассчитанным остаткам. Возвращает число
+    исправленных строк. Запускать, пока склад не торгует: продажа между
+    расчётом и записью будет перетёрта.
+    """
+    changes = diff(warehouse_id, qty)
+    with transaction.atomic():
+        InventoryItem.objects.bulk_update(
+            [InventoryItem(pk=pk, qty=target) for pk, _, target in changes.values() if pk],
+            ['qty'], batch_size=1000,
+        )
+        InventoryItem.objects.bulk_create(
+            [
+                InventoryItem(warehouse_id=warehouse_id, variant_id=variant_id, qty=target)
+                for variant_id, (pk, _, target) in changes.items() if not pk
+            ],
+            batch_size=1000,
+        )
+    variant_ids = list(changes)
+    for i in range(0, len(variant_ids), 1000):
+        detail_cache.invalidate(set(
+            ProductVariant.objects.filter(pk__in=variant_ids[i:i + 1000]).values_list('product_id', flat=True)
+        ))
+    return len(changes)
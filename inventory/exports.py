@@ -0,0 +1,105 @@
+# inventory/exports.py
+"""
+Выгрузка каталога с остатками по складам (CSV / JSONL).
+
+Одна строка — один вариант товара (SKU). Строки генерируются потоком:
+варианты читаются серверным курсором (iterator(chunk_size=...)), остатки
+и штрихкоды — одним запросом на пачку.
+Память не зависит от размера каталога. Один и тот же движок отдаёт
+StreamingHttpResponse и пишет файл из manage.py export_stock.
+"""
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from catalog.models import Barcode, ProductVariant
+from .models import InventoryItem, Warehouse
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _warehouses():
+    return list(Warehouse.objects.order_by('name').values_list('pk', 'slug'))
+
+
+def header(warehouses) -> list:
+    return (
+        ['id', 'product_id', 'sku', 'name', 'size', 'color', 'brand', 'category', 'price', 'barcodes']
+        + [f'qty_{slug}' for _, slug in warehouses]
+        + ['qty_total']
+    )
+
+
+def iter_records(chunk_size: int = EXPORT_CHUNK_SIZE, warehouses=None):
+    """Словари «вариант + остатки по складам» в порядке id."""
+    if warehouses is None:
+        warehouses = _warehouses()
+    variants = (
+        ProductVariant.objects
+        .order_by('pk')
+        .values_list(
+            'pk', 'product_id', 'sku', 'product__name', 'size', 'color',
+            'product__brand__name', 'product__category__name', 'price', 'product__price',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        batch = list(islice(variants, chunk_size))
+        if not batch:
+            return
+        ids = [row[0] for row in batch]
+        stock = defaultdict(dict)
+        for variant_id, warehouse_id, qty in (
+            InventoryItem.objects.filter(variant_id__in=ids).values_list('variant_id', 'warehouse_id', 'qty')
+        ):
+            stock[variant_id][warehouse_id] = qty
+        codes = defaultdict(list)
+        for variant_id, code in Barcode.objects.filter(variant_id__in=ids).values_list('variant_id', 'code'):
+            codes[variant_id].append(code)
+
+        for pk, product_id, sku, name, size, color, brand, category, price, product_price in batch:
+            qty = stock.get(pk, {})
+            record = {
+                'id': pk,
+                'product_id': product_id,
+                'sku': sku,
+                'name': name,
+                'size': size,
+                'color': color,
+                'brand': brand or '',
+                'category': category or '',
+                'price': str(price if price is not None else product_price),
+                'barcodes': '|'.join(codes.get(pk, ())),
+            }
+            for warehouse_id, slug in warehouses:
+                record[f'qty_{slug}'] = qty.get(warehouse_id, 0)
+            record['qty_total'] = sum(qty.values())
+            yield record
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку."""
+    def write(self, value):
+        return value
+
+
+def iter_lines(fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Готовые строки файла выбранного формата."""
+    warehouses = _warehouses()
+    records = iter_records(chunk_size, warehouses)
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+
+    columns = header(warehouses)
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM — чтобы Excel у бухгалтерии сразу понял UTF-8
+    yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([record[c] for c in columns])
@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import exports
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка каталога с остатками по складам в CSV/JSONL (для регламентных дампов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help='Файл (по умолчанию stdout)')
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        started = time.monotonic()
+        try:
+            fh = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть {path}: {exc}')
+
+        lines = 0
+        try:
+            for line in exports.iter_lines(options['format'], options['chunk_size']):
+                fh.write(line)
+                lines += 1
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
+
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено в {path}: {lines} строк за {time.monotonic() - started:.1f} с.'
+            ))
@@ -0,0 +1,70 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory import checkpoints
+from inventory.models import Warehouse
+
+
+def _init_worker():
+    # При spawn (Windows/macOS) дочерний процесс стартует «с нуля»
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arm_seller_project.settings')
+    django.setup()
+
+
+def _balances(args):
+    warehouse_id, chunk_size = args
+    try:
+        return warehouse_id, checkpoints.balances(warehouse_id, chunk_size=chunk_size)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает InventoryItem.qty из журнала: последняя контрольная точка + хвост движений. '
+        'Склады считаются параллельно в пуле процессов. Запускать при остановленных кассах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warehouse', action='append', default=[], help='Слаг склада (можно несколько)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Число процессов (по умолчанию — по числу ядер)')
+        parser.add_argument('--chunk-size', type=int, default=checkpoints.CHUNK_SIZE,
+                            help='Сколько id журнала в одном агрегатном запросе')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать расхождения')
+
+    def handle(self, *args, **options):
+        warehouses = Warehouse.objects.all()
+        if options['warehouse']:
+            warehouses = warehouses.filter(slug__in=options['warehouse'])
+        names = dict(warehouses.values_list('pk', 'name'))
+        if not names:
+            self.stdout.write('Нет складов.')
+            return
+
+        started = time.monotonic()
+        # Дочерние процессы не должны унаследовать открытое соединение родителя
+        connections.close_all()
+        jobs = [(pk, options['chunk_size']) for pk in names]
+        # Воркеры только читают журнал; остатки пишет родитель
+        with ProcessPoolExecutor(max_workers=min(options['workers'], len(jobs)), initializer=_init_worker) as pool:
+            results = list(pool.map(_balances, jobs))
+
+        fixed = 0
+        for warehouse_id, qty in results:
+            if options['dry_run']:
+                count = len(checkpoints.diff(warehouse_id, qty))
+            else:
+                count = checkpoints.apply_balances(warehouse_id, qty)
+            fixed += count
+            self.stdout.write(f'{names[warehouse_id]}: позиций {len(qty)}, расхождений {count}')
+
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} расхождений: {fixed}, {time.monotonic() - started:.1f} с.'
+        ))
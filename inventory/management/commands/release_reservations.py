@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inventory import reservations
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает просроченные резервы корзин пачками. Из cron — раз в минуту, '
+        'или фоновым процессом с --every'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, default=0,
+                            help='Работать в цикле с паузой N секунд (0 — один проход)')
+        parser.add_argument('--batch-size', type=int, default=reservations.SWEEP_BATCH)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            released = reservations.sweep(batch_size=options['batch_size'])
+            if released or not options['every']:
+                self.stdout.write(f'Снято резервов: {released}, {time.monotonic() - started:.2f} с.')
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
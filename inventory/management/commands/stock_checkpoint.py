@@ -0,0 +1,48 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory import checkpoints
+from inventory.models import StockCheckpoint, Warehouse
+
+
+class Command(BaseCommand):
+    help = (
+        'Пишет контрольные точки остатков (склад × вариант) на конец дня. '
+        'Запускать раз в сутки после полуночи; по умолчанию — за вчера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='День ГГГГ-ММ-ДД (по умолчанию — вчера)')
+        parser.add_argument('--keep-days', type=int,
+                            help='Удалить точки старше N дней (последняя точка склада остаётся всегда)')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Дата в формате ГГГГ-ММ-ДД')
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        started = time.monotonic()
+        total = 0
+        for warehouse in Warehouse.objects.all():
+            try:
+                rows = checkpoints.write_checkpoint(warehouse.pk, day)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            total += rows
+            self.stdout.write(f'{warehouse}: {rows} строк')
+
+        if options['keep_days'] is not None:
+            border = min(day, timezone.localdate() - timedelta(days=options['keep_days']))
+            deleted, _ = StockCheckpoint.objects.filter(day__lt=border).delete()
+            self.stdout.write(f'Удалено старых точек: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Точка на {day}: {total} строк, {time.monotonic() - started:.1f} с.'
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_productvariant'),
+        ('inventory', '0002_alter_inventoryitem_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='catalog.productvariant', verbose_name='Вариант'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='catalog.productvariant', verbose_name='Вариант'),
+        ),
+    ]
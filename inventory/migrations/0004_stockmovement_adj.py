@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_alter_inventoryitem_variant_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='move_type',
+            field=models.CharField(choices=[('IN', 'Приход'), ('OUT', 'Расход'), ('ADJ', 'Корректировка')], max_length=3, verbose_name='Тип движения'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_productvariant'),
+        ('inventory', '0004_stockmovement_adj'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('qty', models.IntegerField(verbose_name='Остаток')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка остатков',
+                'verbose_name_plural': 'Контрольные точки остатков',
+                'ordering': ['-day', 'warehouse_id', 'variant_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['warehouse', 'created_at'], name='inventory_move_wh_created'),
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='catalog.productvariant', verbose_name='Вариант'),
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='inventory.warehouse', verbose_name='Склад'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockcheckpoint',
+            constraint=models.UniqueConstraint(fields=('warehouse', 'day', 'variant'), name='inventory_checkpoint_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stockcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['variant', 'warehouse', 'qty_delta'], name='inventory_move_variant_wh'),
+        ),
+    ]
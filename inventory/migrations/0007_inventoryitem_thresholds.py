@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stockmovement_variant_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='min_qty',
+            field=models.PositiveIntegerField(default=0, verbose_name='Мин. остаток'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='qty_reserved',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Резерв'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('min_qty__gt', 0), ('qty__lte', models.F('min_qty'))), fields=['warehouse', 'id'], name='inventory_item_low'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventoryitem_thresholds'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='stockmovement',
+            options={'ordering': ['-created_at', 'id'], 'verbose_name': 'Движение товара', 'verbose_name_plural': 'Движения товара'},
+        ),
+        migrations.RemoveIndex(
+            model_name='stockmovement',
+            name='inventory_move_wh_created',
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['-created_at', 'id'], name='inventory_move_created'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['warehouse', '-created_at', 'id'], name='inventory_move_wh_created'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['variant', '-created_at', 'id'], name='inventory_move_variant_created'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['move_type', '-created_at', 'id'], name='inventory_move_type_created'),
+        ),
+    ]
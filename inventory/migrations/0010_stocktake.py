@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_productvariant'),
+        ('inventory', '0009_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stocktake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Идёт'), ('closed', 'Закрыта')], default='open', max_length=8, verbose_name='Статус')),
+                ('full', models.BooleanField(default=True, verbose_name='Полная')),
+                ('note', models.CharField(blank=True, max_length=255, verbose_name='Примечание')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Начата')),
+                ('closed_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Закрыта')),
+                ('discrepancies', models.PositiveIntegerField(default=0, editable=False, verbose_name='Расхождений')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocktakes', to='inventory.warehouse', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Инвентаризация',
+                'verbose_name_plural': 'Инвентаризации',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StocktakeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted', models.IntegerField(default=0, verbose_name='Посчитано')),
+                ('expected', models.IntegerField(blank=True, null=True, verbose_name='По учёту')),
+                ('stocktake', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.stocktake', verbose_name='Инвентаризация')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.productvariant', verbose_name='Вариант')),
+            ],
+            options={
+                'verbose_name': 'Строка инвентаризации',
+                'verbose_name_plural': 'Строки инвентаризации',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StocktakeScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.IntegerField(default=1, verbose_name='Кол-во')),
+                ('device', models.CharField(blank=True, max_length=64, verbose_name='ТСД')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Когда')),
+                ('stocktake', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scans', to='inventory.stocktake', verbose_name='Инвентаризация')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.productvariant', verbose_name='Вариант')),
+            ],
+            options={
+                'verbose_name': 'Скан инвентаризации',
+                'verbose_name_plural': 'Сканы инвентаризации',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['stocktake', 'variant'], name='inventory_scan_variant')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocktakeline',
+            constraint=models.UniqueConstraint(fields=('stocktake', 'variant'), name='inventory_stocktakeline_uniq'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_productvariant'),
+        ('inventory', '0010_stocktake'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Черновик'), ('in_transit', 'В пути'), ('received', 'Принято'), ('cancelled', 'Отменено')], default='draft', max_length=16, verbose_name='Статус')),
+                ('note', models.CharField(blank=True, max_length=255, verbose_name='Примечание')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('shipped_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Отгружено')),
+                ('received_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Принято')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='inventory.warehouse', verbose_name='Откуда')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='inventory.warehouse', verbose_name='Куда')),
+            ],
+            options={
+                'verbose_name': 'Перемещение',
+                'verbose_name_plural': 'Перемещения',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransferLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.PositiveIntegerField(verbose_name='Кол-во')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.transfer', verbose_name='Перемещение')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='catalog.productvariant', verbose_name='Вариант')),
+            ],
+            options={
+                'verbose_name': 'Строка перемещения',
+                'verbose_name_plural': 'Строки перемещения',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transferline',
+            constraint=models.UniqueConstraint(fields=('transfer', 'variant'), name='inventory_transferline_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transfer',
+            constraint=models.CheckConstraint(check=models.Q(('source', models.F('target')), _negated=True), name='inventory_transfer_two_warehouses'),
+        ),
+    ]
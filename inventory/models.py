@@ -1,13 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-# Аккуратно пытаемся подхватить ProductVariant. Если его нет – используем Product.
-try:
-    from catalog.models import ProductVariant as VariantModel  # type: ignore
-    VARIANT_VERBOSE = _('Вариант')
-except Exception:
-    from catalog.models import Product as VariantModel  # fallback
-    VARIANT_VERBOSE = _('Товар')
+from catalog.models import ProductVariant
 
 
 class Warehouse(models.Model):
@@ -24,38 +18,55 @@ class Warehouse(models.Model):
         return self.name
 
 
+# Остаток на пороге или ниже; тем же Q задано условие частичного индекса —
+# запрос с ним читает только «низкие» строки
+LOW_STOCK = models.Q(min_qty__gt=0, qty__lte=models.F('min_qty'))
+
+
 class InventoryItem(models.Model):
     warehouse = models.ForeignKey(
         Warehouse, on_delete=models.CASCADE, related_name='items', verbose_name=_('Склад')
     )
-    # ВАЖНО: поле называется "variant", но тип — тот, что мы импортировали выше
     variant = models.ForeignKey(
-        VariantModel, on_delete=models.CASCADE, related_name='stock', verbose_name=VARIANT_VERBOSE
+        ProductVariant, on_delete=models.CASCADE, related_name='stock', verbose_name=_('Вариант')
     )
     qty = models.IntegerField(_('Остаток'), default=0)
+    qty_reserved = models.IntegerField(_('Резерв'), default=0, editable=False)
+    # 0 — порог не задан, позиция в «низкие остатки» не попадает
+    min_qty = models.PositiveIntegerField(_('Мин. остаток'), default=0)
 
     class Meta:
         verbose_name = _('Остаток на складе')
         verbose_name_plural = _('Остатки на складе')
         unique_together = (('warehouse', 'variant'),)
         ordering = ['warehouse_id']
+        indexes = [
+            models.Index(fields=['warehouse', 'id'], condition=LOW_STOCK, name='inventory_item_low'),
+        ]
 
     def __str__(self):
         return f'{self.warehouse} — {self.variant} : {self.qty}'
 
+    @property
+    def available(self) -> int:
+        return self.qty - self.qty_reserved
+
 
 class StockMovement(models.Model):
+    """Журнал движений; остатки меняются только через inventory.services."""
     class MoveType(models.TextChoices):
         IN = 'IN', _('Приход')
         OUT = 'OUT', _('Расход')
+        ADJ = 'ADJ', _('Корректировка')
 
     warehouse = models.ForeignKey(
         Warehouse, on_delete=models.CASCADE, related_name='movements', verbose_name=_('Склад')
     )
     variant = models.ForeignKey(
-        VariantModel, on_delete=models.CASCADE, related_name='movements', verbose_name=VARIANT_VERBOSE
+        ProductVariant, on_delete=models.CASCADE, related_name='movements', verbose_name=_('Вариант')
     )
     move_type = models.CharField(_('Тип движения'), max_length=3, choices=MoveType.choices)
+    # Со знаком: приход > 0, расход < 0
     qty_delta = models.IntegerField(_('Кол-во'), default=0)
     note = models.CharField(_('Примечание'), max_length=255, blank=True)
     created_at = models.DateTimeField(_('Когда'), auto_now_add=True)
@@ -63,8 +74,201 @@ class StockMovement(models.Model):
     class Meta:
         verbose_name = _('Движение товара')
         verbose_name_plural = _('Движения товара')
-        ordering = ['-created_at']
+        ordering = ['-created_at', 'id']
+        indexes = [
+            # Журнал движений (/stock/moves/): сортировка (-created_at, id) и фильтры;
+            # по складу — ещё и хвост журнала после контрольной точки (inventory.checkpoints)
+            models.Index(fields=['-created_at', 'id'], name='inventory_move_created'),
+            models.Index(fields=['warehouse', '-created_at', 'id'], name='inventory_move_wh_created'),
+            models.Index(fields=['variant', '-created_at', 'id'], name='inventory_move_variant_created'),
+            models.Index(fields=['move_type', '-created_at', 'id'], name='inventory_move_type_created'),
+            # сверка: SUM(qty_delta) GROUP BY variant, warehouse читается из индекса без таблицы
+            models.Index(fields=['variant', 'warehouse', 'qty_delta'], name='inventory_move_variant_wh'),
+        ]
 
     def __str__(self):
-        sign = '+' if self.move_type == self.MoveType.IN else '−'
+        sign = '+' if self.qty_delta >= 0 else '−'
         return f'{self.created_at:%Y-%m-%d %H:%M} {self.warehouse} {sign}{abs(self.qty_delta)} {self.variant}'
+
+
+class StockCheckpoint(models.Model):
+    """
+    Остаток варианта на складе на конец дня — контрольная точка журнала.
+    Нулевые остатки не хранятся. Пишется командой stock_checkpoint.
+    """
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name='checkpoints', verbose_name=_('Склад')
+    )
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.CASCADE, related_name='checkpoints', verbose_name=_('Вариант')
+    )
+    day = models.DateField(_('День'))
+    qty = models.IntegerField(_('Остаток'))
+
+    class Meta:
+        verbose_name = _('Контрольная точка остатков')
+        verbose_name_plural = _('Контрольные точки остатков')
+        ordering = ['-day', 'warehouse_id', 'variant_id']
+        constraints = [
+            models.UniqueConstraint(fields=['warehouse', 'day', 'variant'], name='inventory_checkpoint_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.warehouse} {self.variant}: {self.qty}'
+
+
+class StockReservation(models.Model):
+    """
+    Резерв под открытую корзину: держит количество до expires_at.
+    Сумма резервов пары склад × вариант = InventoryItem.qty_reserved
+    (поддерживает inventory.reservations).
+    """
+    cart_key = models.CharField(_('Корзина'), max_length=64)
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name='reservations', verbose_name=_('Склад')
+    )
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.CASCADE, related_name='reservations', verbose_name=_('Вариант')
+    )
+    qty = models.PositiveIntegerField(_('Кол-во'))
+    expires_at = models.DateTimeField(_('Действует до'), db_index=True)
+    created_at = models.DateTimeField(_('Создан'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Резерв')
+        verbose_name_plural = _('Резервы')
+        ordering = ['expires_at']
+        constraints = [
+            models.UniqueConstraint(fields=['cart_key', 'warehouse', 'variant'], name='inventory_reservation_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.cart_key}: {self.variant} ×{self.qty} до {self.expires_at:%H:%M}'
+
+
+class Stocktake(models.Model):
+    """Инвентаризация склада: сканы копятся в строках, при закрытии — корректировки."""
+    class Status(models.TextChoices):
+        OPEN = 'open', _('Идёт')
+        CLOSED = 'closed', _('Закрыта')
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name='stocktakes', verbose_name=_('Склад')
+    )
+    status = models.CharField(_('Статус'), max_length=8, choices=Status.choices, default=Status.OPEN)
+    # Полная — всё непосчитанное на складе считается отсутствующим; частичная — только посчитанное
+    full = models.BooleanField(_('Полная'), default=True)
+    note = models.CharField(_('Примечание'), max_length=255, blank=True)
+    created_at = models.DateTimeField(_('Начата'), auto_now_add=True)
+    closed_at = models.DateTimeField(_('Закрыта'), null=True, blank=True, editable=False)
+    discrepancies = models.PositiveIntegerField(_('Расхождений'), default=0, editable=False)
+
+    class Meta:
+        verbose_name = _('Инвентаризация')
+        verbose_name_plural = _('Инвентаризации')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Инвентаризация #{self.pk} {self.warehouse} ({self.get_status_display()})'
+
+
+class StocktakeLine(models.Model):
+    stocktake = models.ForeignKey(
+        Stocktake, on_delete=models.CASCADE, related_name='lines', verbose_name=_('Инвентаризация')
+    )
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.CASCADE, related_name='+', verbose_name=_('Вариант')
+    )
+    counted = models.IntegerField(_('Посчитано'), default=0)
+    # Учётный остаток на момент закрытия
+    expected = models.IntegerField(_('По учёту'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Строка инвентаризации')
+        verbose_name_plural = _('Строки инвентаризации')
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['stocktake', 'variant'], name='inventory_stocktakeline_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.variant}: {self.counted}'
+
+    @property
+    def diff(self):
+        return None if self.expected is None else self.counted - self.expected
+
+
+class StocktakeScan(models.Model):
+    """Сырые сканы (для разбора спорных строк); итог по варианту — в StocktakeLine."""
+    stocktake = models.ForeignKey(
+        Stocktake, on_delete=models.CASCADE, related_name='scans', verbose_name=_('Инвентаризация')
+    )
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.CASCADE, related_name='+', verbose_name=_('Вариант')
+    )
+    qty = models.IntegerField(_('Кол-во'), default=1)
+    device = models.CharField(_('ТСД'), max_length=64, blank=True)
+    created_at = models.DateTimeField(_('Когда'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Скан инвентаризации')
+        verbose_name_plural = _('Сканы инвентаризации')
+        ordering = ['id']
+        indexes = [models.Index(fields=['stocktake', 'variant'], name='inventory_scan_variant')]
+
+    def __str__(self):
+        return f'{self.device} {self.variant} ×{self.qty}'
+
+
+class Transfer(models.Model):
+    """Перемещение между складами: черновик -> в пути (списано) -> принято (оприходовано)."""
+    class Status(models.TextChoices):
+        DRAFT = 'draft', _('Черновик')
+        IN_TRANSIT = 'in_transit', _('В пути')
+        RECEIVED = 'received', _('Принято')
+        CANCELLED = 'cancelled', _('Отменено')
+
+    source = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name='transfers_out', verbose_name=_('Откуда')
+    )
+    target = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name='transfers_in', verbose_name=_('Куда')
+    )
+    status = models.CharField(_('Статус'), max_length=16, choices=Status.choices, default=Status.DRAFT)
+    note = models.CharField(_('Примечание'), max_length=255, blank=True)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    shipped_at = models.DateTimeField(_('Отгружено'), null=True, blank=True, editable=False)
+    received_at = models.DateTimeField(_('Принято'), null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = _('Перемещение')
+        verbose_name_plural = _('Перемещения')
+        ordering = ['-created_at']
+        constraints = [
+            models.CheckConstraint(check=~models.Q(source=models.F('target')), name='inventory_transfer_two_warehouses'),
+        ]
+
+    def __str__(self):
+        return f'Перемещение #{self.pk}: {self.source} → {self.target}'
+
+
+class TransferLine(models.Model):
+    transfer = models.ForeignKey(
+        Transfer, on_delete=models.CASCADE, related_name='lines', verbose_name=_('Перемещение')
+    )
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.PROTECT, related_name='+', verbose_name=_('Вариант')
+    )
+    qty = models.PositiveIntegerField(_('Кол-во'))
+
+    class Meta:
+        verbose_name = _('Строка перемещения')
+        verbose_name_plural = _('Строки перемещения')
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['transfer', 'variant'], name='inventory_transferline_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.variant} ×{self.qty}'
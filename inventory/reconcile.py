@@ -0,0 +1,63 @@
+# inventory/reconcile.py
+"""
+Сверка остатков с журналом: InventoryItem.qty == SUM(StockMovement.qty_delta)
+для каждой пары (склад, вариант).
+
+Сравнение делает сама база: один агрегатный запрос на диапазон id вариантов
+(UNION ALL остатков и журнала, GROUP BY склад+вариант, HAVING расхождение),
+в Python приходят только расхождения. Запрос один, значит и снимок данных
+один — продажа посреди сверки не даёт ложных расхождений.
+"""
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from catalog.models import ProductVariant
+from .models import InventoryItem, StockMovement
+
+CHUNK_SIZE = 5000
+
+_SQL = '''
+    SELECT warehouse_id, variant_id, SUM(qty), SUM(ledger)
+    FROM (
+        SELECT warehouse_id, variant_id, qty, 0 AS ledger
+        FROM {items} WHERE variant_id >= %s AND variant_id < %s
+        UNION ALL
+        SELECT warehouse_id, variant_id, 0, qty_delta
+        FROM {moves} WHERE variant_id >= %s AND variant_id < %s
+    ) t
+    GROUP BY warehouse_id, variant_id
+    HAVING SUM(qty) <> SUM(ledger)
+'''.format(items=InventoryItem._meta.db_table, moves=StockMovement._meta.db_table)
+
+
+def chunks(chunk_size: int = CHUNK_SIZE):
+    """Диапазоны id вариантов [lo, hi) для постраничной сверки."""
+    bounds = ProductVariant.objects.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return
+    for lo in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+        yield lo, lo + chunk_size
+
+
+def mismatches(lo: int, hi: int) -> list:
+    """[(warehouse_id, variant_id, qty, ledger), ...] для вариантов с id в [lo, hi)."""
+    with connection.cursor() as cur:
+        cur.execute(_SQL, [lo, hi, lo, hi])
+        return [(w, v, int(qty), int(ledger)) for w, v, qty, ledger in cur.fetchall()]
+
+
+def compensate(rows, note: str) -> int:
+    """
+    Доводит журнал до фактического остатка корректировками (ADJ) —
+    InventoryItem не меняется. Обратное направление — rebuild_stock.
+    """
+    movements = [
+        StockMovement(
+            warehouse_id=w, variant_id=v, move_type=StockMovement.MoveType.ADJ,
+            qty_delta=qty - ledger, note=note,
+        )
+        for w, v, qty, ledger in rows
+    ]
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+    return len(movements)
@@ -0,0 +1,109 @@
+# inventory/reservations.py
+"""
+Резервы под открытые корзины касс.
+
+Положили товар в корзину — количество резервируется на RESERVATION_TTL,
+любое действие с корзиной продлевает срок. Резерв берётся условным
+UPDATE «qty - qty_reserved >= n»: из двух касс, претендующих на последнюю
+штуку, получит её только одна. Просроченные резервы снимает пачками
+sweep() (команда release_reservations). При оформлении продажи резерв
+снимается и превращается в расход (convert).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import services
+from .models import InventoryItem, StockReservation
+from .services import InsufficientStock
+
+RESERVATION_TTL = timedelta(minutes=15)
+SWEEP_BATCH = 1000
+
+
+def _expires():
+    return timezone.now() + RESERVATION_TTL
+
+
+def _by_item(rows) -> dict:
+    """Строки резервов -> {(warehouse_id, variant_id): сумма qty}."""
+    deltas = defaultdict(int)
+    for _, w, v, qty in rows:
+        deltas[w, v] += qty
+    return deltas
+
+
+def set_qty(cart_key: str, warehouse, variant, qty: int) -> None:
+    """Зарезервировать за корзиной ровно qty штук варианта (0 — снять резерв)."""
+    warehouse_id, variant_id = getattr(warehouse, 'pk', warehouse), getattr(variant, 'pk', variant)
+    with transaction.atomic():
+        current = (
+            StockReservation.objects.select_for_update()
+            .filter(cart_key=cart_key, warehouse_id=warehouse_id, variant_id=variant_id).first()
+        )
+        delta = qty - (current.qty if current else 0)
+        item = InventoryItem.objects.filter(warehouse_id=warehouse_id, variant_id=variant_id)
+        if delta > 0:
+            # Проверка и резерв — одно условие в одном UPDATE, без гонки между ними
+            if not item.filter(qty__gte=F('qty_reserved') + delta).update(qty_reserved=F('qty_reserved') + delta):
+                available = item.values_list('qty', 'qty_reserved').first()
+                raise InsufficientStock([(warehouse_id, variant_id, (available[0] - available[1]) if available else 0)])
+        elif delta < 0:
+            item.update(qty_reserved=F('qty_reserved') + delta)
+
+        if qty <= 0:
+            if current:
+                current.delete()
+        elif current:
+            StockReservation.objects.filter(pk=current.pk).update(qty=qty, expires_at=_expires())
+        else:
+            StockReservation.objects.create(
+                cart_key=cart_key, warehouse_id=warehouse_id, variant_id=variant_id, qty=qty, expires_at=_expires(),
+            )
+
+
+def touch(cart_key: str) -> int:
+    """Продлить все резервы корзины (кассир работает с ней)."""
+    return StockReservation.objects.filter(cart_key=cart_key).update(expires_at=_expires())
+
+
+def _take(qs) -> list:
+    """Забирает строки резервов: удаляет их и уменьшает qty_reserved. Внутри транзакции."""
+    rows = list(qs.select_for_update().values_list('pk', 'warehouse_id', 'variant_id', 'qty'))
+    if rows:
+        StockReservation.objects.filter(pk__in=[r[0] for r in rows]).delete()
+        services.shift('qty_reserved', {key: -qty for key, qty in _by_item(rows).items()})
+    return rows
+
+
+def release(cart_key: str) -> int:
+    """Снять все резервы корзины (корзину очистили или отменили)."""
+    with transaction.atomic():
+        return len(_take(StockReservation.objects.filter(cart_key=cart_key)))
+
+
+def sweep(now=None, batch_size: int = SWEEP_BATCH) -> int:
+    """Снимает просроченные резервы пачками; возвращает число снятых."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = StockReservation.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size]
+            taken = _take(StockReservation.objects.filter(pk__in=list(ids), expires_at__lte=now))
+        total += len(taken)
+        if len(taken) < batch_size:
+            return total
+
+
+def convert(cart_key: str, warehouse, lines, note: str = '', allow_negative: bool = False) -> list:
+    """
+    Оформление продажи: снять резервы корзины и списать проданное (StockMovement OUT)
+    одной транзакцией. Списывается ровно lines — корзина могла измениться после
+    резервирования, а просроченный резерв мог быть уже снят sweep().
+    """
+    with transaction.atomic():
+        _take(StockReservation.objects.filter(cart_key=cart_key))
+        return services.issue(warehouse, lines, note=note, allow_negative=allow_negative)
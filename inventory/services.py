@@ -0,0 +1,175 @@
+# inventory/services.py
+"""
+Складские операции: приход, расход, перемещение, корректировка.
+
+Единственный путь изменения остатков. Каждый вызов в одной транзакции
+дописывает строки в журнал StockMovement и сдвигает InventoryItem.qty
+выражением F('qty') + delta — без чтения остатка в Python, поэтому
+параллельные кассы не теряют обновлений. Пачка из N позиций — постоянное
+число запросов: вставка недостающих строк остатков, один UPDATE
+с CASE на склад, проверка минуса (только для списаний), вставка журнала.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from catalog import detail_cache
+from catalog.models import ProductVariant
+from .models import InventoryItem, StockMovement
+
+MoveType = StockMovement.MoveType
+
+# Столько пар (склад, вариант) уходит в один UPDATE — предел выражения у SQLite
+UPDATE_BATCH = 500
+
+
+class InsufficientStock(Exception):
+    """Списание увело бы остаток в минус (или в чужой резерв); транзакция откатывается целиком."""
+
+    def __init__(self, shortages):
+        # [(warehouse_id, variant_id, остаток после списания), ...]
+        self.shortages = shortages
+        super().__init__(
+            'Недостаточно остатка: '
+            + ', '.join(f'вариант {v} на складе {w} ({qty})' for w, v, qty in shortages)
+        )
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _lines(lines):
+    """(вариант или id, кол-во) -> [(variant_id, qty)], нулевые строки выбрасываем."""
+    return [(_pk(variant), int(qty)) for variant, qty in lines if int(qty)]
+
+
+def _by_warehouse(keys) -> dict:
+    """[(warehouse_id, variant_id)] -> {warehouse_id: [variant_id, ...]} в порядке keys."""
+    grouped = defaultdict(list)
+    for w, v in keys:
+        grouped[w].append(v)
+    return grouped
+
+
+def _match(keys) -> Q:
+    # Пачка обычно с одного склада: «склад = w AND вариант IN (...)» дешевле OR-а из пар
+    match = Q()
+    for w, variant_ids in _by_warehouse(keys).items():
+        match |= Q(warehouse_id=w, variant_id__in=variant_ids)
+    return match
+
+
+def shift(field: str, deltas: dict) -> None:
+    """
+    Сдвигает числовое поле InventoryItem на {(warehouse_id, variant_id): delta}:
+    один UPDATE с CASE на пачку вариантов одного склада. Строки остатков должны существовать.
+    """
+    keys = sorted(key for key, d in deltas.items() if d)  # один порядок блокировок у всех
+    for w, variant_ids in _by_warehouse(keys).items():
+        for i in range(0, len(variant_ids), UPDATE_BATCH):
+            batch = variant_ids[i:i + UPDATE_BATCH]
+            # Ветка CASE на каждое различное значение сдвига, а не на вариант: в чеке
+            # почти все строки по 1 шт., и 30 веток собирались бы дольше самого UPDATE
+            by_delta = defaultdict(list)
+            for v in batch:
+                by_delta[deltas[w, v]].append(v)
+            whens = [When(variant_id__in=vs, then=Value(d)) for d, vs in sorted(by_delta.items())]
+            InventoryItem.objects.filter(warehouse_id=w, variant_id__in=batch).update(
+                **{field: F(field) + Case(*whens, default=Value(0), output_field=IntegerField())}
+            )
+
+
+def invalidate_pages(variant_ids) -> None:
+    """Сбросить кэш карточек товаров этих вариантов после коммита."""
+    product_ids = set(ProductVariant.objects.filter(pk__in=set(variant_ids)).values_list('product_id', flat=True))
+    transaction.on_commit(lambda: detail_cache.invalidate(product_ids))
+
+
+def apply_deltas(deltas: dict, allow_negative: bool = False) -> None:
+    """
+    Сдвигает остатки: {(warehouse_id, variant_id): delta}. Вызывать внутри транзакции.
+    Журнал не пишет — это делают операции ниже (и модули, у которых свой журнал).
+    Без allow_negative списание не может залезть ни в минус, ни в чужой резерв.
+    """
+    deltas = {key: d for key, d in deltas.items() if d}
+    if not deltas:
+        return
+    keys = sorted(deltas)
+    InventoryItem.objects.bulk_create(
+        [InventoryItem(warehouse_id=w, variant_id=v, qty=0) for w, v in keys],
+        batch_size=UPDATE_BATCH, ignore_conflicts=True,
+    )
+    shift('qty', deltas)
+
+    if not allow_negative:
+        # Строки уже заблокированы нашим UPDATE — прочитанное значение окончательное
+        debited = [key for key in keys if deltas[key] < 0]
+        negative = []
+        for i in range(0, len(debited), UPDATE_BATCH):
+            negative += (
+                InventoryItem.objects.filter(_match(debited[i:i + UPDATE_BATCH]), qty__lt=F('qty_reserved'))
+                .values_list('warehouse_id', 'variant_id', 'qty')
+            )
+        if negative:
+            raise InsufficientStock(sorted(negative))
+
+    invalidate_pages(v for _, v in keys)
+
+
+def post(movements, allow_negative: bool = False) -> list:
+    """Проводит несохранённые StockMovement: остатки + журнал одной транзакцией."""
+    movements = list(movements)
+    deltas = defaultdict(int)
+    for m in movements:
+        deltas[m.warehouse_id, m.variant_id] += m.qty_delta
+    with transaction.atomic():
+        apply_deltas(deltas, allow_negative=allow_negative)
+        return StockMovement.objects.bulk_create(movements, batch_size=UPDATE_BATCH)
+
+
+def receive(warehouse, lines, note: str = '') -> list:
+    """Приход на склад: lines — [(вариант, кол-во > 0), ...]."""
+    return post(
+        StockMovement(warehouse_id=_pk(warehouse), variant_id=v, move_type=MoveType.IN, qty_delta=abs(qty), note=note)
+        for v, qty in _lines(lines)
+    )
+
+
+def issue(warehouse, lines, note: str = '', allow_negative: bool = False) -> list:
+    """Расход со склада; без allow_negative уход в минус — InsufficientStock."""
+    return post(
+        (
+            StockMovement(warehouse_id=_pk(warehouse), variant_id=v, move_type=MoveType.OUT, qty_delta=-abs(qty), note=note)
+            for v, qty in _lines(lines)
+        ),
+        allow_negative=allow_negative,
+    )
+
+
+def transfer(source, target, lines, note: str = '') -> list:
+    """Перемещение между складами: парные OUT/IN в одной транзакции."""
+    if _pk(source) == _pk(target):
+        raise ValueError('Склад-отправитель и склад-получатель совпадают')
+    movements = []
+    for v, qty in _lines(lines):
+        qty = abs(qty)
+        movements.append(StockMovement(
+            warehouse_id=_pk(source), variant_id=v, move_type=MoveType.OUT, qty_delta=-qty, note=note,
+        ))
+        movements.append(StockMovement(
+            warehouse_id=_pk(target), variant_id=v, move_type=MoveType.IN, qty_delta=qty, note=note,
+        ))
+    return post(movements)
+
+
+def adjust(warehouse, lines, note: str = '') -> list:
+    """Корректировка со знаком (пересорт, порча, излишки). Минус допускается."""
+    return post(
+        (
+            StockMovement(warehouse_id=_pk(warehouse), variant_id=v, move_type=MoveType.ADJ, qty_delta=qty, note=note)
+            for v, qty in _lines(lines)
+        ),
+        allow_negative=True,
+    )
@@ -0,0 +1,23 @@
+# inventory/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog import detail_cache
+from catalog.models import ProductVariant
+from .models import InventoryItem
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def stock_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Остатки вариантов показываются в карточке товара. Вариант целиком не
+    # грузим: уже загруженный — берём из памяти, иначе только его product_id
+    if InventoryItem.variant.is_cached(instance):
+        product_ids = [instance.variant.product_id]
+    else:
+        product_ids = list(
+            ProductVariant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True)
+        )
+    detail_cache.invalidate(product_ids)
@@ -0,0 +1,137 @@
+# inventory/stocktake.py
+"""
+Инвентаризация: пачки сканов с ТСД -> итог по вариантам -> корректировки.
+
+Пачка сканов — несколько запросов независимо от размера: коды резолвятся
+двумя IN-запросами (штрихкоды, затем SKU), сырые сканы пишутся bulk_create,
+итоги по вариантам сдвигаются одним UPDATE с CASE. Закрытие сравнивает
+посчитанное с InventoryItem на стороне базы (UPDATE ... = подзапрос)
+и проводит расхождения корректировками через inventory.services.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalog.models import Barcode, ProductVariant
+from . import services
+from .models import InventoryItem, StockMovement, Stocktake, StocktakeLine, StocktakeScan
+
+BATCH = 500
+
+
+class StocktakeClosed(Exception):
+    """Инвентаризация уже закрыта — сканы и повторное закрытие не принимаются."""
+
+
+def resolve_codes(codes) -> dict:
+    """{код: variant_id} для штрихкодов и SKU; неизвестных кодов в ответе нет."""
+    codes = list(set(codes))
+    found = {}
+    for i in range(0, len(codes), BATCH):
+        found.update(Barcode.objects.filter(code__in=codes[i:i + BATCH]).values_list('code', 'variant_id'))
+    rest = [c for c in codes if c not in found]
+    for i in range(0, len(rest), BATCH):
+        found.update(ProductVariant.objects.filter(sku__in=rest[i:i + BATCH]).values_list('sku', 'pk'))
+    return found
+
+
+def _parse(scans):
+    """Скан — строка кода или (код, кол-во) / {'code': ..., 'qty': ...}."""
+    for scan in scans:
+        if isinstance(scan, dict):
+            code, qty = scan.get('code'), scan.get('qty', 1)
+        elif isinstance(scan, (list, tuple)):
+            code, qty = scan[0], scan[1] if len(scan) > 1 else 1
+        else:
+            code, qty = scan, 1
+        code = str(code or '').strip()
+        if code:
+            yield code, int(qty)
+
+
+def _lock_open(stocktake_id) -> Stocktake:
+    stocktake = Stocktake.objects.select_for_update().get(pk=stocktake_id)
+    if stocktake.status != Stocktake.Status.OPEN:
+        raise StocktakeClosed(f'Инвентаризация #{stocktake_id} закрыта')
+    return stocktake
+
+
+def add_scans(stocktake, scans, device: str = ''):
+    """Принимает пачку сканов. Возвращает (принято сканов, [неизвестные коды])."""
+    parsed = list(_parse(scans))
+    variant_ids = resolve_codes(code for code, _ in parsed)
+    unknown = sorted({code for code, _ in parsed if code not in variant_ids})
+    accepted = [(variant_ids[code], qty) for code, qty in parsed if code in variant_ids]
+    totals = Counter()
+    for variant_id, qty in accepted:
+        totals[variant_id] += qty
+
+    with transaction.atomic():
+        stocktake = _lock_open(getattr(stocktake, 'pk', stocktake))
+        StocktakeScan.objects.bulk_create(
+            [StocktakeScan(stocktake=stocktake, variant_id=v, qty=qty, device=device) for v, qty in accepted],
+            batch_size=BATCH,
+        )
+        StocktakeLine.objects.bulk_create(
+            [StocktakeLine(stocktake=stocktake, variant_id=v) for v in totals],
+            batch_size=BATCH, ignore_conflicts=True,
+        )
+        keys = sorted(totals)
+        for i in range(0, len(keys), BATCH):
+            batch = keys[i:i + BATCH]
+            StocktakeLine.objects.filter(stocktake=stocktake, variant_id__in=batch).update(
+                counted=F('counted') + Case(
+                    *[When(variant_id=v, then=Value(totals[v])) for v in batch],
+                    default=Value(0), output_field=IntegerField(),
+                )
+            )
+    return len(accepted), unknown
+
+
+def close(stocktake) -> int:
+    """Сравнивает посчитанное с учётом и проводит корректировки. Возвращает число расхождений."""
+    with transaction.atomic():
+        stocktake = _lock_open(getattr(stocktake, 'pk', stocktake))
+        lines = StocktakeLine.objects.filter(stocktake=stocktake)
+        if stocktake.full:
+            # Лежит на складе, но ни разу не отсканировано — по факту ноль
+            missing = (
+                InventoryItem.objects.filter(warehouse_id=stocktake.warehouse_id)
+                .exclude(qty=0)
+                .exclude(variant_id__in=lines.values('variant_id'))
+                .values_list('variant_id', flat=True)
+            )
+            StocktakeLine.objects.bulk_create(
+                [StocktakeLine(stocktake=stocktake, variant_id=v) for v in missing], batch_size=BATCH,
+            )
+        lines.update(expected=Coalesce(
+            Subquery(
+                InventoryItem.objects.filter(warehouse_id=stocktake.warehouse_id, variant_id=OuterRef('variant_id'))
+                .values('qty')[:1]
+            ),
+            Value(0),
+        ))
+        diffs = list(
+            lines.exclude(counted=F('expected'))
+            .annotate(delta=F('counted') - F('expected'))
+            .values_list('variant_id', 'delta')
+        )
+        note = f'Инвентаризация #{stocktake.pk}'
+        services.post(
+            (
+                StockMovement(
+                    warehouse_id=stocktake.warehouse_id, variant_id=v,
+                    move_type=StockMovement.MoveType.ADJ, qty_delta=delta, note=note,
+                )
+                for v, delta in diffs
+            ),
+            allow_negative=True,
+        )
+        stocktake.status = Stocktake.Status.CLOSED
+        stocktake.closed_at = timezone.now()
+        stocktake.discrepancies = len(diffs)
+        stocktake.save(update_fields=['status', 'closed_at', 'discrepancies'])
+    return len(diffs)
@@ -1,3 +1,103 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.db import transaction
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from catalog.models import Product, ProductVariant
+from inventory import reservations, services
+from inventory.models import InventoryItem, StockMovement, StockReservation, Stocktake, Warehouse
+
+
+class ApplyDeltasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warehouse = Warehouse.objects.create(name='Основной', slug='main', is_default=True)
+        product = Product.objects.create(name='Футболка', price=100)
+        cls.a = ProductVariant.objects.create(product=product, sku='T-S')
+        cls.b = ProductVariant.objects.create(product=product, sku='T-M')
+        services.receive(cls.warehouse, [(cls.a.pk, 5), (cls.b.pk, 1)])
+
+    def qty(self, variant):
+        return InventoryItem.objects.get(warehouse=self.warehouse, variant=variant).qty
+
+    def test_refuses_to_go_negative(self):
+        w = self.warehouse.pk
+        with self.assertRaises(services.InsufficientStock) as ctx:
+            with transaction.atomic():
+                services.apply_deltas({(w, self.a.pk): -2, (w, self.b.pk): -3})
+        self.assertEqual(ctx.exception.shortages, [(w, self.b.pk, -2)])
+        # Откатился весь сдвиг, включая строку, которой остатка хватало
+        self.assertEqual(self.qty(self.a), 5)
+        self.assertEqual(self.qty(self.b), 1)
+
+    def test_reserved_stock_is_not_available(self):
+        InventoryItem.objects.filter(warehouse=self.warehouse, variant=self.a).update(qty_reserved=4)
+        with self.assertRaises(services.InsufficientStock):
+            with transaction.atomic():
+                services.apply_deltas({(self.warehouse.pk, self.a.pk): -2})
+        self.assertEqual(self.qty(self.a), 5)
+
+    def test_allow_negative(self):
+        with transaction.atomic():
+            services.apply_deltas({(self.warehouse.pk, self.b.pk): -3}, allow_negative=True)
+        self.assertEqual(self.qty(self.b), -2)
+
+    def test_issue_rolls_back_movements(self):
+        movements = StockMovement.objects.count()
+        with self.assertRaises(services.InsufficientStock):
+            services.issue(self.warehouse, [(self.a.pk, 1), (self.b.pk, 2)])
+        self.assertEqual(StockMovement.objects.count(), movements)
+        self.assertEqual(self.qty(self.a), 5)
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warehouse = Warehouse.objects.create(name='Основной', slug='main', is_default=True)
+        product = Product.objects.create(name='Футболка', price=100)
+        cls.variant = ProductVariant.objects.create(product=product, sku='T-S')
+        services.receive(cls.warehouse, [(cls.variant.pk, 2)])
+
+    def reserved(self):
+        return InventoryItem.objects.get(warehouse=self.warehouse, variant=self.variant).qty_reserved
+
+    def test_reserved_stock_blocks_other_carts(self):
+        reservations.set_qty('cart-1', self.warehouse, self.variant, 2)
+        with self.assertRaises(services.InsufficientStock) as ctx:
+            reservations.set_qty('cart-2', self.warehouse, self.variant, 1)
+        self.assertEqual(ctx.exception.shortages, [(self.warehouse.pk, self.variant.pk, 0)])
+        # Своя корзина может уменьшить резерв — освободившееся достаётся другой
+        reservations.set_qty('cart-1', self.warehouse, self.variant, 1)
+        reservations.set_qty('cart-2', self.warehouse, self.variant, 1)
+        self.assertEqual(self.reserved(), 2)
+
+    def test_sweep_releases_only_expired(self):
+        reservations.set_qty('cart-1', self.warehouse, self.variant, 1)
+        reservations.set_qty('cart-2', self.warehouse, self.variant, 1)
+        StockReservation.objects.filter(cart_key='cart-1').update(
+            expires_at=timezone.now() - reservations.RESERVATION_TTL,
+        )
+        self.assertEqual(reservations.sweep(batch_size=1), 1)
+        self.assertEqual(list(StockReservation.objects.values_list('cart_key', flat=True)), ['cart-2'])
+        self.assertEqual(self.reserved(), 1)
+        # Снятый по сроку резерв снова можно взять
+        reservations.set_qty('cart-3', self.warehouse, self.variant, 1)
+        self.assertEqual(self.reserved(), 2)
+
+
+class StocktakeCsrfTests(TestCase):
+    def test_device_gets_token_before_posting(self):
+        warehouse = Warehouse.objects.create(name='Основной', slug='main')
+        product = Product.objects.create(name='Футболка', price=100)
+        ProductVariant.objects.create(product=product, sku='T-S')
+        session = Stocktake.objects.create(warehouse=warehouse)
+        device = Client(enforce_csrf_checks=True)
+        url = f'/stock/stocktake/{session.pk}/scans/'
+        body = json.dumps({'device': 'tsd-1', 'scans': ['T-S', 'T-S']})
+
+        self.assertEqual(device.post(url, body, content_type='application/json').status_code, 403)
+        token = device.get(f'/stock/stocktake/{session.pk}/').json()['csrf_token']
+        response = device.post(url, body, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], 2)
@@ -0,0 +1,80 @@
+# inventory/transfers.py
+"""
+Документы перемещения между складами.
+
+ship() списывает все строки со склада-отправителя (товар «в пути»),
+receive() приходует их на склад-получатель; post() делает то и другое
+одной транзакцией. Смена статуса — условный UPDATE «WHERE status = ожидаемый»:
+повторный вызов (двойной клик, повтор запроса) ничего не проводит второй раз.
+Строки проводятся пачкой через inventory.services — число запросов
+не зависит от числа строк.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import services
+from .models import StockMovement, Transfer, TransferLine
+
+Status = Transfer.Status
+
+
+def add_lines(transfer, lines) -> None:
+    """Добавить/заменить строки черновика: [(вариант или id, кол-во), ...]."""
+    lines = {getattr(v, 'pk', v): int(qty) for v, qty in lines}
+    with transaction.atomic():
+        if not Transfer.objects.filter(pk=transfer.pk, status=Status.DRAFT).exists():
+            raise ValueError(f'{transfer}: строки меняются только в черновике')
+        TransferLine.objects.bulk_create(
+            [TransferLine(transfer=transfer, variant_id=v, qty=qty) for v, qty in lines.items() if qty > 0],
+            update_conflicts=True, unique_fields=['transfer', 'variant'], update_fields=['qty'],
+            batch_size=services.UPDATE_BATCH,
+        )
+        TransferLine.objects.filter(transfer=transfer, variant_id__in=[v for v, qty in lines.items() if qty <= 0]).delete()
+
+
+def _switch(transfer, expected, new, **fields) -> bool:
+    """Перевести документ в статус new, если он сейчас в expected. False — уже переведён."""
+    return bool(Transfer.objects.filter(pk=transfer.pk, status=expected).update(status=new, **fields))
+
+
+def _movements(transfer, warehouse_id, move_type, sign) -> list:
+    note = f'Перемещение #{transfer.pk}'
+    return [
+        StockMovement(warehouse_id=warehouse_id, variant_id=v, move_type=move_type, qty_delta=sign * qty, note=note)
+        for v, qty in TransferLine.objects.filter(transfer=transfer).values_list('variant_id', 'qty')
+    ]
+
+
+def ship(transfer) -> bool:
+    """Отгрузка: списание со склада-отправителя. False — уже отгружено ранее."""
+    with transaction.atomic():
+        if not _switch(transfer, Status.DRAFT, Status.IN_TRANSIT, shipped_at=timezone.now()):
+            return False
+        services.post(_movements(transfer, transfer.source_id, StockMovement.MoveType.OUT, -1))
+    transfer.refresh_from_db(fields=['status', 'shipped_at'])
+    return True
+
+
+def receive(transfer) -> bool:
+    """Приёмка: оприходование на складе-получателе. False — уже принято ранее."""
+    with transaction.atomic():
+        if not _switch(transfer, Status.IN_TRANSIT, Status.RECEIVED, received_at=timezone.now()):
+            return False
+        services.post(_movements(transfer, transfer.target_id, StockMovement.MoveType.IN, 1))
+    transfer.refresh_from_db(fields=['status', 'received_at'])
+    return True
+
+
+def post(transfer) -> bool:
+    """Отгрузка и приёмка сразу — для перемещения внутри одного магазина."""
+    with transaction.atomic():
+        shipped = ship(transfer)
+        received = receive(transfer)
+    return shipped or received
+
+
+def cancel(transfer) -> bool:
+    """Отменить можно только черновик — отгруженное возвращают обратным перемещением."""
+    cancelled = _switch(transfer, Status.DRAFT, Status.CANCELLED)
+    transfer.refresh_from_db(fields=['status'])
+    return cancelled
@@ -7,4 +7,9 @@ app_name = "inventory"
 urlpatterns = [
     path("", views.stock_list, name="stock_list"),          # /stock/
     path("low/", views.stock_low, name="stock_low"),        # /stock/low/
+    path("moves/", views.moves, name="moves"),              # /stock/moves/
+    path("stocktake/<int:pk>/", views.stocktake_detail, name="stocktake_detail"),   # ТСД: состояние + CSRF
+    path("stocktake/<int:pk>/scans/", views.stocktake_scans, name="stocktake_scans"),
+    path("stocktake/<int:pk>/close/", views.stocktake_close, name="stocktake_close"),
+    path("export/<str:fmt>/", views.stock_export, name="stock_export"),  # /stock/export/csv/
 ]
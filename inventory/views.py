@@ -1,7 +1,24 @@
 # inventory/views.py
-from django.shortcuts import render
-from django.db.models import F, Q
-from .models import InventoryItem  # только модели!
+import json
+from datetime import datetime, time, timedelta
+
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.middleware.csrf import get_token
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import content_disposition_header, urlencode
+from catalog.models import ProductVariant
+from catalog.pagination import keyset_paginate
+from . import exports, stocktake
+from .models import LOW_STOCK, InventoryItem, StockMovement, Stocktake, Warehouse  # только модели!
+
+LOW_STOCK_PER_PAGE = 100
+MOVES_PER_PAGE = 100
+MOVES_ORDERING = ("-created_at", "id")
 
 def _base_qs():
     # Подтягиваем связанные сущности, чтобы в шаблоне было удобно показывать данные
@@ -21,17 +38,146 @@ def stock_list(request):
 
 def stock_low(request):
     """
-    Низкие остатки. Если в модели есть поле min_qty — фильтруем по нему,
-    иначе считаем «низким» <= 5 штук.
+    Низкие остатки: qty <= min_qty у позиций с заданным порогом.
+    Список и сводка по складам/брендам читают только частичный индекс
+    inventory_item_low, сколько бы строк остатков ни было.
     """
-    qs = _base_qs()
-    if hasattr(InventoryItem, "min_qty"):
-        items = qs.filter(qty__lte=F("min_qty"))
-    else:
-        items = qs.filter(qty__lte=5)
+    qs = InventoryItem.objects.filter(LOW_STOCK)
+    warehouse = request.GET.get("warehouse", "")
+    if warehouse:
+        qs = qs.filter(warehouse__slug=warehouse)
 
+    groups = (
+        qs.order_by("warehouse__name", "variant__product__brand__name")
+        .values("warehouse__name", "variant__product__brand__name")
+        .annotate(positions=Count("id"), shortage=Sum(F("min_qty") - F("qty")))
+    )
+    page = keyset_paginate(
+        qs.select_related("variant__product__brand", "warehouse"),
+        ("warehouse_id", "id"), request.GET.get("cursor"), per_page=LOW_STOCK_PER_PAGE,
+    )
     ctx = {
         "page_name": "stock_low",
-        "items": items.order_by("id"),
+        "items": page,
+        "page": page,
+        "groups": groups,
+        "warehouses": Warehouse.objects.order_by("name"),
+        "warehouse": warehouse,
     }
     return render(request, "inventory/stock_low.html", ctx)
+
+
+def _day_start(value):
+    try:
+        day = parse_date(value or "")
+    except ValueError:  # 2026-13-01 и т.п.
+        day = None
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+
+def moves(request):
+    """
+    Журнал движений: /stock/moves/?warehouse=&variant=&type=&date_from=&date_to=
+    Keyset-страницы по (-created_at, id); каждому фильтру — свой составной индекс.
+    """
+    qs = StockMovement.objects.select_related("variant__product", "warehouse")
+    filters = {}
+    warehouse = request.GET.get("warehouse", "")
+    if warehouse:
+        qs = qs.filter(warehouse__slug=warehouse)
+        filters["warehouse"] = warehouse
+    variant = request.GET.get("variant", "").strip()
+    if variant:
+        # id варианта, SKU или штрихкод — что удобнее
+        found = ProductVariant.objects.by_code(variant) or (
+            ProductVariant.objects.filter(pk=variant).first() if variant.isdigit() else None
+        )
+        qs = qs.filter(variant=found) if found else qs.none()
+        filters["variant"] = variant
+    move_type = request.GET.get("type", "")
+    if move_type in StockMovement.MoveType.values:
+        qs = qs.filter(move_type=move_type)
+        filters["type"] = move_type
+    date_from = _day_start(request.GET.get("date_from"))
+    if date_from:
+        qs = qs.filter(created_at__gte=date_from)
+        filters["date_from"] = request.GET["date_from"]
+    date_to = _day_start(request.GET.get("date_to"))
+    if date_to:
+        # Включительно: до начала следующего дня
+        qs = qs.filter(created_at__lt=date_to + timedelta(days=1))
+        filters["date_to"] = request.GET["date_to"]
+
+    page = keyset_paginate(qs, MOVES_ORDERING, request.GET.get("cursor"), per_page=MOVES_PER_PAGE)
+    ctx = {
+        "page_name": "stock_moves",
+        "moves": page,
+        "page": page,
+        "filters": filters,
+        "filter_query": urlencode(filters),
+        "warehouses": Warehouse.objects.order_by("name"),
+        "move_types": StockMovement.MoveType.choices,
+    }
+    return render(request, "inventory/moves.html", ctx)
+
+
+def stock_export(request, fmt: str):
+    """
+    Выгрузка каталога с остатками: /stock/export/csv/ или /stock/export/jsonl/.
+    Отдаётся потоком — память воркера не растёт с размером каталога.
+    """
+    if fmt not in exports.FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    filename = f'catalog-stock-{timezone.localtime():%Y%m%d-%H%M}.{fmt}'
+    response = StreamingHttpResponse(exports.iter_lines(fmt), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+@require_GET
+@ensure_csrf_cookie
+def stocktake_detail(request, pk: int):
+    """
+    Состояние инвентаризации для ТСД: GET /stock/stocktake/<pk>/
+    Заодно выдаёт CSRF: cookie csrftoken и csrf_token в ответе. POST-запросы
+    ниже принимаются только с этой cookie и заголовком X-CSRFToken (по HTTPS —
+    ещё и с Referer на адрес сервера).
+    """
+    session = get_object_or_404(Stocktake.objects.select_related("warehouse"), pk=pk)
+    return JsonResponse({
+        "id": session.pk,
+        "warehouse": session.warehouse.slug,
+        "status": session.status,
+        "full": session.full,
+        "csrf_token": get_token(request),
+    })
+
+
+@require_POST
+def stocktake_scans(request, pk: int):
+    """
+    Пачка сканов с ТСД: POST /stock/stocktake/<pk>/scans/
+    {"device": "tsd-1", "scans": ["4600...", ["4600...", 3], {"code": "SKU", "qty": 2}]}
+    CSRF-токен — из stocktake_detail.
+    """
+    session = get_object_or_404(Stocktake, pk=pk)
+    try:
+        payload = json.loads(request.body)
+        scans = payload["scans"]
+        accepted, unknown = stocktake.add_scans(session, scans, device=str(payload.get("device", ""))[:64])
+    except (ValueError, KeyError, TypeError, IndexError):
+        return JsonResponse({"error": "Ожидается JSON со списком scans"}, status=400)
+    except stocktake.StocktakeClosed as exc:
+        return JsonResponse({"error": str(exc)}, status=409)
+    return JsonResponse({"accepted": accepted, "unknown": unknown})
+
+
+@require_POST
+def stocktake_close(request, pk: int):
+    """Закрытие инвентаризации: POST /stock/stocktake/<pk>/close/, CSRF — как у сканов."""
+    session = get_object_or_404(Stocktake, pk=pk)
+    try:
+        discrepancies = stocktake.close(session)
+    except stocktake.StocktakeClosed as exc:
+        return JsonResponse({"error": str(exc)}, status=409)
+    return JsonResponse({"discrepancies": discrepancies})
@@ -1,6 +1,6 @@
 # sales/admin.py
 from django.contrib import admin
-from .models import Sale, SaleItem
+from .models import ReceiptBlock, Sale, SaleItem
 
 
 def _get(obj, *names, default="-"):
@@ -17,28 +17,34 @@ def _get(obj, *names, default="-"):
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
     """
-    Убираем несуществующие 'seller' и 'items_count'.
-    Делаем безопасную колонку counts через related_name items (или объектный менеджер).
+    Число позиций — аннотация в запросе списка (Sale.objects.with_item_stats),
+    а не count() на каждую строку.
     """
     list_display = (
         "id",
+        "number",
         "created_at_col",
+        "terminal",
         "total_col",
         "payment_col",
         "items_count_col",
     )
-    date_hierarchy = "created_at"
-
+    # Без date_hierarchy: она перебирает все чеки (DISTINCT по году в Python-функции
+    # SQLite) на каждой странице. Периоды — list_filter по дате и /pos/history/
     list_filter = (
         "created_at",
-        "payment_method",  # если есть
+        "payment_method",
     )
 
     search_fields = (
         "id",
-        "customer__name",  # если есть
+        "number",
+        "terminal",
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_item_stats()
+
     def created_at_col(self, obj):
         return _get(obj, "created_at")
     created_at_col.short_description = "Дата"
@@ -52,18 +58,7 @@ class SaleAdmin(admin.ModelAdmin):
     payment_col.short_description = "Оплата"
 
     def items_count_col(self, obj):
-        """
-        Попытка посчитать количество позиций.
-        Пытаемся через related 'items', потом 'saleitem_set'.
-        """
-        try:
-            if hasattr(obj, "items"):
-                return obj.items.count()
-            # fallback по умолчанию
-            return obj.saleitem_set.count()
-        except Exception:
-            return 0
-
+        return obj.lines_count or 0
     items_count_col.short_description = "Позиций"
 
 
@@ -72,23 +67,20 @@ class SaleItemAdmin(admin.ModelAdmin):
     list_display = (
         "id",
         "sale",
-        "product_col",
+        "variant",
         "qty_col",
         "price_col",
         "total_col",
     )
-    list_select_related = True
+    list_select_related = ("sale", "variant__product")
 
     search_fields = (
         "sale__id",
-        "product__name",
-        "product__sku",
+        "variant__product__name",
+        "variant__sku",
+        "sku",
     )
 
-    def product_col(self, obj):
-        return _get(obj, "product")
-    product_col.short_description = "Товар"
-
     def qty_col(self, obj):
         return _get(obj, "qty", "quantity", default=0)
     qty_col.short_description = "Кол-во"
@@ -111,3 +103,20 @@ class SaleItemAdmin(admin.ModelAdmin):
             pass
         return 0
     total_col.short_description = "Сумма"
+
+
+@admin.register(ReceiptBlock)
+class ReceiptBlockAdmin(admin.ModelAdmin):
+    list_display = ("sequence", "holder", "first", "last", "leased_at")
+    list_filter = ("sequence__day", "holder")
+    list_select_related = ("sequence",)
+
+    # Блоки пишет sales.numbering; по ним идёт аудит пропусков — только просмотр
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,150 @@
+# sales/cart.py
+"""
+Корзина кассы в кэше, по ключу сессии.
+
+Строки — словарь {variant_id: кол-во} в порядке добавления: добавить,
+изменить, убрать — O(1), без запросов за самими строками. Данные
+вариантов для отрисовки поднимаются одним запросом на всю корзину
+(items()). Каждое изменение количества резервирует остаток
+(inventory.reservations) под ключом корзины; при оформлении
+продажи резерв превращается в расход.
+
+Корзина живёт в кэше столько же, сколько резервы (RESERVATION_TTL
+с последнего изменения): брошенная корзина исчезает вместе со своими
+резервами. В сессии ничего не пишется — скан не сохраняет сессию.
+
+Изменения идут под блокировкой корзины (cache.add): двойной скан или
+повтор htmx-запроса не затирают строки друг друга, и резервы в базе
+сходятся с корзиной. Под блокировкой корзина перечитывается из кэша.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+from catalog.models import ProductVariant
+from inventory import reservations
+from .checkout import CheckoutError
+
+CACHE_PREFIX = 'pos:cart:'
+TTL = int(reservations.RESERVATION_TTL.total_seconds())
+# Продлевать все резервы корзины не чаще раза в минуту — изменённая строка продлевается сама
+TOUCH_EVERY = 60
+LOCK_PREFIX = 'pos:cart-lock:'
+# Блокировка переживает упавший запрос не дольше LOCK_TTL; ждём её не дольше LOCK_WAIT
+LOCK_TTL = 10
+LOCK_WAIT = 5
+
+
+class Cart:
+    def __init__(self, session):
+        self.session = session
+        self._read()
+
+    def _read(self) -> None:
+        data = cache.get(self._cache_key()) if self.session.session_key else None
+        data = data or {}
+        self.lines = data.get('lines', {})
+        self.warehouse_id = data.get('warehouse')
+        self.touched = data.get('touched', 0)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def _cache_key(self) -> str:
+        return CACHE_PREFIX + self.session.session_key
+
+    @property
+    def key(self) -> str:
+        """Ключ корзины для резервов — по сессии кассы."""
+        if not self.session.session_key:
+            # Сессия нужна только ради ключа: пустую middleware не сохранит и cookie не выдаст
+            self.session['pos'] = True
+            self.session.save()
+        return f'session:{self.session.session_key}'
+
+    def _save(self) -> None:
+        data = {'lines': self.lines, 'warehouse': self.warehouse_id, 'touched': self.touched}
+        cache.set(self._cache_key(), data, TTL)
+
+    @contextmanager
+    def _locked(self):
+        """Изменение корзины: под блокировкой, по свежей копии из кэша."""
+        self.key  # нужен ключ сессии
+        lock_key, token = LOCK_PREFIX + self.session.session_key, uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(lock_key, token, LOCK_TTL):
+            if time.monotonic() > deadline:
+                raise CheckoutError('Корзина занята другим запросом, повторите')
+            time.sleep(0.02)
+        try:
+            self._read()
+            yield
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    def set(self, variant_id: int, qty: int, warehouse_id: int) -> None:
+        """Ровно qty штук варианта (0 — убрать). Нет остатка — InsufficientStock, корзина не меняется."""
+        with self._locked():
+            self._set(variant_id, qty, warehouse_id)
+
+    def _set(self, variant_id: int, qty: int, warehouse_id: int) -> None:
+        if self.warehouse_id is None:
+            self.warehouse_id = warehouse_id
+        qty = max(int(qty), 0)
+        reservations.set_qty(self.key, self.warehouse_id, variant_id, qty)
+        if qty:
+            self.lines[variant_id] = qty
+        else:
+            self.lines.pop(variant_id, None)
+        if time.time() - self.touched > TOUCH_EVERY:
+            reservations.touch(self.key)
+            self.touched = time.time()
+        self._save()
+
+    def add(self, variant_id: int, warehouse_id: int, qty: int = 1) -> None:
+        with self._locked():
+            self._set(variant_id, self.lines.get(variant_id, 0) + qty, warehouse_id)
+
+    def remove(self, variant_id: int) -> None:
+        if not self.session.session_key:
+            return
+        with self._locked():
+            if variant_id in self.lines:
+                self._set(variant_id, 0, self.warehouse_id)
+
+    def clear(self) -> None:
+        """Очистить корзину и снять её резервы."""
+        if not self.session.session_key:
+            return
+        with self._locked():
+            if self.lines:
+                reservations.release(self.key)
+            self._forget()
+
+    def forget(self) -> None:
+        """Забыть строки без снятия резервов — их уже забрало оформление продажи."""
+        if not self.session.session_key:
+            return
+        with self._locked():
+            self._forget()
+
+    def _forget(self) -> None:
+        self.lines = {}
+        self.warehouse_id = None
+        cache.delete(self._cache_key())
+
+    def payload(self) -> list:
+        """Строки в формате sales.checkout: [{'variant': id, 'qty': n}, ...]."""
+        return [{'variant': pk, 'qty': qty} for pk, qty in self.lines.items()]
+
+    def items(self):
+        """([(вариант, кол-во), ...] в порядке добавления, итог) — один запрос на всю корзину."""
+        variants = ProductVariant.objects.select_related('product').in_bulk(list(self.lines))
+        items = [(variants[pk], qty) for pk, qty in self.lines.items() if pk in variants]
+        return items, sum((v.effective_price * qty for v, qty in items), 0)
@@ -0,0 +1,284 @@
+# sales/checkout.py
+"""
+Оформление продажи на кассе.
+
+Одна транзакция: чек, все позиции одним bulk_create (сумма посчитана
+заранее — save() позиций не вызывается), списание остатков пачкой
+через inventory (резервы корзины снимаются там же). Касса присылает
+свой ключ идемпотентности: повтор запроса после обрыва связи вернёт
+уже проведённый чек, а не второй. Номер чека выдаёт sales.numbering
+из блока, заранее взятого кассой, — без общей блокировки.
+
+ingest() принимает пачку продаж, накопленных кассой без связи: те же
+шаги, но сразу для сотен чеков — постоянное число запросов на пачку.
+"""
+from collections import OrderedDict, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from catalog.models import ProductVariant
+from inventory import reservations, services
+from inventory.models import StockMovement, Warehouse
+from . import numbering
+from .models import Sale, SaleItem
+
+# Столько продаж принимает одна выгрузка офлайн-очереди кассы
+INGEST_MAX = 500
+
+PAYMENT_METHODS = {value for value, _ in Sale._meta.get_field('payment_method').choices}
+# Предел DecimalField итога чека: больше база не сохранит
+_total = Sale._meta.get_field('total')
+MAX_TOTAL = Decimal(10) ** (_total.max_digits - _total.decimal_places)
+CENT = Decimal(10) ** -_total.decimal_places
+# Пределы целых полей базы: id варианта и кол-во в позиции
+MAX_ID = 2 ** 63 - 1
+MAX_QTY = 2 ** 31 - 1
+
+
+class CheckoutError(ValueError):
+    """Некорректная корзина: пустая, неизвестный вариант, кривое количество."""
+
+
+def _check_payment_method(value) -> None:
+    if not isinstance(value, str) or value not in PAYMENT_METHODS:
+        raise CheckoutError(f'Неизвестный способ оплаты: {value!r}')
+
+
+def default_warehouse():
+    return Warehouse.objects.order_by('-is_default', 'id').first()
+
+
+def _price(value):
+    """Цена кассы: конечное неотрицательное число, которое влезет в DecimalField."""
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise CheckoutError(f'Некорректная цена: {value!r}')
+    if not price.is_finite() or price < 0 or price >= MAX_TOTAL:
+        raise CheckoutError(f'Некорректная цена: {value!r}')
+    return price.quantize(CENT)
+
+
+def _lines(items) -> OrderedDict:
+    """[{'variant': id, 'qty': n, 'price': ...}, ...] -> {variant_id: [qty, price | None]}."""
+    if not isinstance(items, (list, tuple)):
+        raise CheckoutError(f'Позиции должны быть списком: {items!r}')
+    lines = OrderedDict()
+    for item in items:
+        if not isinstance(item, dict):
+            raise CheckoutError(f'Некорректная позиция: {item!r}')
+        try:
+            variant_id, qty = int(item['variant']), int(item.get('qty', 1))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            raise CheckoutError(f'Некорректная позиция: {item!r}')
+        if not 0 < variant_id <= MAX_ID:
+            raise CheckoutError(f'Некорректная позиция: {item!r}')
+        if qty <= 0:
+            raise CheckoutError(f'Количество должно быть больше нуля: {item!r}')
+        price = _price(item['price']) if item.get('price') is not None else None
+        line = lines.setdefault(variant_id, [0, price])
+        line[0] += qty
+        if line[0] > MAX_QTY:
+            raise CheckoutError(f'Слишком большое количество: {item!r}')
+    if not lines:
+        raise CheckoutError('Корзина пуста')
+    return lines
+
+
+def _sale_items(lines, variants, trust_prices: bool):
+    """Несохранённые SaleItem с готовыми name/sku/price/subtotal и итог чека."""
+    unknown = [pk for pk in lines if pk not in variants]
+    if unknown:
+        raise CheckoutError(f'Неизвестные варианты: {unknown}')
+    sale_items = []
+    for variant_id, (qty, price) in lines.items():
+        variant = variants[variant_id]
+        if price is None or not trust_prices:
+            price = variant.effective_price
+        sale_items.append(SaleItem(
+            variant=variant,
+            name=f'{variant.product.name} {variant.name}'.strip(),
+            sku=variant.sku,
+            price=price,
+            qty=qty,
+            subtotal=price * qty,
+        ))
+    total = sum(item.subtotal for item in sale_items)
+    if total >= MAX_TOTAL:
+        raise CheckoutError(f'Сумма чека слишком велика: {total}')
+    return sale_items, total
+
+
+def checkout(items, idempotency_key: str = '', payment_method: str = 'cash', terminal: str = '',
+             warehouse=None, cart_key: str = '', trust_prices: bool = False, allow_negative: bool = False):
+    """
+    Проводит продажу. Возвращает (sale, created); created=False — чек с этим
+    ключом уже был проведён раньше, ничего не списано повторно.
+    Цены берутся из каталога; trust_prices — принять цены кассы (офлайн-продажи).
+    """
+    key = (idempotency_key or '').strip()[:64] or None
+    if key:
+        existing = Sale.objects.filter(idempotency_key=key).first()
+        if existing:
+            return existing, False
+    _check_payment_method(payment_method)
+
+    lines = _lines(items)
+    variants = ProductVariant.objects.select_related('product').in_bulk(list(lines))
+    warehouse = warehouse or default_warehouse()
+    if warehouse is None:
+        raise CheckoutError('Не настроен склад для продаж')
+    sale_items, total = _sale_items(lines, variants, trust_prices)
+
+    # Номер берём до транзакции: откат продажи оставит пропуск, видимый numbering.gaps()
+    number = numbering.allocate(terminal=terminal)[0]
+    try:
+        with transaction.atomic():
+            sale = Sale.objects.create(
+                number=number,
+                idempotency_key=key,
+                payment_method=payment_method,
+                terminal=terminal[:32],
+                warehouse=warehouse,
+                total=total,
+            )
+            for item in sale_items:
+                item.sale = sale
+            SaleItem.objects.bulk_create(sale_items)
+            stock_lines = [(variant_id, qty) for variant_id, (qty, _) in lines.items()]
+            note = f'Продажа #{sale.pk}'
+            if cart_key:
+                reservations.convert(cart_key, warehouse, stock_lines, note=note, allow_negative=allow_negative)
+            else:
+                services.issue(warehouse, stock_lines, note=note, allow_negative=allow_negative)
+    except IntegrityError:
+        # Тот же ключ параллельно провёл другой запрос — отдаём его чек
+        if key:
+            existing = Sale.objects.filter(idempotency_key=key).first()
+            if existing:
+                return existing, False
+        raise
+    return sale, True
+
+
+def _sold_at(value):
+    """Время продажи на кассе (ISO 8601); без него — время выгрузки."""
+    if not value:
+        return timezone.now()
+    try:
+        sold_at = parse_datetime(str(value))
+    except (ValueError, OverflowError):  # формат верный, но такой даты нет: 2026-13-40
+        sold_at = None
+    if sold_at is None:
+        raise CheckoutError(f'Некорректное время продажи: {value}')
+    return timezone.make_aware(sold_at) if timezone.is_naive(sold_at) else sold_at
+
+
+def ingest(sales, _retry: bool = True) -> list:
+    """
+    Проводит пачку офлайн-продаж: [{"idempotency_key", "items", "payment_method",
+    "terminal", "warehouse", "created_at"}, ...]. Продажа уже состоялась — цены
+    кассы принимаются, остаток может уйти в минус. Повторы по ключу не проводятся.
+    Возвращает по записи на продажу: {"idempotency_key", "status": created |
+    duplicate, "id", "number"} или {"idempotency_key", "status": error, "error"}.
+    """
+    sales = [sale if isinstance(sale, dict) else {} for sale in sales]
+    if len(sales) > INGEST_MAX:
+        raise CheckoutError(f'Не больше {INGEST_MAX} продаж за раз')
+    keys = [str(sale.get('idempotency_key') or '').strip()[:64] for sale in sales]
+    done = {
+        key: (pk, number)
+        for key, pk, number in Sale.objects.filter(idempotency_key__in=set(keys) - {''})
+        .values_list('idempotency_key', 'pk', 'number')
+    }
+
+    results = [None] * len(sales)
+    parsed = {}  # индекс продажи -> (строки, время продажи, склад)
+    seen = set(done)
+    for i, (key, data) in enumerate(zip(keys, sales)):
+        if key in seen:
+            continue  # уже проведена или встретилась в пачке раньше
+        try:
+            if not key:
+                raise CheckoutError('Нет ключа идемпотентности')
+            _check_payment_method(data.get('payment_method') or 'cash')
+            parsed[i] = (
+                _lines(data.get('items') or []),
+                _sold_at(data.get('created_at')),
+                str(data.get('warehouse') or ''),
+            )
+            seen.add(key)
+        except CheckoutError as e:
+            results[i] = {'idempotency_key': key, 'status': 'error', 'error': str(e)}
+
+    # Варианты и склады всей пачки — по одному запросу
+    variants = ProductVariant.objects.select_related('product').in_bulk(
+        list({pk for lines, _, _ in parsed.values() for pk in lines})
+    )
+    warehouses = {
+        w.slug: w for w in Warehouse.objects.filter(slug__in={slug for _, _, slug in parsed.values()})
+    }
+    default = default_warehouse()
+
+    new_sales, new_items = {}, {}
+    for i, (lines, sold_at, slug) in parsed.items():
+        data = sales[i]
+        try:
+            warehouse = warehouses.get(slug) if slug else default
+            if warehouse is None:
+                raise CheckoutError(f'Неизвестный склад: {slug}' if slug else 'Не настроен склад для продаж')
+            new_items[i], total = _sale_items(lines, variants, trust_prices=True)
+        except CheckoutError as e:
+            results[i] = {'idempotency_key': keys[i], 'status': 'error', 'error': str(e)}
+            continue
+        new_sales[i] = Sale(
+            idempotency_key=keys[i],
+            payment_method=data.get('payment_method') or 'cash',
+            terminal=str(data.get('terminal') or '')[:32],
+            warehouse=warehouse,
+            total=total,
+            created_at=sold_at,
+        )
+
+    # Номера — пачкой на кассу и день продажи, до транзакции
+    by_counter = defaultdict(list)
+    for sale in new_sales.values():
+        by_counter[sale.terminal, timezone.localdate(sale.created_at)].append(sale)
+    for (terminal, day), group in by_counter.items():
+        for sale, number in zip(group, numbering.allocate(len(group), terminal=terminal, day=day)):
+            sale.number = number
+
+    try:
+        with transaction.atomic():
+            Sale.objects.bulk_create(new_sales.values(), batch_size=services.UPDATE_BATCH)
+            items, movements = [], []
+            for i, sale in new_sales.items():
+                for item in new_items[i]:
+                    item.sale = sale
+                    items.append(item)
+                    movements.append(StockMovement(
+                        warehouse_id=sale.warehouse_id, variant_id=item.variant_id,
+                        move_type=StockMovement.MoveType.OUT, qty_delta=-item.qty, note=f'Продажа #{sale.pk}',
+                    ))
+            SaleItem.objects.bulk_create(items, batch_size=services.UPDATE_BATCH)
+            services.post(movements, allow_negative=True)
+    except IntegrityError:
+        if not _retry:
+            raise
+        # Часть ключей параллельно провёл другой запрос — при повторе они станут дублями
+        return ingest(sales, _retry=False)
+
+    done.update((sale.idempotency_key, (sale.pk, sale.number)) for sale in new_sales.values())
+    for i, key in enumerate(keys):
+        if results[i] is not None:
+            continue
+        if key in done:
+            pk, number = done[key]
+            status = 'created' if i in new_sales else 'duplicate'
+            results[i] = {'idempotency_key': key, 'status': status, 'id': pk, 'number': number}
+        else:
+            results[i] = {'idempotency_key': key, 'status': 'error', 'error': 'Продажа с этим ключом в пачке не проведена'}
+    return results
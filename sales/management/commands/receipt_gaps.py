@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sales import numbering
+
+
+class Command(BaseCommand):
+    help = (
+        'Аудит нумерации чеков за день: номера из выданных кассам блоков, '
+        'не попавшие ни в один чек (откаты продаж, перезапуски, недоиспользованные хвосты блоков)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='День ГГГГ-ММ-ДД (по умолчанию — сегодня)')
+        parser.add_argument('--prefix', default=settings.RECEIPT_PREFIX, help='Префикс магазина')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Дата в формате ГГГГ-ММ-ДД')
+        else:
+            day = timezone.localdate()
+
+        missing = 0
+        for block, ranges in numbering.gaps(day, options['prefix']):
+            missing += sum(last - first + 1 for first, last in ranges)
+            spans = ', '.join(
+                numbering.format_number(options['prefix'], day, first) if first == last
+                else f'{numbering.format_number(options["prefix"], day, first)}…{last:06d}'
+                for first, last in ranges
+            )
+            self.stdout.write(f'{block}: {spans}')
+        self.stdout.write(f'Пропущено номеров: {missing}.')
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def empty_numbers_to_null(apps, schema_editor):
+    Sale = apps.get_model('sales', 'Sale')
+    Sale.objects.filter(number='').update(number=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_transfer'),
+        ('sales', '0004_alter_saleitem_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Ключ идемпотентности'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='terminal',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Касса'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sales', to='inventory.warehouse', verbose_name='Склад'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='number',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True, verbose_name='Номер чека'),
+        ),
+        migrations.RunPython(empty_numbers_to_null, migrations.RunPython.noop),
+    ]
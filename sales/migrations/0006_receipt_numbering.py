@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sale_checkout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('holder', models.CharField(max_length=64, verbose_name='Получатель')),
+                ('first', models.PositiveIntegerField(verbose_name='С номера')),
+                ('last', models.PositiveIntegerField(verbose_name='По номер')),
+                ('leased_at', models.DateTimeField(auto_now_add=True, verbose_name='Выдан')),
+            ],
+            options={
+                'verbose_name': 'Блок номеров чеков',
+                'verbose_name_plural': 'Блоки номеров чеков',
+                'ordering': ['sequence', 'first'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=8, verbose_name='Префикс')),
+                ('day', models.DateField(verbose_name='День')),
+                ('next_value', models.PositiveIntegerField(default=1, verbose_name='Следующий свободный')),
+            ],
+            options={
+                'verbose_name': 'Нумератор чеков',
+                'verbose_name_plural': 'Нумераторы чеков',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='receiptsequence',
+            constraint=models.UniqueConstraint(fields=('prefix', 'day'), name='sales_receipt_sequence_uniq'),
+        ),
+        migrations.AddField(
+            model_name='receiptblock',
+            name='sequence',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='sales.receiptsequence', verbose_name='Нумератор'),
+        ),
+        migrations.AddConstraint(
+            model_name='receiptblock',
+            constraint=models.UniqueConstraint(fields=('sequence', 'first'), name='sales_receipt_block_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_receipt_numbering'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Создано'),
+        ),
+    ]
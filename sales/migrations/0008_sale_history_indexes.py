@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_sale_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='sale',
+            options={'ordering': ['-created_at', 'id'], 'verbose_name': 'Продажа', 'verbose_name_plural': 'Продажи'},
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-created_at', 'id'], name='sales_sale_created'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['payment_method', '-created_at', 'id'], name='sales_sale_payment_created'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['terminal', '-created_at', 'id'], name='sales_sale_terminal_created'),
+        ),
+    ]
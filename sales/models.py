@@ -1,19 +1,37 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-# Пытаемся использовать ProductVariant, если он есть.
-# Если нет — безопасно привязываемся к Product.
-try:
-    from catalog.models import ProductVariant as VariantModel  # type: ignore
-    VARIANT_VERBOSE = _('Вариант')
-except Exception:
-    from catalog.models import Product as VariantModel  # fallback
-    VARIANT_VERBOSE = _('Товар')
+from catalog.models import ProductVariant
+from inventory.models import Warehouse
+
+
+class SaleQuerySet(models.QuerySet):
+    def with_item_stats(self):
+        """
+        lines_count / units — число позиций и штук в чеке. Коррелированные
+        подзапросы, а не JOIN + GROUP BY: считаются только для строк страницы
+        (ORDER BY ... LIMIT по индексу), а не для всех чеков диапазона.
+        """
+        items = SaleItem.objects.filter(sale=models.OuterRef('pk')).order_by().values('sale')
+        return self.annotate(
+            lines_count=models.Subquery(items.annotate(n=models.Count('*')).values('n')),
+            units=models.Subquery(items.annotate(n=models.Sum('qty')).values('n')),
+        )
 
 
 class Sale(models.Model):
-    number = models.CharField(_('Номер чека'), max_length=32, blank=True, unique=True)
-    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    # NULL, пока номер не выдан: пустые строки конфликтовали бы по unique
+    number = models.CharField(_('Номер чека'), max_length=32, blank=True, null=True, unique=True)
+    # Время продажи на кассе: офлайн-продажи приходят позже со своим (sales.checkout.ingest)
+    created_at = models.DateTimeField(_('Создано'), default=timezone.now, editable=False)
+    # Ключ, сгенерированный кассой: повтор запроса вернёт тот же чек (sales.checkout)
+    idempotency_key = models.CharField(_('Ключ идемпотентности'), max_length=64, unique=True, null=True, blank=True,
+                                       editable=False)
+    terminal = models.CharField(_('Касса'), max_length=32, blank=True)
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name='sales', null=True, blank=True, verbose_name=_('Склад')
+    )
     payment_method = models.CharField(
         _('Способ оплаты'),
         max_length=16,
@@ -22,10 +40,18 @@ class Sale(models.Model):
     )
     total = models.DecimalField(_('Итого'), max_digits=10, decimal_places=2, default=0)
 
+    objects = SaleQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Продажа')
         verbose_name_plural = _('Продажи')
-        ordering = ['-created_at']
+        ordering = ['-created_at', 'id']
+        # История продаж — keyset по (-created_at, id); каждому фильтру — свой индекс
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='sales_sale_created'),
+            models.Index(fields=['payment_method', '-created_at', 'id'], name='sales_sale_payment_created'),
+            models.Index(fields=['terminal', '-created_at', 'id'], name='sales_sale_terminal_created'),
+        ]
 
     def __str__(self):
         return f'#{self.number or self.pk} от {self.created_at:%Y-%m-%d %H:%M}'
@@ -36,14 +62,13 @@ class SaleItem(models.Model):
         Sale, on_delete=models.CASCADE, related_name='items', verbose_name=_('Чек')
     )
 
-    # ВАЖНО: теперь FK указывает на VariantModel (ProductVariant ИЛИ Product)
     variant = models.ForeignKey(
-        VariantModel,
+        ProductVariant,
         on_delete=models.PROTECT,
         related_name='sale_items',
         null=True,
         blank=True,
-        verbose_name=VARIANT_VERBOSE,
+        verbose_name=_('Вариант'),
     )
 
     name = models.CharField(_('Название позиции'), max_length=255, blank=True)
@@ -60,15 +85,51 @@ class SaleItem(models.Model):
         return self.name or f'{self.variant} x{self.qty}'
 
     def save(self, *args, **kwargs):
-        # Автозаполнение name/sku из варианта/товара при необходимости
+        # Автозаполнение name/sku из варианта при необходимости
         if self.variant:
             if not self.name:
-                # у варианта может быть .name, а может не быть — тогда берём у product/name
-                self.name = getattr(self.variant, 'name', '') or getattr(
-                    getattr(self.variant, 'product', None), 'name', ''
-                )
+                self.name = f'{self.variant.product.name} {self.variant.name}'.strip()
             if not self.sku:
-                self.sku = getattr(self.variant, 'sku', '') or ''
+                self.sku = self.variant.sku
         # пересчёт суммы
         self.subtotal = (self.price or 0) * (self.qty or 0)
         super().save(*args, **kwargs)
+
+
+class ReceiptSequence(models.Model):
+    """Счётчик номеров чеков на префикс и день. Сдвигается раз на блок, а не на чек."""
+    prefix = models.CharField(_('Префикс'), max_length=8)
+    day = models.DateField(_('День'))
+    next_value = models.PositiveIntegerField(_('Следующий свободный'), default=1)
+
+    class Meta:
+        verbose_name = _('Нумератор чеков')
+        verbose_name_plural = _('Нумераторы чеков')
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'day'], name='sales_receipt_sequence_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.prefix} {self.day:%Y-%m-%d}: {self.next_value}'
+
+
+class ReceiptBlock(models.Model):
+    """Диапазон номеров [first, last], выданный кассе или процессу (sales.numbering)."""
+    sequence = models.ForeignKey(
+        ReceiptSequence, on_delete=models.CASCADE, related_name='blocks', verbose_name=_('Нумератор')
+    )
+    holder = models.CharField(_('Получатель'), max_length=64)
+    first = models.PositiveIntegerField(_('С номера'))
+    last = models.PositiveIntegerField(_('По номер'))
+    leased_at = models.DateTimeField(_('Выдан'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Блок номеров чеков')
+        verbose_name_plural = _('Блоки номеров чеков')
+        ordering = ['sequence', 'first']
+        constraints = [
+            models.UniqueConstraint(fields=['sequence', 'first'], name='sales_receipt_block_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.sequence.prefix} {self.sequence.day:%Y-%m-%d}: {self.first}–{self.last} ({self.holder})'
@@ -0,0 +1,123 @@
+# sales/numbering.py
+"""
+Номера чеков: «{префикс магазина}-{ГГММДД}-{счётчик}», счётчик с 1 каждый день.
+
+MAX()+1 на каждый чек выстроил бы все кассы в очередь на одну строку.
+Вместо этого касса (или процесс, если касса не назвалась) берёт у базы
+блок из RECEIPT_BLOCK_SIZE номеров — один короткий UPDATE нумератора —
+и дальше выдаёт номера из памяти. Каждый выданный блок записан в
+ReceiptBlock: номера блока, не попавшие в чеки (откат продажи, перезапуск
+процесса), находит gaps().
+"""
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReceiptBlock, ReceiptSequence, Sale
+
+# (префикс, получатель, день) -> _Lease; у каждого процесса свои блоки.
+# День в ключе: выгрузка вчерашних офлайн-продаж не вытесняет сегодняшний блок
+_leases = {}
+_lock = threading.RLock()
+# Блоки старше стольких дней забываются — их остаток станет пропуском в gaps()
+LEASE_DAYS = 7
+
+
+class _Lease:
+    def __init__(self, next_value, last):
+        self.next_value = next_value
+        self.last = last
+
+    def take(self, count) -> range:
+        taken = range(self.next_value, min(self.next_value + count, self.last + 1))
+        self.next_value = taken.stop
+        return taken
+
+
+def holder_name(terminal: str = '') -> str:
+    return (terminal or f'{socket.gethostname()}:{os.getpid()}')[:64]
+
+
+def format_number(prefix: str, day, counter: int) -> str:
+    return f'{prefix}-{day:%y%m%d}-{counter:06d}'
+
+
+def lease(prefix: str, day, holder: str, size: int) -> ReceiptBlock:
+    """Взять у базы блок из size номеров — единственное место, где кассы делят одну строку."""
+    sequences = ReceiptSequence.objects.filter(prefix=prefix, day=day)
+    with transaction.atomic():
+        # Сначала запись, потом чтение: SQLite не ждёт, а падает, если транзакция
+        # с уже прочитанными данными пытается стать пишущей (get_or_create так и делает)
+        ReceiptSequence.objects.bulk_create([ReceiptSequence(prefix=prefix, day=day)], ignore_conflicts=True)
+        sequences.update(next_value=F('next_value') + size)
+        # Строка нумератора заблокирована нашим UPDATE до конца транзакции
+        sequence = sequences.get()
+        last = sequence.next_value - 1
+        return ReceiptBlock.objects.create(sequence=sequence, holder=holder, first=last - size + 1, last=last)
+
+
+def _install(key, rest) -> None:
+    with _lock:
+        _leases[key] = rest
+        border = timezone.localdate() - timedelta(days=LEASE_DAYS)
+        for old in [k for k in _leases if k[2] < border]:
+            del _leases[old]
+
+
+def allocate(count: int = 1, terminal: str = '', prefix: str = None, day=None) -> list:
+    """
+    count новых номеров чеков. Звать до транзакции продажи: если блок
+    берётся внутри чужой транзакции, его остаток попадёт в память только
+    после коммита (при откате номера блока откатятся вместе с ним).
+    """
+    prefix = prefix or settings.RECEIPT_PREFIX
+    day = day or timezone.localdate()
+    key = (prefix, holder_name(terminal), day)
+    with _lock:
+        current = _leases.get(key)
+        counters = list(current.take(count)) if current else []
+        need = count - len(counters)
+        if need:
+            block = lease(prefix, day, key[1], max(need, settings.RECEIPT_BLOCK_SIZE))
+            rest = _Lease(block.first, block.last)
+            counters += rest.take(need)
+            transaction.on_commit(lambda: _install(key, rest))
+    return [format_number(prefix, day, n) for n in counters]
+
+
+def _ranges(numbers) -> list:
+    """[1, 2, 3, 7, 9, 10] -> [(1, 3), (7, 7), (9, 10)]."""
+    ranges = []
+    for n in numbers:
+        if ranges and ranges[-1][1] == n - 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return [tuple(r) for r in ranges]
+
+
+def gaps(day=None, prefix: str = None) -> list:
+    """
+    Аудит пропусков за день: [(блок, [(с, по), ...])] — номера выданных блоков,
+    которых нет ни в одном чеке. Хвост блока, которым касса ещё работает, тоже здесь.
+    """
+    prefix = prefix or settings.RECEIPT_PREFIX
+    day = day or timezone.localdate()
+    head = format_number(prefix, day, 0)[:-6]
+    used = {
+        int(number[len(head):])
+        for number in Sale.objects.filter(number__startswith=head).values_list('number', flat=True)
+        if number[len(head):].isdigit()
+    }
+    result = []
+    for block in ReceiptBlock.objects.filter(sequence__prefix=prefix, sequence__day=day).select_related('sequence'):
+        missing = [n for n in range(block.first, block.last + 1) if n not in used]
+        if missing:
+            result.append((block, _ranges(missing)))
+    return result
@@ -1,3 +1,188 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from catalog.models import Product, ProductVariant
+from inventory import reservations, services
+from inventory.models import InventoryItem, StockMovement, Warehouse
+from sales import cart as cart_module, numbering
+from sales.cart import Cart
+from sales.checkout import CheckoutError, checkout, ingest
+from sales.models import ReceiptBlock, Sale, SaleItem
+
+
+class SalesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warehouse = Warehouse.objects.create(name='Основной', slug='main', is_default=True)
+        product = Product.objects.create(name='Футболка', price=Decimal('100.00'))
+        cls.a = ProductVariant.objects.create(product=product, sku='T-S')
+        cls.b = ProductVariant.objects.create(product=product, sku='T-M', price=Decimal('120.00'))
+        services.receive(cls.warehouse, [(cls.a.pk, 5), (cls.b.pk, 1)])
+
+    def setUp(self):
+        # Блоки номеров в памяти процесса переживают откат тестовой транзакции
+        numbering._leases.clear()
+
+    def qty(self, variant):
+        return InventoryItem.objects.get(warehouse=self.warehouse, variant=variant).qty
+
+
+class CheckoutTests(SalesTestCase):
+    def test_same_idempotency_key_returns_same_sale(self):
+        items = [{'variant': self.a.pk, 'qty': 2}]
+        sale, created = checkout(items, idempotency_key='k-1')
+        again, created_again = checkout(items, idempotency_key='k-1')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, sale.pk)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(self.qty(self.a), 3)
+        self.assertEqual(sale.total, Decimal('200.00'))
+
+    def test_insufficient_stock_rolls_back_whole_sale(self):
+        movements = StockMovement.objects.count()
+        with self.assertRaises(services.InsufficientStock):
+            checkout([{'variant': self.a.pk, 'qty': 1}, {'variant': self.b.pk, 'qty': 2}], idempotency_key='k-2')
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(SaleItem.objects.exists())
+        self.assertEqual(StockMovement.objects.count(), movements)
+        self.assertEqual(self.qty(self.a), 5)
+        self.assertEqual(self.qty(self.b), 1)
+
+    def test_rejects_bad_lines(self):
+        for items in ([], 5, [{'variant': self.a.pk, 'qty': 0}], [{'qty': 1}]):
+            with self.subTest(items=items), self.assertRaises(CheckoutError):
+                checkout(items)
+        self.assertFalse(Sale.objects.exists())
+
+
+class IngestTests(SalesTestCase):
+    def test_bad_sale_does_not_fail_batch(self):
+        results = ingest([
+            {'idempotency_key': 'ok', 'items': [{'variant': self.a.pk, 'qty': 1, 'price': '90'}]},
+            {'idempotency_key': 'nan', 'items': [{'variant': self.a.pk, 'price': 'NaN'}]},
+            {'idempotency_key': 'neg', 'items': [{'variant': self.a.pk, 'price': '-500'}]},
+            {'idempotency_key': 'int', 'items': 5},
+            {'idempotency_key': 'pay', 'items': [{'variant': self.a.pk}], 'payment_method': ['cash']},
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'error', 'error', 'error', 'error'])
+        self.assertEqual(Sale.objects.get().total, Decimal('90.00'))
+
+    def test_repeated_batch_is_duplicate(self):
+        batch = [{'idempotency_key': 'k', 'items': [{'variant': self.b.pk, 'qty': 3}]}]
+        first, = ingest(batch)
+        second, = ingest(batch)
+        self.assertEqual(first['status'], 'created')
+        self.assertEqual(second['status'], 'duplicate')
+        self.assertEqual(second['number'], first['number'])
+        # Продажа уже состоялась: офлайн-остаток может уйти в минус
+        self.assertEqual(self.qty(self.b), -2)
+
+
+@override_settings(RECEIPT_BLOCK_SIZE=3)
+class NumberingTests(SalesTestCase):
+    def allocate(self, *args, **kwargs):
+        # Остаток блока попадает в память по on_commit — в TestCase его надо выполнить явно
+        with self.captureOnCommitCallbacks(execute=True):
+            return numbering.allocate(*args, **kwargs)
+
+    def test_numbers_unique_across_blocks(self):
+        numbers = self.allocate(2, terminal='T1') + self.allocate(2, terminal='T2')
+        numbers += self.allocate(5, terminal='T1') + self.allocate(1, terminal='T2')
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(ReceiptBlock.objects.count(), 3)
+
+    def test_numbers_unique_across_processes(self):
+        first = self.allocate(2, terminal='T1')
+        numbering._leases.clear()  # перезапуск процесса: остаток блока потерян
+        second = self.allocate(2, terminal='T1')
+        self.assertFalse(set(first) & set(second))
+
+    def test_past_day_keeps_current_lease(self):
+        today = self.allocate(1, terminal='T1')
+        self.allocate(1, terminal='T1', day=timezone.localdate() - timedelta(days=1))
+        self.assertEqual(ReceiptBlock.objects.count(), 2)
+        # Сегодняшний блок не вытеснен вчерашним: номер идёт следующим по счёту
+        self.assertEqual(self.allocate(1, terminal='T1'), [today[0][:-6] + '000002'])
+        self.assertEqual(ReceiptBlock.objects.count(), 2)
+
+    def test_checkout_numbers_are_unique(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(4):
+                checkout([{'variant': self.a.pk}], idempotency_key=f'n-{i}', terminal='T1')
+        ingest([{'idempotency_key': f'o-{i}', 'items': [{'variant': self.a.pk}], 'terminal': 'T1'} for i in range(4)])
+        numbers = list(Sale.objects.values_list('number', flat=True))
+        self.assertEqual(len(numbers), 8)
+        self.assertEqual(len(set(numbers)), 8)
+
+
+class CartTests(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+
+    def reserved(self, variant):
+        return InventoryItem.objects.get(warehouse=self.warehouse, variant=variant).qty_reserved
+
+    def cart(self):
+        return Cart(self.client.session)
+
+    def test_add_update_remove(self):
+        self.client.post('/pos/cart/add/', {'code': 'T-S'})
+        self.client.post('/pos/cart/add/', {'variant': self.a.pk, 'qty': 2})
+        self.client.post('/pos/cart/add/', {'variant': self.b.pk})
+        self.assertEqual(self.cart().lines, {self.a.pk: 3, self.b.pk: 1})
+        self.assertEqual((self.reserved(self.a), self.reserved(self.b)), (3, 1))
+
+        response = self.client.post(f'/pos/cart/{self.a.pk}/update/', {'qty': 9})
+        self.assertContains(response, 'Недостаточно остатка')
+        self.assertEqual(self.reserved(self.a), 3)
+        self.client.post(f'/pos/cart/{self.a.pk}/update/', {'qty': 5})
+        self.client.post(f'/pos/cart/{self.b.pk}/remove/')
+        self.assertEqual(self.cart().lines, {self.a.pk: 5})
+        self.assertEqual((self.reserved(self.a), self.reserved(self.b)), (5, 0))
+
+        self.client.post('/pos/cart/clear/')
+        self.assertFalse(self.cart())
+        self.assertEqual(self.reserved(self.a), 0)
+
+    def test_add_without_code_or_variant(self):
+        response = self.client.post('/pos/cart/add/')
+        self.assertContains(response, 'Отсканируйте штрихкод')
+        self.assertContains(self.client.post('/pos/cart/add/', {'code': 'нет-такого'}), 'Не найден код')
+
+    def test_checkout_takes_cart_from_session(self):
+        self.client.post('/pos/cart/add/', {'variant': self.a.pk, 'qty': 2})
+        # Чужая корзина с резервом: её ключ из запроса не принимается
+        reservations.set_qty('session:other', self.warehouse, self.b, 1)
+        response = self.client.post('/pos/checkout/', {'idempotency_key': 'c-1', 'cart_key': 'session:other'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((self.qty(self.a), self.reserved(self.a)), (3, 0))
+        self.assertEqual(self.reserved(self.b), 1)
+        self.assertFalse(self.cart())
+
+    def test_stale_copy_does_not_lose_lines(self):
+        self.client.post('/pos/cart/add/', {'variant': self.a.pk})
+        first, second = self.cart(), self.cart()
+        first.add(self.a.pk, self.warehouse.pk)
+        # Вторая копия прочитана до изменения первой — под блокировкой перечитывается
+        second.add(self.b.pk, self.warehouse.pk)
+        self.assertEqual(self.cart().lines, {self.a.pk: 2, self.b.pk: 1})
+        self.assertEqual((self.reserved(self.a), self.reserved(self.b)), (2, 1))
+
+    def test_busy_cart(self):
+        self.client.post('/pos/cart/add/', {'variant': self.a.pk})
+        cart = self.cart()
+        cache.set(cart_module.LOCK_PREFIX + cart.session.session_key, 'чужой запрос')
+        cart_module.LOCK_WAIT, wait = 0, cart_module.LOCK_WAIT
+        try:
+            response = self.client.post('/pos/cart/add/', {'variant': self.b.pk})
+        finally:
+            cart_module.LOCK_WAIT = wait
+            cache.delete(cart_module.LOCK_PREFIX + cart.session.session_key)
+        self.assertContains(response, 'Корзина занята')
+        self.assertEqual(self.reserved(self.b), 0)
@@ -7,6 +7,13 @@ app_name = 'sales'
 urlpatterns = [
     path('', views.pos, name='pos'),
     path('history/', views.sales_history, name='sales_history'),
+    path('history/api/', views.sales_history_api, name='sales_history_api'),
     path('checkout/', views.pos_checkout, name='pos_checkout'),
+    path('sync/', views.pos_sync, name='pos_sync'),
+    path('cart/', views.cart, name='cart'),
+    path('cart/add/', views.cart_add, name='add'),
+    path('cart/<int:variant_id>/update/', views.cart_update, name='update'),
+    path('cart/<int:variant_id>/remove/', views.cart_remove, name='remove'),
+    path('cart/clear/', views.cart_clear, name='clear'),
     path('search/', views.search, name='search'),  # можно удалить, если не используешь
 ]
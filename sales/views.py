@@ -1,24 +1,289 @@
 # sales/views.py
+import json
+from datetime import datetime, time, timedelta
+
 from django.shortcuts import render
 from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
+from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 
+from catalog import barcodes
+from catalog import search as catalog_search
+from catalog.models import ProductVariant
+from catalog.pagination import keyset_paginate
+from inventory.models import Warehouse
+from inventory.services import InsufficientStock
+from .cart import Cart
+from .checkout import INGEST_MAX, CheckoutError, checkout, default_warehouse, ingest
+from .models import Sale
+
+HISTORY_PER_PAGE = 50
+HISTORY_ORDERING = ('-created_at', 'id')
+
+@ensure_csrf_cookie  # офлайн-очередь кассы шлёт POST из JS с токеном из cookie
 def pos(request):
-    return render(request, 'sales/pos.html', {'page_name': 'pos'})
+    cart = Cart(request.session)
+    items, total = cart.items()
+    return render(request, 'sales/pos.html', {
+        'page_name': 'pos',
+        'ingest_max': INGEST_MAX,
+        'cart_items': items,
+        'total': total,
+        'cart_payload': cart.payload(),
+    })
+
+def _day_start(value):
+    try:
+        day = parse_date(value or '')
+    except ValueError:  # 2026-13-01 и т.п.
+        day = None
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+
+def _history_page(request):
+    """
+    Чеки по фильтрам ?date_from=&date_to=&payment=&terminal=, keyset-страница
+    по (-created_at, id) с числом позиций и штук. Каждому фильтру — свой индекс.
+    """
+    qs = Sale.objects.all()
+    filters = {}
+    date_from = _day_start(request.GET.get('date_from'))
+    if date_from:
+        qs = qs.filter(created_at__gte=date_from)
+        filters['date_from'] = request.GET['date_from']
+    date_to = _day_start(request.GET.get('date_to'))
+    if date_to:
+        # Включительно: до начала следующего дня
+        qs = qs.filter(created_at__lt=date_to + timedelta(days=1))
+        filters['date_to'] = request.GET['date_to']
+    payment = request.GET.get('payment', '')
+    if payment in dict(Sale._meta.get_field('payment_method').choices):
+        qs = qs.filter(payment_method=payment)
+        filters['payment'] = payment
+    terminal = request.GET.get('terminal', '').strip()
+    if terminal:
+        qs = qs.filter(terminal=terminal)
+        filters['terminal'] = terminal
+    page = keyset_paginate(qs.with_item_stats(), HISTORY_ORDERING, request.GET.get('cursor'), HISTORY_PER_PAGE)
+    return page, filters
+
 
 def sales_history(request):
-    return render(request, 'sales/history.html', {'page_name': 'sales_history'})
+    page, filters = _history_page(request)
+    return render(request, 'sales/history.html', {
+        'page_name': 'sales_history',
+        'sales': page,
+        'page': page,
+        'filters': filters,
+        'filter_query': urlencode(filters),
+        'payment_methods': Sale._meta.get_field('payment_method').choices,
+    })
+
+
+def sales_history_api(request):
+    """То же, что история продаж, в JSON: {"results": [...], "next_cursor": ...}."""
+    page, _ = _history_page(request)
+    return JsonResponse({
+        'results': [
+            {
+                'id': sale.pk,
+                'number': sale.number,
+                'created_at': sale.created_at.isoformat(),
+                'payment_method': sale.payment_method,
+                'terminal': sale.terminal,
+                'total': str(sale.total),
+                'lines': sale.lines_count or 0,
+                'units': sale.units or 0,
+            }
+            for sale in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+def _checkout_payload(request) -> dict:
+    """JSON-тело кассы или форма htmx (позиции — JSON в поле items)."""
+    if request.content_type == 'application/json':
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise CheckoutError('Ожидается объект JSON')
+        return payload
+    payload = request.POST.dict()
+    payload['items'] = json.loads(payload.get('items') or '[]')
+    return payload
+
+
+def _checkout_response(request, status, message='', sale=None, duplicate=False):
+    if request.headers.get('HX-Request'):
+        if sale is None:
+            return render(request, 'sales/_checkout_error.html', {'message': message}, status=status)
+        return render(request, 'sales/_checkout_success.html', {'sale': sale, 'duplicate': duplicate}, status=status)
+    if sale is None:
+        return JsonResponse({'ok': False, 'error': message}, status=status)
+    return JsonResponse({
+        'ok': True,
+        'duplicate': duplicate,
+        'sale': {'id': sale.pk, 'number': sale.number, 'total': str(sale.total)},
+    }, status=status)
+
 
 @require_POST
 def pos_checkout(request):
-    # Заглушка оформления
-    return JsonResponse({'ok': True})
+    """
+    Оформление продажи: {"idempotency_key": ..., "items": [{"variant": id, "qty": n}], "payment_method": ...,
+    "terminal": ..., "warehouse": slug}. Повтор с тем же ключом вернёт тот же чек.
+    Без items проводится корзина кассы из сессии. Резервы снимаются только у
+    корзины своей сессии — ключ корзины от клиента не принимается.
+    """
+    try:
+        payload = _checkout_payload(request)
+        # Касса с корзиной в сессии: позиции и резервы берём оттуда
+        cart = Cart(request.session)
+        if cart and not payload.get('items'):
+            payload['items'] = cart.payload()
+        cart_key = cart.key if cart else ''
+        warehouse = None
+        if payload.get('warehouse'):
+            warehouse = Warehouse.objects.filter(slug=str(payload['warehouse'])).first()
+            if warehouse is None:
+                raise CheckoutError(f'Неизвестный склад: {payload["warehouse"]}')
+        sale, created = checkout(
+            payload.get('items') or [],
+            idempotency_key=str(payload.get('idempotency_key') or ''),
+            payment_method=payload.get('payment_method') or 'cash',
+            terminal=str(payload.get('terminal') or ''),
+            warehouse=warehouse,
+            cart_key=cart_key,
+        )
+    except ValueError as e:  # CheckoutError и битый JSON
+        return _checkout_response(request, 400, message=str(e))
+    except InsufficientStock as e:
+        return _checkout_response(request, 409, message=str(e))
+    if cart_key:
+        cart.forget()
+    return _checkout_response(request, 201 if created else 200, sale=sale, duplicate=not created)
+
+@require_POST
+def pos_sync(request):
+    """
+    Выгрузка офлайн-очереди кассы: {"sales": [...]} до INGEST_MAX продаж за раз.
+    Ответ — статус по каждой продаже; принятые (created/duplicate) касса удаляет из очереди.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict) or not isinstance(payload.get('sales'), list):
+            raise CheckoutError('Ожидается {"sales": [...]}')
+        results = ingest(payload['sales'])
+    except ValueError as e:  # CheckoutError и битый JSON
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    return JsonResponse({'ok': True, 'results': results})
+
+
+def _cart_response(request, cart, error=''):
+    """Только фрагмент корзины — htmx подменяет его на странице кассы."""
+    items, total = cart.items()
+    return render(request, 'sales/_cart.html', {
+        'cart_items': items,
+        'total': total,
+        'cart_payload': cart.payload(),
+        'error': error,
+    })
+
+
+def _cart_change(request, change):
+    cart = Cart(request.session)
+    try:
+        change(cart)
+    except CheckoutError as e:
+        return _cart_response(request, cart, error=str(e))
+    except InsufficientStock:
+        return _cart_response(request, cart, error='Недостаточно остатка')
+    except ValueError:
+        return _cart_response(request, cart, error='Некорректное количество')
+    return _cart_response(request, cart)
+
+
+def _cart_warehouse_id(cart):
+    if cart.warehouse_id is None:
+        warehouse = default_warehouse()
+        if warehouse is None:
+            raise CheckoutError('Не настроен склад для продаж')
+        return warehouse.pk
+    return cart.warehouse_id
+
+
+def cart(request):
+    return _cart_response(request, Cart(request.session))
+
+
+@require_POST
+def cart_add(request):
+    """Скан (code= штрихкод/SKU) или выбор из поиска (variant= id); qty= по умолчанию 1."""
+    def change(cart):
+        code = request.POST.get('code', '').strip()
+        if code:
+            hit = barcodes.lookup(code)
+            if not hit:
+                raise CheckoutError(f'Не найден код: {code}')
+            variant_id = hit['id']
+        else:
+            variant_id = request.POST.get('variant', '').strip()
+            if not variant_id.isdigit():
+                raise CheckoutError('Отсканируйте штрихкод или выберите товар')
+            variant_id = int(variant_id)
+        cart.add(variant_id, _cart_warehouse_id(cart), int(request.POST.get('qty') or 1))
+    return _cart_change(request, change)
+
+
+@require_POST
+def cart_update(request, variant_id):
+    return _cart_change(
+        request, lambda cart: cart.set(variant_id, int(request.POST.get('qty', 0)), _cart_warehouse_id(cart))
+    )
+
+
+@require_POST
+def cart_remove(request, variant_id):
+    return _cart_change(request, lambda cart: cart.remove(variant_id))
+
+
+@require_POST
+def cart_clear(request):
+    return _cart_change(request, lambda cart: cart.clear())
+
 
 def search(request):
-    """Заглушка поиска для маршрута /pos/search/"""
+    """Поиск товара для кассы: /pos/search/?q=... (FTS, префиксы слов, по релевантности)."""
     q = request.GET.get('q', '').strip()
-    # тут позже вернем реальные результаты
+    # Скан штрихкода/SKU — точное совпадение из кэша, без запросов к базе
+    hit = barcodes.lookup(q) if q else None
+    if hit:
+        return JsonResponse({'query': q, 'exact': True, 'results': [hit]})
+
+    # Текст — товары по релевантности, в выдаче их варианты (продаётся вариант)
+    ids = catalog_search.search_ids(q) if q else []
+    rank = {pk: i for i, pk in enumerate(ids)}
+    variants = sorted(
+        ProductVariant.objects.filter(product_id__in=ids).select_related('product__brand', 'product__category'),
+        key=lambda v: (rank[v.product_id], v.pk),
+    )
     return JsonResponse({
         'query': q,
-        'results': [],
+        'exact': False,
+        'results': [
+            {
+                'id': v.pk,
+                'product_id': v.product_id,
+                'name': v.product.name,
+                'sku': v.sku,
+                'size': v.size,
+                'color': v.color,
+                'price': str(v.effective_price),
+                'brand': v.product.brand.name if v.product.brand else '',
+                'category': v.product.category.name if v.product.category else '',
+            }
+            for v in variants
+        ],
     })
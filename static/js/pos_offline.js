@@ -0,0 +1,190 @@
+// static/js/pos_offline.js
+// Касса без связи: справочник штрихкодов и корзина в браузере.
+//
+// PosCatalog держит копию каталога в IndexedDB: один раз полная выгрузка
+// /api/v1/sync/, дальше — дельты по токену. По ней скан находит вариант и
+// цену без сервера. PosOfflineCart — корзина в localStorage на то время, пока
+// сервер не отвечает: её позиции уходят в PosQueue вместе с ценами, которые
+// видела касса, и сервер принимает их при выгрузке очереди.
+(function () {
+  'use strict';
+
+  const DB_NAME = 'pos.catalog';
+  const DB_VERSION = 1;
+  const CART_KEY = 'pos.cart.offline';
+  const SYNC_EVERY_MS = 5 * 60 * 1000;
+
+  function done(request) {
+    return new Promise((resolve, reject) => {
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => reject(request.error);
+    });
+  }
+
+  function finished(tx) {
+    return new Promise((resolve, reject) => {
+      tx.oncomplete = () => resolve();
+      tx.onerror = tx.onabort = () => reject(tx.error);
+    });
+  }
+
+  function openDB() {
+    if (!window.indexedDB) return Promise.reject(new Error('IndexedDB недоступна'));
+    const request = indexedDB.open(DB_NAME, DB_VERSION);
+    request.onupgradeneeded = () => {
+      const variants = request.result.createObjectStore('variants', { keyPath: 'id' });
+      variants.createIndex('codes', 'codes', { multiEntry: true });
+      variants.createIndex('product', 'product_id');
+      request.result.createObjectStore('meta');
+    };
+    return done(request);
+  }
+
+  // Товар из API синхронизации -> записи его вариантов; SKU сканируется так же, как штрихкод
+  function variantRows(product) {
+    return product.variants.map((v) => ({
+      id: v.id,
+      product_id: product.id,
+      name: [product.name, [v.size, v.color].filter(Boolean).join(' / ')].filter(Boolean).join(' '),
+      sku: v.sku,
+      price: v.price,
+      codes: [v.sku].concat(v.barcodes).filter(Boolean),
+    }));
+  }
+
+  class PosCatalog {
+    constructor({ syncUrl }) {
+      this.syncUrl = syncUrl;
+      this.syncing = false;
+      this.db = openDB();
+      this.db.catch((e) => console.error('pos catalog:', e));
+      this.sync();
+      setInterval(() => this.sync(), SYNC_EVERY_MS);
+    }
+
+    async lookup(code) {
+      const db = await this.db;
+      return (await done(db.transaction('variants').objectStore('variants').index('codes').get(code))) || null;
+    }
+
+    async get(id) {
+      const db = await this.db;
+      return (await done(db.transaction('variants').objectStore('variants').get(id))) || null;
+    }
+
+    async fetchPage(params) {
+      const response = await fetch(this.syncUrl + '?' + new URLSearchParams(params));
+      if (!response.ok) throw new Error('HTTP ' + response.status);
+      return response.json();
+    }
+
+    async sync() {
+      if (this.syncing) return;
+      this.syncing = true;
+      try {
+        const db = await this.db;
+        const token = await done(db.transaction('meta').objectStore('meta').get('token'));
+        // Токен устарел (журнал вычищен) — сервер сам ответит полной выгрузкой
+        let page = token === undefined ? null : await this.fetchPage({ since: token });
+        if (page && page.mode === 'delta') {
+          await this.applyDelta(db, page);
+          while (page.more) {
+            page = await this.fetchPage({ since: page.token });
+            await this.applyDelta(db, page);
+          }
+        } else {
+          await this.loadFull(db, page);
+        }
+      } catch (e) {
+        // Нет связи — справочник остаётся прежним, попробуем в следующий раз
+      } finally {
+        this.syncing = false;
+      }
+    }
+
+    async loadFull(db, page) {
+      let tx = db.transaction(['variants', 'meta'], 'readwrite');
+      tx.objectStore('variants').clear();
+      tx.objectStore('meta').delete('token');
+      await finished(tx);
+      page = page || await this.fetchPage({});
+      for (;;) {
+        tx = db.transaction(['variants', 'meta'], 'readwrite');
+        const store = tx.objectStore('variants');
+        page.products.forEach((p) => variantRows(p).forEach((row) => store.put(row)));
+        // Токен — только после последней страницы: оборванная выгрузка начнётся заново
+        if (!page.more) tx.objectStore('meta').put(page.token, 'token');
+        await finished(tx);
+        if (!page.more) return;
+        page = await this.fetchPage({ after: page.after, token: page.token });
+      }
+    }
+
+    async applyDelta(db, page) {
+      const tx = db.transaction(['variants', 'meta'], 'readwrite');
+      const store = tx.objectStore('variants');
+      const index = store.index('product');
+      // Варианты изменённых и удалённых товаров снимаем целиком и пишем заново
+      const products = page.products.map((p) => p.id).concat(page.deleted);
+      const keys = await Promise.all(products.map((pk) => done(index.getAllKeys(pk))));
+      keys.forEach((ids) => ids.forEach((id) => store.delete(id)));
+      page.products.forEach((p) => variantRows(p).forEach((row) => store.put(row)));
+      tx.objectStore('meta').put(page.token, 'token');
+      await finished(tx);
+    }
+  }
+
+  class PosOfflineCart {
+    constructor() {
+      try {
+        this.lines = JSON.parse(localStorage.getItem(CART_KEY)) || [];
+      } catch (e) {
+        this.lines = [];
+      }
+    }
+
+    get size() {
+      return this.lines.length;
+    }
+
+    save() {
+      localStorage.setItem(CART_KEY, JSON.stringify(this.lines));
+    }
+
+    // variant: запись PosCatalog ({id, name, sku, price})
+    add(variant, qty = 1) {
+      const line = this.lines.find((l) => l.variant === variant.id);
+      if (line) {
+        line.qty += qty;
+      } else {
+        this.lines.push({ variant: variant.id, qty: qty, price: variant.price, name: variant.name, sku: variant.sku });
+      }
+      this.save();
+    }
+
+    set(variantId, qty) {
+      qty = Math.max(parseInt(qty, 10) || 0, 0);
+      const line = this.lines.find((l) => l.variant === variantId);
+      if (line && qty) line.qty = qty;
+      if (!qty) this.lines = this.lines.filter((l) => l.variant !== variantId);
+      this.save();
+    }
+
+    clear() {
+      this.lines = [];
+      localStorage.removeItem(CART_KEY);
+    }
+
+    // Позиции в формате PosQueue.sell: цены кассы едут вместе с продажей
+    payload() {
+      return this.lines.map((l) => ({ variant: l.variant, qty: l.qty, price: l.price }));
+    }
+
+    get total() {
+      return this.lines.reduce((sum, l) => sum + Number(l.price) * l.qty, 0);
+    }
+  }
+
+  window.PosCatalog = PosCatalog;
+  window.PosOfflineCart = PosOfflineCart;
+})();
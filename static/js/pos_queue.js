@@ -0,0 +1,236 @@
+// static/js/pos_queue.js
+// Офлайн-очередь кассы.
+//
+// Продажа сначала идёт на /pos/checkout/. Если сервер не отвечает (нет связи,
+// таймаут, 5xx), она ложится в localStorage с ключом идемпотентности и временем
+// продажи, и касса продолжает работать. Очередь выгружается пачками на
+// /pos/sync/, когда связь вернулась; сервер сам отбрасывает повторы по ключу,
+// поэтому повторная отправка после обрыва безопасна.
+(function () {
+  'use strict';
+
+  const QUEUE_KEY = 'pos.queue';
+  const REJECTED_KEY = 'pos.queue.rejected';
+  const TERMINAL_KEY = 'pos.terminal';
+  const TIMEOUT_MS = 5000;
+  const RETRY_MAX_MS = 60000;
+
+  function load(key) {
+    try {
+      return JSON.parse(localStorage.getItem(key)) || [];
+    } catch (e) {
+      return [];
+    }
+  }
+
+  function store(key, value) {
+    localStorage.setItem(key, JSON.stringify(value));
+  }
+
+  function randomId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+  }
+
+  function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  // Сетевой сбой, сервер лёг или ответил не наш API — в отличие от отказа API, это повод
+  // встать в очередь и повторить позже
+  class Unreachable extends Error {
+    constructor(message, status) {
+      super(message);
+      this.status = status;
+    }
+  }
+
+  // Временные 4xx: повторить позже, а не отклонить продажу
+  const RETRY_STATUSES = [408, 429];
+  const TOO_LARGE = 413;
+
+  async function postJSON(url, body) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), TIMEOUT_MS);
+    let response;
+    try {
+      response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken() },
+        body: JSON.stringify(body),
+        signal: controller.signal,
+      });
+    } catch (e) {
+      throw new Unreachable(e.message);
+    } finally {
+      clearTimeout(timer);
+    }
+    if (response.status >= 500 || RETRY_STATUSES.includes(response.status)) {
+      throw new Unreachable('HTTP ' + response.status, response.status);
+    }
+    // Ответ не от нашего API (страница 403 CSRF, 413/404 прокси, портал Wi-Fi) —
+    // продажу это не отклоняет: повторим, когда дойдём до самого сервера
+    let data = null;
+    if ((response.headers.get('Content-Type') || '').includes('application/json')) {
+      try {
+        data = await response.json();
+      } catch (e) {
+        data = null;
+      }
+    }
+    if (data === null || typeof data !== 'object') {
+      throw new Unreachable('HTTP ' + response.status + ': не JSON', response.status);
+    }
+    return { status: response.status, ok: response.ok, data: data };
+  }
+
+  class PosQueue {
+    constructor({ checkoutUrl, syncUrl, batchSize = 200, onChange = () => {} }) {
+      this.checkoutUrl = checkoutUrl;
+      this.syncUrl = syncUrl;
+      this.batchSize = batchSize;
+      this.onChange = onChange;
+      this.flushing = false;
+      this.retryMs = 1000;
+      this.timer = null;
+
+      let terminal = localStorage.getItem(TERMINAL_KEY);
+      if (!terminal) {
+        terminal = 'T-' + randomId().slice(0, 8);
+        localStorage.setItem(TERMINAL_KEY, terminal);
+      }
+      this.terminal = terminal;
+
+      window.addEventListener('online', () => this.flush());
+      window.addEventListener('storage', (e) => e.key === QUEUE_KEY && this.onChange(this));
+      this.flush();
+    }
+
+    get size() {
+      return load(QUEUE_KEY).length;
+    }
+
+    get rejected() {
+      return load(REJECTED_KEY);
+    }
+
+    // sale: {items: [{variant, qty, price}], payment_method, warehouse}.
+    // Возвращает {ok, queued, sale, error}.
+    async sell(sale) {
+      sale = Object.assign({}, sale, {
+        idempotency_key: sale.idempotency_key || randomId(),
+        terminal: this.terminal,
+        created_at: new Date().toISOString(),
+      });
+      // Пока очередь не пуста, новые продажи встают за ней — порядок списаний сохраняется
+      if (navigator.onLine !== false && this.size === 0) {
+        try {
+          const { ok, data } = await postJSON(this.checkoutUrl, sale);
+          return { ok: ok && data.ok, queued: false, sale: data.sale, error: data.error };
+        } catch (e) {
+          if (!(e instanceof Unreachable)) throw e;
+        }
+      }
+      this.enqueue(sale);
+      return { ok: true, queued: true };
+    }
+
+    enqueue(sale) {
+      const queue = load(QUEUE_KEY);
+      queue.push(sale);
+      store(QUEUE_KEY, queue);
+      this.onChange(this);
+      this.schedule(this.retryMs);
+    }
+
+    schedule(ms) {
+      clearTimeout(this.timer);
+      this.timer = setTimeout(() => this.flush(), ms);
+    }
+
+    async flush() {
+      if (this.flushing) return;
+      this.flushing = true;
+      let size = this.batchSize;
+      try {
+        let queue = load(QUEUE_KEY);
+        while (queue.length) {
+          const batch = queue.slice(0, size);
+          let response;
+          try {
+            response = await postJSON(this.syncUrl, { sales: batch });
+          } catch (e) {
+            // Прокси не пропустил тело — та же очередь меньшими пачками
+            if (e.status === TOO_LARGE && size > 1) {
+              size = Math.ceil(size / 2);
+              continue;
+            }
+            throw e;
+          }
+          const { status, ok, data } = response;
+          if (!ok || !Array.isArray(data.results)) {
+            // Отказ пачке целиком — ни одну продажу не отклоняем: пробуем меньшей пачкой, потом позже
+            if (size > 1) {
+              size = Math.ceil(size / 2);
+              continue;
+            }
+            throw new Error(data.error || 'HTTP ' + status);
+          }
+
+          const settled = new Set();
+          const rejected = load(REJECTED_KEY);
+          batch.forEach((sale, i) => {
+            const result = data.results[i];
+            if (!result) return;  // ответа по продаже нет — остаётся в очереди
+            settled.add(sale.idempotency_key);
+            // Сервер продажу не принял (неизвестный товар и т. п.) — в разбор, а не в бесконечный повтор
+            if (result.status === 'error') rejected.push(Object.assign({}, sale, { error: result.error }));
+          });
+          store(REJECTED_KEY, rejected);
+          // Очередь перечитываем: пока шла выгрузка, касса могла продать ещё
+          queue = load(QUEUE_KEY).filter((sale) => !settled.has(sale.idempotency_key));
+          store(QUEUE_KEY, queue);
+          this.onChange(this);
+          if (!settled.size) throw new Error('Сервер не ответил ни по одной продаже');
+        }
+        this.retryMs = 1000;
+      } catch (e) {
+        if (!(e instanceof Unreachable)) console.error('pos queue:', e);
+        this.retryMs = Math.min(this.retryMs * 2, RETRY_MAX_MS);
+        this.schedule(this.retryMs);
+      } finally {
+        this.flushing = false;
+      }
+    }
+
+    // Отклонённые продажи — снова в очередь (после исправления причины: товар, склад),
+    // с прежним ключом идемпотентности: повтор уже проведённой не задвоит её
+    retryRejected() {
+      const rejected = load(REJECTED_KEY);
+      if (!rejected.length) return;
+      const queue = load(QUEUE_KEY);
+      rejected.forEach((sale) => {
+        const copy = Object.assign({}, sale);
+        delete copy.error;
+        queue.push(copy);
+      });
+      store(QUEUE_KEY, queue);
+      store(REJECTED_KEY, []);
+      this.onChange(this);
+      this.flush();
+    }
+
+    // Отклонённые продажи файлом JSON — для ручного разбора; из списка не удаляются
+    exportRejected() {
+      const blob = new Blob([JSON.stringify(this.rejected, null, 2)], { type: 'application/json' });
+      const link = document.createElement('a');
+      link.href = URL.createObjectURL(blob);
+      link.download = 'pos-rejected-' + this.terminal + '-' + new Date().toISOString().slice(0, 10) + '.json';
+      link.click();
+      URL.revokeObjectURL(link.href);
+    }
+  }
+
+  window.PosQueue = PosQueue;
+})();